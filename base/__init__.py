@@ -12,8 +12,13 @@ try:
 finally:
     del frame
 
-# DB file
-PATH_DB = os.path.join(DIR, 'midpoints.sqlite')
+# DB file, which can be replaced (e.g. by a synthetic database, see
+# synthetic.py) by setting the environment variable MIDPOINTS_DB
+PATH_DB = os.environ.get('MIDPOINTS_DB') or os.path.join(
+    DIR, 'midpoints.sqlite')
+
+# Cache directory
+PATH_CACHE = os.path.join(DIR, 'cache')
 
 # Delete imported libraries
 del os, inspect
@@ -22,9 +27,93 @@ del os, inspect
 #
 # Import functions and classes
 #
+from ._bootstrap import (   # noqa
+    bootstrap_fit,
+)
+from ._boltzmann import (   # noqa
+    boltzmann,
+    fit_boltzmann,
+    simulate_boltzmann,
+)
+from ._cache import (       # noqa
+    fingerprint,
+    query,
+)
+from ._columnar import (    # noqa
+    columns_path,
+    export_columns,
+    open_columns,
+    use_columns,
+)
 from ._connection import (  # noqa
     connect,
 )
+from ._data import (        # noqa
+    load,
+)
+from ._flat import (        # noqa
+    create_flat_table,
+    FLAT_TABLE,
+)
+from ._incremental import ( # noqa
+    incremental_statistics,
+    install_statistics,
+    remove_statistics,
+)
+from ._ljp import (         # noqa
+    ljp_offsets,
+    ljp_scenarios,
+)
+from ._meta import (        # noqa
+    bivariate_meta_analysis,
+    meta_analysis,
+)
+from ._nearest import (     # noqa
+    experiment_index,
+    ExperimentIndex,
+)
+from ._parallel import (    # noqa
+    parallel_map,
+)
+from ._permutation import ( # noqa
+    permutation_test,
+)
 from ._plot import (        # noqa
     axletter,
+    fit_line,
+)
+from ._profile import (     # noqa
+    profile_report,
+    write_profile,
+)
+from ._protocol import (     # noqa
+    peak_conductance,
+    simulate_activation,
+    simulate_inactivation,
+)
+from ._regression import (  # noqa
+    regression,
+    regression_band,
+)
+from ._summaries import (   # noqa
+    experiment_counts,
+    ljp_mentions,
+    midpoint_summary,
+    no_oocytes,
+    normal_range,
+    pooled_midpoints,
+    protocol_summary,
+    sigma_summary,
+    slope_summary,
+    spread,
+    study_ranges,
+    temperature_summary,
+)
+from ._table import (       # noqa
+    fetch,
+    Table,
+)
+from ._tabular import (     # noqa
+    Column,
+    write_table,
 )
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+#
+# Simulation and batched fitting of Boltzmann curves.
+#
+import numpy as np
+
+import base
+
+
+# Maximum number of (curve, voltage) pairs to simulate and fit per chunk
+CHUNK_ELEMENTS = 2**20
+
+
+def boltzmann(v, mid, k):
+    """
+    Returns the Boltzmann curve ``1 / (1 + exp((mid - v) / k))`` at voltages
+    ``v``.
+
+    With a positive ``k`` this describes steady-state activation, and with a
+    negative ``k`` (as stored for inactivation) steady-state inactivation.
+    """
+    with np.errstate(over='ignore'):
+        return 1 / (1 + np.exp((mid - v) / k))
+
+
+def fit_boltzmann(v, y, mid, k, max_iter=100, tolerance=1e-10):
+    """
+    Fits a Boltzmann curve (see :meth:`boltzmann`) to each of ``m`` curves at
+    once, using the Levenberg-Marquardt method.
+
+    Arguments:
+
+    ``v``
+        An array of shape ``(m, p)`` with the voltages of every curve. Curves
+        with fewer than ``p`` points can be padded with NaN.
+    ``y``
+        An array of shape ``(m, p)`` with the values to fit.
+    ``mid``, ``k``
+        Arrays of length ``m`` with initial guesses for the midpoints and slope
+        factors.
+    ``max_iter``
+        The maximum number of iterations.
+    ``tolerance``
+        The relative change in the sum of squared errors, below which a fit is
+        considered converged.
+
+    Each iteration solves the damped 2x2 normal equations of every curve in
+    closed form, using sums over the voltage axis, so that thousands of curves
+    are updated with a handful of array operations. The damping factor of each
+    curve is adapted separately, and only curves that have not converged yet
+    are updated in each iteration. Curves that haven't converged after
+    ``max_iter`` iterations are marked as such.
+
+    Returns a tuple ``(mid, k, sse, converged)`` of arrays of length ``m``.
+    """
+    v, y = np.asarray(v, dtype=float), np.asarray(y, dtype=float)
+    if v.ndim != 2 or v.shape != y.shape:
+        raise ValueError('Expecting 2d arrays v and y of equal shape.')
+    ok = np.isfinite(v) & np.isfinite(y)
+    v, y = np.where(ok, v, 0), np.where(ok, y, 0)
+    mid = np.array(mid, dtype=float)
+    k = np.array(k, dtype=float)
+
+    def residuals(i, mid, k):
+        f = boltzmann(v[i], mid[:, None], k[:, None])
+        return f, np.where(ok[i], y[i] - f, 0)
+
+    m = len(v)
+    f, r = residuals(slice(None), mid, k)
+    sse = np.sum(r * r, axis=1)
+    damping = np.full(m, 1e-3)
+    converged = np.zeros(m, dtype=bool)
+    i = np.arange(m)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(max_iter):
+            # Jacobian with respect to (mid, k), for the active curves only
+            vi, mi, ki = v[i], mid[i, None], k[i, None]
+            fi, ri = f[i], r[i]
+            g = np.where(ok[i], fi * (1 - fi) / ki, 0)
+            jk = g * (mi - vi) / ki
+            a = np.sum(g * g, axis=1)
+            b = -np.sum(g * jk, axis=1)
+            c = np.sum(jk * jk, axis=1)
+            rm = -np.sum(g * ri, axis=1)
+            rk = np.sum(jk * ri, axis=1)
+
+            # Damped normal equations
+            da, dc = a * (1 + damping[i]), c * (1 + damping[i])
+            det = da * dc - b * b
+            step_m = (dc * rm - b * rk) / det
+            step_k = (da * rk - b * rm) / det
+            step_m = np.where(np.isfinite(step_m), step_m, 0)
+            step_k = np.where(np.isfinite(step_k), step_k, 0)
+
+            # Accept steps that reduce the error
+            new_mid, new_k = mid[i] + step_m, k[i] + step_k
+            new_f, new_r = residuals(i, new_mid, new_k)
+            new_sse = np.sum(new_r * new_r, axis=1)
+            better = (new_sse <= sse[i]) & (new_k != 0)
+            change = np.where(better, sse[i] - new_sse, 0)
+            j = i[better]
+            mid[j], k[j] = new_mid[better], new_k[better]
+            f[j], r[j], sse[j] = new_f[better], new_r[better], new_sse[better]
+            damping[i] = np.where(better, damping[i] / 10, damping[i] * 10)
+
+            # Stop if the improvement is small, or if no further improvement
+            # can be found
+            done = (better & (change <= tolerance * sse[i])
+                    | (damping[i] > 1e10))
+            j = i[done]
+            converged[j] = np.isfinite(mid[j]) & np.isfinite(k[j])
+            i = i[~done]
+            if len(i) == 0:
+                break
+    return mid, k, sse, converged
+
+
+def simulate_boltzmann(mid, std, k, n, low, high, step, noise=0.02,
+                       normalise=True, max_iter=100, seed=None):
+    """
+    Simulates the cell-level curves underlying reported Boltzmann fits, and
+    refits them, to estimate how much spread in the midpoints is introduced by
+    the fitting procedure.
+
+    For every experiment ``j``, ``n[j]`` cells are simulated, each with a
+    midpoint drawn from a normal distribution with mean ``mid[j]`` and
+    standard deviation ``std[j]``, and slope factor ``k[j]``. Each cell's curve
+    is sampled at the voltages ``low[j], low[j] + step[j], ..., high[j]``,
+    Gaussian noise with standard deviation ``noise`` is added, and the curve
+    is (optionally) normalised to its maximum, as would be done with measured
+    data. A Boltzmann curve is then fitted to every cell with
+    :meth:`fit_boltzmann`, starting from the reported ``mid[j]`` and ``k[j]``.
+
+    Arguments:
+
+    ``mid``, ``std``, ``k``, ``n``
+        Arrays with the reported mean midpoint, standard deviation, slope
+        factor, and number of cells for every experiment.
+    ``low``, ``high``, ``step``
+        Arrays with the protocol's lowest and highest voltages, and the step
+        size, for every experiment.
+    ``noise``
+        The standard deviation of the noise, relative to the maximum of the
+        curve.
+    ``normalise``
+        Set to ``False`` to fit the curves without normalising.
+    ``max_iter``
+        The maximum number of iterations per fit.
+    ``seed``
+        A seed for the random number generator.
+
+    Experiments with any missing (NaN) argument, no cells, or a step size
+    that isn't positive, are skipped. All cells of all experiments are
+    simulated and fitted together, in chunks of up to ``CHUNK_ELEMENTS``
+    (cell, voltage) pairs.
+
+    Returns a :class:`Table` with one row per experiment (in the order given)
+    and columns ``cells`` (the number of cells simulated, zero for skipped
+    experiments), ``steps`` (the number of voltages), ``true_mean`` and
+    ``true_std`` (the mean and standard deviation of the simulated
+    midpoints), ``fit_mean`` and ``fit_std`` (the same for the fitted
+    midpoints), ``fit_k`` (the mean fitted slope factor), ``error_mean`` and
+    ``error_std`` (the mean and standard deviation of the difference between
+    fitted and simulated midpoints), and ``failed`` (the number of fits that
+    did not converge, which are excluded from the statistics).
+    """
+    mid, std, k, n, low, high, step = (
+        np.asarray(x, dtype=float)
+        for x in (mid, std, k, n, low, high, step))
+    low, high = np.minimum(low, high), np.maximum(low, high)
+    steps = np.floor((high - low) / step + 1e-9) + 1
+    with np.errstate(invalid='ignore'):
+        ok = (np.isfinite(mid) & np.isfinite(std) & np.isfinite(k) & (k != 0)
+              & np.isfinite(steps) & (step > 0) & (n >= 1))
+    e = len(mid)
+    cells = np.where(ok, np.floor(np.nan_to_num(n)), 0).astype(int)
+    steps = np.where(ok, steps, 0).astype(int)
+
+    # Cell-level parameters, and the experiment each cell belongs to
+    rng = np.random.default_rng(seed)
+    owner = np.repeat(np.arange(e), cells)
+    true = rng.normal(mid[owner], std[owner])
+    slope = k[owner]
+
+    # Simulate and fit in chunks of cells
+    fitted = np.full(len(owner), np.nan)
+    fitted_k = np.full(len(owner), np.nan)
+    width = np.maximum(1, steps[owner])
+    i = 0
+    while i < len(owner):
+        # Take as many cells as fit, padded to the widest in the chunk
+        top = np.maximum.accumulate(
+            width[i:i + max(1, CHUNK_ELEMENTS // width[i])])
+        size = max(1, np.searchsorted(
+            top * np.arange(1, len(top) + 1), CHUNK_ELEMENTS, side='right'))
+        p = top[size - 1]
+        j = slice(i, i + size)
+        i += size
+        o = owner[j]
+        grid = np.arange(p)
+        v = low[o, None] + step[o, None] * grid
+        v[grid >= steps[o, None]] = np.nan
+        y = boltzmann(v, true[j, None], slope[j, None])
+        y += noise * rng.standard_normal(y.shape)
+        if normalise:
+            y /= np.nanmax(y, axis=1)[:, None]
+        m, s, _, converged = fit_boltzmann(
+            v, y, mid[o], k[o], max_iter=max_iter)
+        fitted[j] = np.where(converged, m, np.nan)
+        fitted_k[j] = np.where(converged, s, np.nan)
+
+    # Statistics per experiment
+    def mean(x):
+        use = np.isfinite(x)
+        count = np.bincount(owner[use], minlength=e)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (np.bincount(owner[use], weights=x[use], minlength=e)
+                    / count), count
+
+    def sd(x):
+        mu, count = mean(x)
+        d = np.where(np.isfinite(x), x - mu[owner], np.nan)
+        ss, _ = mean(d * d)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(ss * count / (count - 1))
+
+    error = fitted - true
+    true_mean, _ = mean(true)
+    fit_mean, used = mean(fitted)
+    columns = dict(
+        cells=cells,
+        steps=steps,
+        true_mean=np.where(ok, true_mean, np.nan),
+        true_std=np.where(ok, sd(true), np.nan),
+        fit_mean=fit_mean,
+        fit_std=sd(fitted),
+        fit_k=mean(fitted_k)[0],
+        error_mean=mean(error)[0],
+        error_std=sd(error),
+        failed=cells - used,
+    )
+    return base.Table(columns)
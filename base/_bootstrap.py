@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+#
+# Bootstrap confidence intervals for a linear fit.
+#
+import numpy as np
+
+import base
+
+
+# Names of the statistics calculated by bootstrap_fit
+STATISTICS = ('slope', 'offset', 'r', 'fixed_offset')
+
+# Maximum number of (resample, cluster) pairs to hold in memory per chunk
+CHUNK_ELEMENTS = 2**21
+
+# Cluster sums, set in each worker by _init
+_sums = None
+
+
+def bootstrap_fit(x, y, clusters=None, samples=100000, alpha=95, seed=None,
+                  workers=None):
+    """
+    Calculates bootstrap confidence intervals for a least-squares fit
+    ``y = offset + slope * x``, for the Pearson correlation ``r`` of ``x`` and
+    ``y``, and for the ``fixed_offset`` of a fit with the slope fixed to 1.
+
+    Arguments:
+
+    ``x``, ``y``
+        The data to fit.
+    ``clusters``
+        An optional array of labels (e.g. publication keys). If given, whole
+        clusters are resampled instead of single points.
+    ``samples``
+        The number of bootstrap samples to draw.
+    ``alpha``
+        The size of the intervals, in percent.
+    ``seed``
+        A seed for the random number generator. Results depend only on the
+        seed and the data, not on the number of workers.
+    ``workers``
+        The number of processes to use (default: one per CPU).
+
+    Each resample is represented as a row in an index matrix, which is
+    converted to a vector of counts per cluster. The statistics for a whole
+    chunk of resamples are then calculated from a single matrix product of
+    the counts with precomputed per-cluster sums. Chunks are spread over
+    multiple processes, each with its own independent random stream.
+
+    Returns a :class:`Table` with one row per statistic, and columns
+    ``statistic``, ``estimate``, ``se`` (the standard deviation of the
+    bootstrap distribution), ``percentile_lo``, ``percentile_hi``,
+    ``bca_lo``, and ``bca_hi``, where the BCa (bias-corrected and
+    accelerated) intervals use a (cluster) jackknife for the acceleration.
+    """
+    import scipy.stats
+
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if x.shape != y.shape or x.ndim != 1:
+        raise ValueError('Expecting 1d arrays x and y of equal length.')
+    samples = int(samples)
+    if samples < 1:
+        raise ValueError('Number of samples must be at least 1.')
+
+    # Sums per cluster, of data centered on the means
+    if clusters is None:
+        codes = np.arange(len(x))
+    else:
+        _, codes = np.unique(np.asarray(clusters), return_inverse=True)
+    cx, cy = np.mean(x), np.mean(y)
+    sums = _cluster_sums(x - cx, y - cy, codes)
+    g = len(sums)
+
+    # Point estimates, and leave-one-cluster-out jackknife estimates
+    total = np.sum(sums, axis=0)
+    estimate = _statistics(total[None, :], cx, cy)[0]
+    jackknife = _statistics(total - sums, cx, cy)
+
+    # Bootstrap, in chunks with independent random streams
+    size = max(1, min(samples, CHUNK_ELEMENTS // g))
+    chunks = [min(size, samples - i) for i in range(0, samples, size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    stats = base.parallel_map(
+        _chunk, zip(chunks, seeds), workers, _init, (sums, ))
+    stats = _statistics(np.concatenate(stats), cx, cy)
+
+    # Percentile intervals
+    lo, hi = (100 - alpha) / 2, 100 - (100 - alpha) / 2
+    percentile = np.nanpercentile(stats, [lo, hi], axis=0)
+
+    # BCa intervals
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = (np.sum(stats < estimate, axis=0)
+             + 0.5 * np.sum(stats == estimate, axis=0)) / len(stats)
+        z0 = scipy.stats.norm.ppf(p)
+        d = np.nanmean(jackknife, axis=0) - jackknife
+        a = np.nansum(d**3, axis=0) / (6 * np.nansum(d**2, axis=0)**1.5)
+        z = scipy.stats.norm.ppf(np.array([lo, hi]) / 100)[:, None]
+        q = scipy.stats.norm.cdf(z0 + (z0 + z) / (1 - a * (z0 + z)))
+    bca = np.array([
+        [np.nanquantile(stats[:, j], q[i, j]) if np.isfinite(q[i, j])
+         else np.nan for j in range(len(STATISTICS))] for i in range(2)])
+
+    return base.Table(dict(
+        statistic=np.array(STATISTICS, dtype=object),
+        estimate=estimate,
+        se=np.nanstd(stats, axis=0, ddof=1),
+        percentile_lo=percentile[0],
+        percentile_hi=percentile[1],
+        bca_lo=bca[0],
+        bca_hi=bca[1],
+    ))
+
+
+def _chunk(task):
+    """ Returns the summed statistics for a chunk of bootstrap samples. """
+    n, seed = task
+    g = len(_sums)
+    rng = np.random.default_rng(seed)
+
+    # Index matrix, with one resample per row
+    index = rng.integers(0, g, size=(n, g))
+
+    # Convert to counts per cluster, and from there to sums per sample
+    index += np.arange(n)[:, None] * g
+    counts = np.bincount(index.ravel(), minlength=n * g).reshape(n, g)
+    return counts @ _sums
+
+
+def _cluster_sums(x, y, codes):
+    """
+    Returns an array with, for every cluster, the number of points and the
+    sums of x, y, x^2, y^2 and x*y.
+    """
+    g = np.max(codes) + 1
+    sums = np.empty((g, 6))
+    for i, v in enumerate((np.ones(len(x)), x, y, x * x, y * y, x * y)):
+        sums[:, i] = np.bincount(codes, weights=v, minlength=g)
+    return sums
+
+
+def _init(sums):
+    """ Stores the cluster sums in a worker process. """
+    global _sums
+    _sums = sums
+
+
+def _statistics(sums, cx, cy):
+    """
+    Calculates slope, offset, r, and fixed-slope offset from an array of sums
+    (see :meth:`_cluster_sums`) of data centered on ``(cx, cy)``.
+    """
+    n, sx, sy, sxx, syy, sxy = sums.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mx, my = sx / n, sy / n
+        ssx = sxx - sx * mx
+        ssy = syy - sy * my
+        ssxy = sxy - sx * my
+        b = ssxy / ssx
+        a = (my + cy) - b * (mx + cx)
+        r = ssxy / np.sqrt(ssx * ssy)
+        a2 = (my + cy) - (mx + cx)
+    return np.stack((b, a, r, a2), axis=1)
+
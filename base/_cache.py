@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+#
+# Persistent on-disk cache of query results.
+#
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import base
+from ._table import decode, encode
+
+
+# Maximum total size of the cached results, in bytes
+MAX_CACHE_SIZE = 512 * 1024 * 1024
+
+# Fingerprints of database files, as (stat, hash) tuples, per path
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+# Splits sql into quoted and unquoted parts
+_quoted = re.compile(r'''('(?:[^']|'')*'|"(?:[^"]|"")*")''')
+
+# Matches runs of whitespace
+_whitespace = re.compile(r'\s+')
+
+
+def fingerprint(path=None):
+    """
+    Returns a SHA-256 hash of the contents of the database at ``path`` (or
+    ``base.PATH_DB`` if not set).
+
+    The hash is only recalculated if the file's size, modification time, or
+    inode have changed since it was last calculated. Previously calculated
+    hashes are stored in the cache directory.
+    """
+    path = os.path.abspath(base.PATH_DB if path is None else path)
+    stat = []
+    for p in (path, path + '-wal'):
+        try:
+            s = os.stat(p)
+            stat.extend((s.st_size, s.st_mtime_ns, s.st_ino))
+        except FileNotFoundError:
+            pass
+
+    # Check memory, then disk
+    with _fingerprints_lock:
+        known = _fingerprints.get(path)
+    if known and known[0] == stat:
+        return known[1]
+    fname = os.path.join(base.PATH_CACHE, 'fingerprints.json')
+    try:
+        with open(fname, 'r') as f:
+            stored = json.load(f)
+    except (FileNotFoundError, ValueError):
+        stored = {}
+    known = stored.get(path)
+    if known and known[0] == stat:
+        digest = known[1]
+    else:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        stored[path] = (stat, digest)
+        _store(fname, lambda f: f.write(json.dumps(stored).encode()))
+
+    with _fingerprints_lock:
+        _fingerprints[path] = (stat, digest)
+    return digest
+
+
+def normalise(query):
+    """
+    Returns a normalised version of an sql ``query``, in which whitespace is
+    collapsed and everything outside of quotes is lower case.
+    """
+    parts = _quoted.split(query.strip().rstrip(';').strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = _whitespace.sub(' ', parts[i]).lower()
+    return ''.join(parts)
+
+
+def query(query, parameters=(), cache=True):
+    """
+    Runs a ``query`` on the database and returns the result as a
+    :class:`Table`, using a persistent cache stored in ``base.PATH_CACHE``.
+
+    Results are cached on the normalised query text, the ``parameters``, and
+    the :meth:`fingerprint` of the database, so that any change to the
+    database invalidates all cached results. When the cache grows larger than
+    ``MAX_CACHE_SIZE``, the least recently used results are removed.
+
+    Set ``cache=False`` to bypass the cache. If profiling is enabled (see
+    :meth:`connect`), results loaded from the cache are recorded too.
+    """
+    if not cache:
+        with base.connect() as con:
+            return base.fetch(con, query, parameters)
+
+    key = hashlib.sha256('\0'.join((
+        normalise(query), repr(tuple(parameters)), fingerprint(),
+    )).encode()).hexdigest()
+    fname = os.path.join(base.PATH_CACHE, key + '.npz')
+
+    # Load from cache
+    t = time.perf_counter()
+    try:
+        with np.load(fname, allow_pickle=False) as f:
+            arrays = {k: f[k] for k in f.files}
+        os.utime(fname)     # Mark as recently used
+        meta = json.loads(str(arrays.pop('meta')))
+        table = decode(meta, arrays)
+    except Exception:
+        # Missing, removed by another process, or unreadable: query again
+        pass
+    else:
+        from ._profile import record
+        record(query, time.perf_counter() - t, len(table), 'cache')
+        return table
+
+    # Query and store
+    with base.connect() as con:
+        table = base.fetch(con, query, parameters)
+    meta, arrays = encode(table)
+    arrays['meta'] = np.array(json.dumps(meta))
+    if sum(x.nbytes for x in arrays.values()) < MAX_CACHE_SIZE:
+        _store(fname, lambda f: np.savez(f, **arrays))
+        _evict()
+    return table
+
+
+def _evict():
+    """
+    Removes least recently used results until the cache is small enough.
+    """
+    entries = []
+    with os.scandir(base.PATH_CACHE) as it:
+        for e in it:
+            if e.name.endswith('.npz'):
+                try:
+                    s = e.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((s.st_mtime_ns, s.st_size, e.path))
+    total = sum(e[1] for e in entries)
+    entries.sort()
+    for mtime, size, path in entries:
+        if total <= MAX_CACHE_SIZE:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _store(fname, write):
+    """
+    Atomically creates or replaces ``fname``, using ``write(f)`` to write to a
+    binary file ``f``.
+    """
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(fname), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(temp, fname)
+    except BaseException:
+        os.remove(temp)
+        raise
+
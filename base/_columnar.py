@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+#
+# Memory-mappable, column-oriented exports of the midpoints data.
+#
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import base
+from ._profile import record
+from ._table import decode, encode
+
+
+# Environment variable that, if set to 0, stops load() from using an export
+ENV_COLUMNS = 'MIDPOINTS_COLUMNS'
+
+# Version of the export format, stored in the manifest
+COLUMNS_VERSION = 1
+
+# Name of the manifest file in an export directory
+MANIFEST = 'manifest.json'
+
+
+def columns_path(path=None):
+    """
+    Returns the default export directory for the database at ``path`` (or
+    ``base.PATH_DB`` if not set), e.g. ``base/midpoints-columns`` for
+    ``base/midpoints.sqlite``.
+    """
+    path = base.PATH_DB if path is None else path
+    return os.path.splitext(os.path.abspath(path))[0] + '-columns'
+
+
+def export_columns(path=None):
+    """
+    Writes the data returned by :meth:`load` (all rows of ``midpoints_wt``
+    with their publication details) to a directory ``path`` (default: see
+    :meth:`columns_path`), and returns the path.
+
+    Every column is stored in its own ``.npy`` file (with a second file for
+    its null mask, if needed), and text columns are dictionary-encoded, as in
+    the query cache (see :meth:`query`). A ``manifest.json`` lists the files,
+    the column names and kinds, the dictionaries, and the
+    :meth:`fingerprint` of the database the data was read from.
+
+    The export is written to a temporary directory, which then replaces any
+    existing export, so that processes that have the old files open (or
+    memory-mapped) are not affected.
+    """
+    path = os.path.abspath(columns_path() if path is None else path)
+    meta, arrays = encode(base.load(reload=True, columns=False))
+    meta['version'] = COLUMNS_VERSION
+    meta['fingerprint'] = base.fingerprint()
+    meta['files'] = sorted(arrays)
+
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    temp = tempfile.mkdtemp(dir=parent, suffix='.tmp')
+    try:
+        for name, x in arrays.items():
+            np.save(os.path.join(temp, name + '.npy'), x, allow_pickle=False)
+        with open(os.path.join(temp, MANIFEST), 'w') as f:
+            json.dump(meta, f)
+
+        # Swap in the new directory, then remove the old one
+        old = None
+        if os.path.exists(path):
+            old = tempfile.mkdtemp(dir=parent, suffix='.old')
+            os.rmdir(old)
+            os.replace(path, old)
+        os.replace(temp, path)
+    except BaseException:
+        shutil.rmtree(temp, ignore_errors=True)
+        raise
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def open_columns(path=None, check=True):
+    """
+    Opens an export created by :meth:`export_columns` in directory ``path``
+    (default: see :meth:`columns_path`), and returns it as a :class:`Table`.
+
+    Numerical columns and null masks are opened with
+    ``np.load(mmap_mode='r')``, so that their data is read from the page cache
+    when needed, and shared by all processes that open the same export.
+    Text columns are decoded from their (small) dictionaries.
+
+    If ``check=True`` (the default), a ``ValueError`` is raised if the export
+    was not made from the current database (see :meth:`fingerprint`). A
+    ``FileNotFoundError`` is raised if there is no export at ``path``.
+
+    If profiling is enabled (see :meth:`connect`), the time to open the export
+    is recorded, with source ``'columns'``.
+    """
+    t = time.perf_counter()
+    path = columns_path() if path is None else path
+    with open(os.path.join(path, MANIFEST), 'r') as f:
+        meta = json.load(f)
+    if meta.get('version') != COLUMNS_VERSION:
+        raise ValueError(f'Unsupported export format in {path}.')
+    if check and meta['fingerprint'] != base.fingerprint():
+        raise ValueError(f'Export in {path} does not match the database.')
+    arrays = {name: np.load(os.path.join(path, name + '.npy'),
+                            mmap_mode='r', allow_pickle=False)
+              for name in meta['files']}
+    table = decode(meta, arrays)
+    record(f'open_columns("{path}")', time.perf_counter() - t, len(table),
+           'columns')
+    return table
+
+
+def use_columns():
+    """
+    Returns ``False`` if the environment variable ``MIDPOINTS_COLUMNS`` is set
+    to ``0``, in which case :meth:`load` ignores any columnar export.
+    """
+    return os.environ.get(ENV_COLUMNS, '').strip() != '0'
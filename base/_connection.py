@@ -2,58 +2,209 @@
 #
 # Provides a connection to the mutation database.
 #
+import atexit
+import os
 import sqlite3
+import threading
+import urllib.request
 
 import base
+from ._profile import enabled, ProfilingConnection
 
 
-def connect():
+# Maximum number of bytes of the database file to memory-map
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Size of the page cache, per connection, in KiB
+CACHE_SIZE = 64 * 1024
+
+
+def connect(readonly=True, profile=None):
     """
     Connects to the database and returns the new :class:`Connection` object.
+
+    By default, a read-only connection is borrowed from a pool shared by the
+    whole process. Set ``readonly=False`` to open a new, writable connection
+    instead.
+
+    Set ``profile=True`` to record the time, rows, and query plan of every
+    statement executed on the connection (see :meth:`profile_report`). If not
+    set, profiling is enabled when the environment variable
+    ``MIDPOINTS_PROFILE`` is set to a directory for the reports.
     """
-    return Connection()
+    return Connection(readonly, profile)
 
 
 class Connection(object):
     """
     Context manager that maintains a connection to an sqlite database
     containing the mutation data from the ``csv`` files.
+
+    Read-only connections are borrowed from a :class:`Pool` on entry, and
+    returned to it on exit, so that the cost of opening a connection is only
+    paid once. The same ``Connection`` can be entered more than once (and in
+    more than one thread), each time providing its own sqlite connection.
+
+    Writable connections are opened on entry and closed on exit.
+
+    If ``profile`` is ``True``, or if it is ``None`` and profiling is enabled
+    with ``MIDPOINTS_PROFILE``, all statements are recorded.
     """
-    def __init__(self):
+    def __init__(self, readonly=True, profile=None):
         super(Connection, self).__init__()
-        self._connection = None
+        self._readonly = bool(readonly)
+        self._profile = profile
+        self._local = threading.local()
 
     def __enter__(self):
         """
-        Called when the context manager is entered. Opens a connection to a new
-        or cached sqlite database containing the data from the ``csv`` files.
+        Called when the context manager is entered. Returns an sqlite
+        connection to the database.
         """
-        # Test if connection is already set up
-        if self._connection:
-            try:
-                self._connection.close()
-            except Exception:
-                pass
-            raise Exception('Connection already open when entering!')
-
-        # Set up connection
-        self._connection = sqlite3.connect(base.PATH_DB)
+        profile = enabled() if self._profile is None else bool(self._profile)
+        p = None
+        if self._readonly:
+            p = pool(profile)
+            con = p.acquire()
+        else:
+            # Set up connection
+            con = sqlite3.connect(
+                base.PATH_DB,
+                factory=ProfilingConnection if profile else sqlite3.Connection)
 
-        # Enable foreign keys
-        c = self._connection.cursor()
-        c.execute('PRAGMA foreign_keys = ON;')
-        self._connection.commit()
+            # Enable foreign keys
+            c = con.cursor()
+            c.execute('PRAGMA foreign_keys = ON;')
+            con.commit()
 
-        # Set row factory (to enable name based access)
-        self._connection.row_factory = sqlite3.Row
+            # Set row factory (to enable name based access)
+            con.row_factory = sqlite3.Row
 
-        return self._connection
+        try:
+            self._local.stack.append((p, con))
+        except AttributeError:
+            self._local.stack = [(p, con)]
+        return con
 
     def __exit__(self, exc_type, exc_value, traceback):
         """
-        Called when the context manager is exited. Closes the connection.
+        Called when the context manager is exited. Returns the connection to
+        the pool, or closes it.
         """
-        if self._connection:
-            self._connection.close()
-            self._connection = None
+        p, con = self._local.stack.pop()
+        if p is not None:
+            p.release(con)
+        else:
+            con.close()
+
+
+class Pool(object):
+    """
+    A thread-safe pool of read-only connections to the database at ``path``.
+
+    Connections are opened with an sqlite URI in ``mode=ro``, and have
+    memory-mapped I/O and a larger page cache enabled. They can be used from
+    any thread, but only by one thread at a time. If ``profile`` is set, each
+    connection is a :class:`ProfilingConnection`.
+    """
+    def __init__(self, path, profile=False):
+        super(Pool, self).__init__()
+        self._path = path
+        self._profile = profile
+        self._lock = threading.Lock()
+        self._idle = []
+        self._open = []
+
+    def acquire(self):
+        """ Returns an idle connection, opening a new one if required. """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        con = self._connect()
+        with self._lock:
+            self._open.append(con)
+        return con
+
+    def close(self):
+        """ Closes all connections. """
+        with self._lock:
+            for con in self._open:
+                con.close()
+            self._idle = []
+            self._open = []
+
+    def _connect(self):
+        """ Opens and configures a new read-only connection. """
+        path = urllib.request.pathname2url(os.path.abspath(self._path))
+        factory = ProfilingConnection if self._profile else sqlite3.Connection
+        con = sqlite3.connect(
+            f'file:{path}?mode=ro', uri=True, check_same_thread=False,
+            factory=factory)
+        c = sqlite3.Cursor(con)     # Not profiled
+        c.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+        c.execute(f'PRAGMA cache_size = -{CACHE_SIZE}')
+        c.execute('PRAGMA query_only = ON')
+        c.close()
+        con.row_factory = sqlite3.Row
+        return con
+
+    def release(self, con):
+        """ Returns a connection acquired with :meth:`acquire` to the pool. """
+        try:
+            if con.in_transaction:
+                con.rollback()
+        except sqlite3.ProgrammingError:
+            # Closed by the user
+            with self._lock:
+                self._open.remove(con)
+            return
+        con.row_factory = sqlite3.Row
+        with self._lock:
+            self._idle.append(con)
+
+
+# Connection pools, per database path and profiling setting
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Pools inherited from a parent process (see _forget_pools)
+_inherited = []
+
+
+def pool(profile=False):
+    """
+    Returns the :class:`Pool` for the current ``base.PATH_DB``, with or without
+    profiling.
+    """
+    key = (base.PATH_DB, bool(profile))
+    with _pools_lock:
+        try:
+            return _pools[key]
+        except KeyError:
+            p = _pools[key] = Pool(*key)
+            return p
+
+
+def _close_pools():
+    """ Closes all pooled connections. """
+    with _pools_lock:
+        for p in _pools.values():
+            p.close()
+
+
+def _forget_pools():
+    """
+    Discards the pools inherited by a forked child process. SQLite connections
+    must not be used (or closed) after a fork, so references are kept to stop
+    them being garbage collected.
+    """
+    global _pools_lock
+    _inherited.extend(_pools.values())
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+atexit.register(_close_pools)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_pools)
 
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+#
+# Loads the midpoints data into memory.
+#
+import base
+
+
+# Cached tables, per database path
+_snapshots = {}
+
+
+def load(reload=False, columns=True):
+    """
+    Returns a :class:`Table` containing all rows of ``midpoints_wt``, along
+    with the ``author``, ``year``, ``journal``, and ``title`` of each row's
+    publication (from ``publication``), its ``tex`` key (from
+    ``publication_tex``), and the ``journal_name`` (from ``journal``).
+
+    The data is read from the pre-joined table ``midpoints_flat`` (see
+    :meth:`create_flat_table`), or joined at run time if the database doesn't
+    contain it. It is fetched in a single (cached, see :meth:`query`) query
+    the first time this method is called, after which the same (read-only)
+    table is returned. Use ``reload=True`` to force the data to be read again.
+
+    If a columnar export of the current database exists (see
+    :meth:`export_columns`), the data is memory-mapped from it instead, so
+    that processes running at the same time share a single copy. Set
+    ``columns=False``, or the environment variable ``MIDPOINTS_COLUMNS`` to
+    ``0``, to always read from the database.
+
+    Rows are returned in the order they are stored in the database, so that
+    e.g.::
+
+        data = base.load()
+        data = data.select(data.notnull('cell') & (data['cell'] != 'Oocyte'))
+        data = data.select(data['na'] > 0)
+        va, stda = data['va'], data['stda']
+
+    gives the same results as ``select va, stda from midpoints_wt where
+    cell != "Oocyte" and na > 0``. Note that, as in sql, rows with a null
+    ``cell`` must be excluded explicitly (see also :meth:`no_oocytes`).
+    """
+    path = base.PATH_DB
+    if not reload:
+        try:
+            return _snapshots[path]
+        except KeyError:
+            pass
+
+    if columns and base.use_columns():
+        try:
+            table = _snapshots[path] = base.open_columns()
+            return table
+        except (FileNotFoundError, ValueError):
+            pass
+
+    with base.connect() as con:
+        names = [row[1] for row in con.execute(
+            f'pragma table_info({base.FLAT_TABLE})') if row[1] != 'id']
+    if names:
+        q = (f'select {", ".join(names)} from {base.FLAT_TABLE}'
+             ' order by id')
+    else:
+        q = ('select m.*, p.author, p.year, p.journal, p.title,'
+             ' (select t.tex from publication_tex as t where t.key = m.pub'
+             '  limit 1) as tex, j.name as journal_name'
+             ' from midpoints_wt as m'
+             ' left join publication as p on m.pub = p.key'
+             ' left join journal as j on p.journal = j.key'
+             ' order by m.rowid')
+    table = _snapshots[path] = base.query(q)
+    return table
+
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+#
+# Materialised, denormalised copy of midpoints_wt with publication details.
+#
+
+# Name of the materialised table
+FLAT_TABLE = 'midpoints_flat'
+
+# Columns added to those of midpoints_wt, with their type, and an expression
+# for their value given a publication key ``{pub}``
+_EXTRA = (
+    ('author', 'text',
+     '(select p.author from publication as p where p.key = {pub})'),
+    ('year', 'int',
+     '(select p.year from publication as p where p.key = {pub})'),
+    ('journal', 'text',
+     '(select p.journal from publication as p where p.key = {pub})'),
+    ('title', 'text',
+     '(select p.title from publication as p where p.key = {pub})'),
+    ('tex', 'text',
+     '(select t.tex from publication_tex as t where t.key = {pub} limit 1)'),
+    ('journal_name', 'text',
+     '(select j.name from publication as p, journal as j'
+     ' where p.key = {pub} and j.key = p.journal)'),
+)
+
+# Columns to index
+_INDEXED = ('pub', 'cell', 'sequence', 'journal')
+
+# Tables that, when changed, require the details of a publication (or of all
+# publications in a journal) to be refreshed, and the rows affected
+_SOURCES = (
+    ('publication', 'pub = {r}.key'),
+    ('publication_tex', 'pub = {r}.key'),
+    ('journal', 'journal = {r}.key'),
+)
+
+
+def create_flat_table(con):
+    """
+    Creates (or recreates) the table ``midpoints_flat`` on the sqlite
+    connection ``con``, containing every row of ``midpoints_wt`` along with
+    the ``author``, ``year``, ``journal``, and ``title`` of its publication,
+    the publication's ``tex`` key (from ``publication_tex``), and the
+    journal's full name (as ``journal_name``, from ``journal``). The column
+    ``id`` numbers the rows in the order they are stored in ``midpoints_wt``.
+
+    Indices are created on the columns most used in filters, and triggers are
+    added to ``midpoints_wt``, ``publication``, ``publication_tex``, and
+    ``journal`` that update the affected rows whenever rows in these tables
+    are inserted, updated, or deleted.
+
+    Because ``midpoints_wt`` has no primary key (and its ``rowid`` can change,
+    e.g. in a ``VACUUM``), rows are matched on their contents: an update or
+    delete in ``midpoints_wt`` changes the first row in ``midpoints_flat``
+    with the same values in all of the ``midpoints_wt`` columns. As a result,
+    if ``midpoints_wt`` contains identical rows and one of them is changed,
+    the changed row can take the place of another in the ``id`` order.
+    """
+    for statement in _statements(con):
+        con.execute(statement)
+    con.commit()
+
+
+def _statements(con):
+    """ Returns the sql statements that (re)create the flat table. """
+    info = con.execute('pragma table_info(midpoints_wt)').fetchall()
+    names = [row[1] for row in info]
+    types = [row[2] for row in info]
+    t = FLAT_TABLE
+
+    def extras(pub):
+        # Expressions for the extra columns
+        return [x[2].format(pub=pub) for x in _EXTRA]
+
+    columns = [f'"{x}"' for x in names] + [x[0] for x in _EXTRA]
+    columns = ', '.join(columns)
+
+    statements = [f'drop table if exists {t}']
+    definitions = ['id integer primary key']
+    definitions += [f'"{x}" {y}' for x, y in zip(names, types)]
+    definitions += [f'{x[0]} {x[1]}' for x in _EXTRA]
+    statements.append(f'create table {t} ({", ".join(definitions)})')
+    statements.append(
+        f'insert into {t} ({columns}) select '
+        + ', '.join([f'm."{x}"' for x in names] + extras('m.pub'))
+        + ' from midpoints_wt as m order by m.rowid')
+    for c in _INDEXED:
+        statements.append(f'create index {t}_{c} on {t} ({c})')
+
+    # Triggers on midpoints_wt, matching rows on their contents
+    others = [x for x in names if x != 'pub']
+    match = (f'(select min(id) from {t} where pub = old.pub'
+             + ''.join(f' and "{x}" is old."{x}"' for x in others) + ')')
+    values = [f'new."{x}"' for x in names] + extras('new.pub')
+    triggers = [
+        ('midpoints_wt', 'insert',
+         f'insert into {t} ({columns}) values ({", ".join(values)});'),
+        ('midpoints_wt', 'delete', f'delete from {t} where id = {match};'),
+        ('midpoints_wt', 'update',
+         f'update {t} set ({columns}) = ({", ".join(values)})'
+         f' where id = {match};'),
+    ]
+
+    # Triggers on the publication tables
+    refresh = f'update {t} set ({", ".join(x[0] for x in _EXTRA)}) = (' + (
+        ', '.join(extras(f'{t}.pub'))) + ') where {rows};'
+    for table, rows in _SOURCES:
+        for event in ('insert', 'delete', 'update'):
+            r = ('new', ) if event == 'insert' else ('old', ) if (
+                event == 'delete') else ('old', 'new')
+            triggers.append((table, event, ' '.join(
+                refresh.format(rows=rows.format(r=x)) for x in r)))
+
+    for table, event, body in triggers:
+        name = f'{t}_{table}_{event}'
+        statements.append(f'drop trigger if exists {name}')
+        statements.append(
+            f'create trigger {name} after {event} on {table}'
+            f' begin {body} end')
+    return statements
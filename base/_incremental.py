@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+#
+# Summary statistics that are kept up to date by triggers on midpoints_wt.
+#
+import sqlite3
+
+import numpy as np
+
+import base
+
+
+# Columns defining the strata for which statistics are stored. Statistics for
+# any union of strata (e.g. all cells except oocytes) are obtained by merging.
+STRATA = ('cell', 'sequence', 'beta1')
+
+# Width of the histogram bins used to estimate quantiles, in mV
+BIN_WIDTH = 0.1
+
+# Quantities for which statistics are stored: the condition for a row to be
+# included, and the values of x and y for that row
+_KINDS = {
+    'a': ('{r}.na > 0', '{r}.va', '{r}.va'),
+    'i': ('{r}.ni > 0', '{r}.vi', '{r}.vi'),
+    'ai': ('{r}.na > 0 and {r}.ni > 0', '{r}.va', '{r}.vi'),
+}
+
+_TABLES = '''
+create table if not exists stats_moments (
+    {keys}, kind text not null,
+    n int not null, mean_x float not null, mean_y float not null,
+    m2_x float not null, m2_y float not null, c_xy float not null,
+    primary key ({strata}, kind)
+);
+create table if not exists stats_histogram (
+    {keys}, kind text not null, bin int not null, count int not null,
+    primary key ({strata}, kind, bin)
+);
+'''
+
+
+def install_statistics():
+    """
+    Creates the tables ``stats_moments`` and ``stats_histogram`` in the
+    database, fills them from the current contents of ``midpoints_wt``, and
+    adds triggers that keep them up to date whenever rows are inserted,
+    updated, or deleted.
+
+    For every stratum (a combination of the ``STRATA`` columns, with nulls
+    stored as ``''``), three sets of statistics are stored: for ``Va`` in rows
+    with ``na > 0`` (kind ``'a'``), for ``Vi`` in rows with ``ni > 0`` (kind
+    ``'i'``), and for the pair ``(Va, Vi)`` in rows with both (kind
+    ``'ai'``). Each set contains the count, the means, the sums of squared
+    deviations, and the sum of cross-products of the deviations, which the
+    triggers update with Welford's method, so that no rescan is needed. The
+    histograms count the values of ``Va`` and ``Vi``, rounded to multiples of
+    ``BIN_WIDTH`` mV, and can be added up over strata to obtain quantiles.
+
+    Any existing statistics tables and triggers are replaced. Use
+    :meth:`remove_statistics` to remove them again, e.g. before a bulk load.
+    """
+    remove_statistics()
+    with base.connect(readonly=False) as con:
+        keys = ', '.join(f'{c} text not null' for c in STRATA)
+        con.executescript(_TABLES.format(keys=keys, strata=', '.join(STRATA)))
+
+        # Initial contents, from a single scan of the table
+        select = ', '.join(f'ifnull({c}, \'\') as {c}' for c in STRATA)
+        data = base.fetch(
+            con, f'select va, vi, na, ni, {select} from midpoints_wt')
+        moments, histogram = _initial(data)
+        marks = ', '.join('?' * len(moments[0])) if moments else ''
+        con.executemany(
+            f'insert into stats_moments values ({marks})', moments)
+        marks = ', '.join('?' * len(histogram[0])) if histogram else ''
+        con.executemany(
+            f'insert into stats_histogram values ({marks})', histogram)
+
+        # Triggers
+        columns = ', '.join(('va', 'vi', 'na', 'ni') + STRATA)
+        con.executescript(
+            'create trigger stats_insert after insert on midpoints_wt begin\n'
+            + _add('new', 1) + 'end;\n'
+            'create trigger stats_delete after delete on midpoints_wt begin\n'
+            + _add('old', -1) + 'end;\n'
+            f'create trigger stats_update after update of {columns}'
+            ' on midpoints_wt begin\n'
+            + _add('old', -1) + _add('new', 1) + 'end;\n')
+        con.commit()
+
+
+def remove_statistics():
+    """
+    Removes the tables and triggers created by :meth:`install_statistics`, if
+    present.
+    """
+    with base.connect(readonly=False) as con:
+        con.executescript(
+            'drop trigger if exists stats_insert;'
+            'drop trigger if exists stats_delete;'
+            'drop trigger if exists stats_update;'
+            'drop table if exists stats_moments;'
+            'drop table if exists stats_histogram;')
+        con.commit()
+
+
+def incremental_statistics(include=None, exclude=None,
+                           quantiles=(5, 50, 95)):
+    """
+    Returns summary statistics for all rows of ``midpoints_wt`` in the
+    selected strata, using the tables maintained by the triggers created with
+    :meth:`install_statistics`.
+
+    Arguments:
+
+    ``include``
+        An optional dict mapping columns in ``STRATA`` to lists of values, to
+        select only rows with one of these values. Use ``None`` to select rows
+        where the column is null (or empty).
+    ``exclude``
+        An optional dict mapping columns in ``STRATA`` to lists of values, to
+        exclude rows with one of these values. As with ``!=`` in sql (and
+        :meth:`no_oocytes`), rows where the column is null (or empty) are
+        excluded too.
+    ``quantiles``
+        The percentiles to estimate for ``Va`` and ``Vi``.
+
+    For example, the Va/Vi fit for HEK cells is obtained with
+    ``incremental_statistics(include={'cell': ['HEK']})``, and statistics for
+    all data except oocytes with
+    ``incremental_statistics(exclude={'cell': ['Oocyte']})``.
+
+    The moments of the selected strata are merged exactly, so that the time
+    taken depends only on the number of strata and histogram bins, not on the
+    number of rows. Quantiles are calculated from the histograms, with each
+    value rounded to the nearest multiple of ``BIN_WIDTH``.
+
+    Returns a :class:`Table` with a single row, and columns ``n_a``,
+    ``mean_a``, ``std_a`` (for Va in rows with ``na > 0``), ``n_i``,
+    ``mean_i``, ``std_i`` (for Vi in rows with ``ni > 0``), ``n`` (the
+    number of rows with both), and ``intercept``, ``slope``, and ``r`` (the
+    least-squares fit of Vi against Va, and Pearson's correlation
+    coefficient, in rows with both). For every percentile ``p`` there are
+    columns ``a_p`` and ``i_p`` (e.g. ``a_50`` for the median of Va).
+    """
+    where, parameters = [], []
+    for values, negate in ((include, False), (exclude, True)):
+        for column, v in (values or {}).items():
+            if column not in STRATA:
+                raise ValueError(f'Unknown stratum column: {column}.')
+            v = ['' if x is None else str(x) for x in v]
+            if negate and '' not in v:
+                v.append('')
+            marks = ', '.join('?' * len(v))
+            where.append(f'{column} {"not " if negate else ""}in ({marks})')
+            parameters.extend(v)
+    where = ' and '.join(where) or '1'
+
+    with base.connect() as con:
+        try:
+            m = base.fetch(
+                con, 'select kind, n, mean_x, mean_y, m2_x, m2_y, c_xy'
+                f' from stats_moments where {where} and n > 0', parameters)
+        except sqlite3.OperationalError as e:
+            if 'no such table' in str(e):
+                raise RuntimeError(
+                    'Statistics have not been installed, see'
+                    ' install_statistics().') from e
+            raise
+        if quantiles:
+            h = base.fetch(
+                con, 'select kind, bin, sum(count) as count'
+                f' from stats_histogram where {where} and count > 0'
+                ' group by kind, bin order by kind, bin', parameters)
+
+    columns = {}
+    stats = {kind: _merge(m.select(m['kind'] == kind)) for kind in _KINDS}
+    for kind in ('a', 'i'):
+        n, mx, _, m2x, _, _ = stats[kind]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns['n_' + kind] = np.array([n])
+            columns['mean_' + kind] = np.array([mx])
+            columns['std_' + kind] = np.array([np.sqrt(m2x / (n - 1))])
+    n, mx, my, m2x, m2y, cxy = stats['ai']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = cxy / m2x
+        columns['n'] = np.array([n])
+        columns['intercept'] = np.array([my - slope * mx])
+        columns['slope'] = np.array([slope])
+        columns['r'] = np.array([cxy / np.sqrt(m2x * m2y)])
+    for kind in ('a', 'i') if quantiles else ():
+        sel = h['kind'] == kind
+        q = _quantiles(h['bin'][sel], h['count'][sel], quantiles)
+        for p, x in zip(quantiles, q):
+            columns[f'{kind}_{p}'] = np.array([x])
+    return base.Table(columns)
+
+
+def _add(row, sign):
+    """
+    Returns the SQL statements that add (``sign=1``) or remove (``sign=-1``)
+    the trigger row ``row`` (``'new'`` or ``'old'``) to the statistics.
+    """
+    keys = ', '.join(f'ifnull({row}.{c}, \'\')' for c in STRATA)
+    match = ' and '.join(f'{c} = ifnull({row}.{c}, \'\')' for c in STRATA)
+    sql = []
+    for kind, (condition, x, y) in _KINDS.items():
+        condition = condition.format(r=row)
+        x, y = x.format(r=row), y.format(r=row)
+        if sign > 0:
+            # Welford: with all right-hand sides using the old values
+            f = '(n + 1.0)'
+            update = (
+                f'n = n + 1, mean_x = mean_x + ({x} - mean_x) / {f},'
+                f' mean_y = mean_y + ({y} - mean_y) / {f},'
+                f' m2_x = m2_x + ({x} - mean_x) * ({x} - mean_x) * n / {f},'
+                f' m2_y = m2_y + ({y} - mean_y) * ({y} - mean_y) * n / {f},'
+                f' c_xy = c_xy + ({x} - mean_x) * ({y} - mean_y) * n / {f}')
+            sql.append(
+                f'insert or ignore into stats_moments select {keys},'
+                f' \'{kind}\', 0, 0, 0, 0, 0, 0 where {condition};')
+        else:
+            # Welford in reverse, resetting to zero when the last row is gone
+            f = '(n - 1.0)'
+            update = (
+                f'n = n - 1,'
+                f' mean_x = case when n = 1 then 0'
+                f' else mean_x - ({x} - mean_x) / {f} end,'
+                f' mean_y = case when n = 1 then 0'
+                f' else mean_y - ({y} - mean_y) / {f} end,'
+                f' m2_x = case when n = 1 then 0'
+                f' else m2_x - ({x} - mean_x) * ({x} - mean_x) * n / {f} end,'
+                f' m2_y = case when n = 1 then 0'
+                f' else m2_y - ({y} - mean_y) * ({y} - mean_y) * n / {f} end,'
+                f' c_xy = case when n = 1 then 0'
+                f' else c_xy - ({x} - mean_x) * ({y} - mean_y) * n / {f} end')
+        sql.append(
+            f'update stats_moments set {update}'
+            f' where {match} and kind = \'{kind}\' and {condition};')
+        if kind == 'ai':
+            continue
+
+        # Histogram bin: the nearest multiple of BIN_WIDTH, rounding down
+        b = f'({x} / {BIN_WIDTH} + 0.5)'
+        b = f'(cast({b} as int) - ({b} < cast({b} as int)))'
+        if sign > 0:
+            sql.append(
+                f'insert or ignore into stats_histogram select {keys},'
+                f' \'{kind}\', {b}, 0 where {condition};')
+        sql.append(
+            f'update stats_histogram set count = count + {sign}'
+            f' where {match} and kind = \'{kind}\' and bin = {b}'
+            f' and {condition};')
+    return '\n'.join(sql) + '\n'
+
+
+def _initial(data):
+    """
+    Returns lists of rows for ``stats_moments`` and ``stats_histogram``,
+    calculated from the columns in ``data``.
+    """
+    keys = np.stack([np.asarray(data[c], dtype=str) for c in STRATA], axis=1)
+    strata, codes = np.unique(keys, axis=0, return_inverse=True)
+    codes = codes.reshape(-1)
+    s = len(strata)
+    va, vi = data.numeric('va'), data.numeric('vi')
+    na, ni = data.numeric('na'), data.numeric('ni')
+    use = {'a': (na > 0, va, va), 'i': (ni > 0, vi, vi),
+           'ai': ((na > 0) & (ni > 0), va, vi)}
+
+    moments, histogram = [], []
+    for kind, (sel, x, y) in use.items():
+        c, x, y = codes[sel], x[sel], y[sel]
+        n = np.bincount(c, minlength=s)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mx = np.bincount(c, weights=x, minlength=s) / n
+            my = np.bincount(c, weights=y, minlength=s) / n
+        dx, dy = x - mx[c], y - my[c]
+        m2x = np.bincount(c, weights=dx * dx, minlength=s)
+        m2y = np.bincount(c, weights=dy * dy, minlength=s)
+        cxy = np.bincount(c, weights=dx * dy, minlength=s)
+        for j in np.flatnonzero(n):
+            moments.append(tuple(strata[j]) + (kind, int(n[j]), mx[j], my[j],
+                                               m2x[j], m2y[j], cxy[j]))
+        if kind == 'ai':
+            continue
+        bins = np.floor(x / BIN_WIDTH + 0.5).astype(int)
+        pairs, count = np.unique(
+            np.stack([c, bins], axis=1), axis=0, return_counts=True)
+        for (j, b), k in zip(pairs, count):
+            histogram.append(tuple(strata[j]) + (kind, int(b), int(k)))
+    return moments, histogram
+
+
+def _merge(m):
+    """
+    Merges the moments in the rows of table ``m``, and returns a tuple
+    ``(n, mean_x, mean_y, m2_x, m2_y, c_xy)``.
+    """
+    n = m['n'].astype(float)
+    total = np.sum(n)
+    if total == 0:
+        return (0, np.nan, np.nan, np.nan, np.nan, np.nan)
+    mx = np.sum(n * m['mean_x']) / total
+    my = np.sum(n * m['mean_y']) / total
+    dx, dy = m['mean_x'] - mx, m['mean_y'] - my
+    return (int(total), mx, my,
+            np.sum(m['m2_x'] + n * dx * dx),
+            np.sum(m['m2_y'] + n * dy * dy),
+            np.sum(m['c_xy'] + n * dx * dy))
+
+
+def _quantiles(bins, counts, percentiles):
+    """
+    Estimates the given ``percentiles`` from a histogram, with the values in
+    each bin at its centre, and interpolating between ranks as done by
+    ``np.percentile``.
+    """
+    counts = np.asarray(counts, dtype=float)
+    total = np.sum(counts)
+    if total == 0:
+        return [np.nan] * len(percentiles)
+    values = BIN_WIDTH * np.asarray(bins, dtype=float)
+    last = np.cumsum(counts) - 1
+    out = []
+    for p in percentiles:
+        # Values of the points with the ranks on either side
+        rank = p / 100 * (total - 1)
+        lo = np.floor(rank)
+        a = values[np.searchsorted(last, lo)]
+        b = values[np.searchsorted(last, min(lo + 1, total - 1))]
+        out.append(a + (rank - lo) * (b - a))
+    return out
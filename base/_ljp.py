@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+#
+# Alternative liquid junction potential (LJP) corrections, and their effect on
+# the summary statistics.
+#
+import numpy as np
+
+import base
+
+
+# Shared arrays, set in each worker by _init
+_shared = None
+
+
+def ljp_offsets(data, known=False, impute=False, offset=None):
+    """
+    Returns an array with the offset (in mV) to subtract from the reported
+    midpoints of every row in ``data``, under an alternative LJP correction.
+
+    Rows for which ``ljp_corrected`` is ``'yes'`` are left unchanged. For all
+    other rows, the offset is chosen from (in order of preference):
+
+    ``known``
+        If ``True``, the reported ``ljp``, where given.
+    ``impute``
+        If ``True``, the mean reported ``ljp`` of all rows (corrected or not)
+        with the same (known) combination of ``mix_e`` and ``mix_i``, where
+        at least one such row reports an LJP.
+    ``offset``
+        If not ``None``, a fixed offset used for all remaining rows. As with
+        the other offsets, this is subtracted from the midpoints, so that e.g.
+        ``offset=10`` moves them by -10 mV.
+
+    Rows for which no offset can be chosen are left unchanged.
+    """
+    ljp = data.numeric('ljp')
+    corrected = np.asarray(data['ljp_corrected'], dtype=object)
+    uncorrected = np.not_equal(corrected, 'yes')
+    offsets = np.full(len(data), np.nan)
+    if known:
+        offsets = np.where(np.isfinite(offsets), offsets, ljp)
+    if impute:
+        # Mean known LJP per (mix_e, mix_i) combination
+        mix_e = np.asarray(data['mix_e'], dtype=object)
+        mix_i = np.asarray(data['mix_i'], dtype=object)
+        labels = np.char.add(
+            mix_e.astype(str), np.char.add('\0', mix_i.astype(str)))
+        _, codes = np.unique(labels, return_inverse=True)
+        codes = codes.reshape(-1)
+        mixed = np.not_equal(mix_e, None) & np.not_equal(mix_i, None)
+        has = np.isfinite(ljp) & mixed
+        count = np.bincount(codes[has])
+        total = np.bincount(codes[has], weights=ljp[has])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.full(np.max(codes, initial=-1) + 1, np.nan)
+            mean[:len(count)] = total / count
+        mean = np.where(mixed, mean[codes], np.nan)
+        offsets = np.where(np.isfinite(offsets), offsets, mean)
+    if offset is not None:
+        offsets = np.where(np.isfinite(offsets), offsets, offset)
+    return np.where(uncorrected & np.isfinite(offsets), offsets, 0)
+
+
+def ljp_scenarios(data, scenarios, groupings=None, workers=None):
+    """
+    Applies alternative LJP corrections to the midpoints in ``data``, and
+    recalculates the main statistics for each.
+
+    Arguments:
+
+    ``data``
+        A :class:`Table` as returned by :meth:`load()`, or a selection from it.
+    ``scenarios``
+        A dict mapping scenario names to dicts of keyword arguments for
+        :meth:`ljp_offsets`. An empty dict leaves the data unchanged.
+    ``groupings``
+        An optional dict mapping grouping names to arrays of labels, one per
+        row, for which subgroup statistics are calculated. Rows with a label
+        of ``None`` are ignored for that grouping.
+    ``workers``
+        The number of processes to use (default: one per CPU).
+
+    The offsets for all scenarios are calculated together, and the shared
+    arrays are sent to each worker process once, after which each scenario is
+    handled by a single task, see :meth:`parallel_map`.
+
+    Returns a tuple ``(fits, summaries, subgroups)`` of :class:`Table` objects.
+
+    ``fits`` has a row per scenario with the fit of ``Vi`` against ``Va`` of
+    figure 3, using the rows with both, and columns ``scenario``, ``n``,
+    ``shifted`` (the number of rows changed), ``intercept``, ``slope``, ``r``
+    (Pearson's correlation coefficient), ``offset`` (the intercept of a fit
+    with slope 1), ``mean_va``, and ``mean_vi``.
+
+    ``summaries`` has a row per scenario and quantity (``Va`` or ``Vi``),
+    using all rows with a nonzero number of cells for that quantity, and
+    columns ``scenario``, ``quantity``, ``n``, ``min``, ``max``, ``median``,
+    ``range``, and ``p90`` (the width of the 5th to 95th percentile range), as
+    calculated in ``d3-means.py``.
+
+    ``subgroups`` has a row per scenario, grouping, level, and quantity, with
+    columns ``scenario``, ``grouping``, ``level``, ``quantity``, ``n``,
+    ``mean``, and ``std``.
+    """
+    names = list(scenarios)
+    if not names:
+        raise ValueError('At least one scenario must be given.')
+    offsets = np.stack([ljp_offsets(data, **scenarios[x]) for x in names])
+    values = np.stack([data.numeric('va'), data.numeric('vi')], axis=1)
+    counts = np.stack([data.numeric('na'), data.numeric('ni')], axis=1)
+    use = np.nan_to_num(counts) > 0
+
+    # Code the subgroup labels once, numbering levels across groupings
+    levels, points, groups = [], [], []
+    for grouping, labels in (groupings or {}).items():
+        labels = np.asarray(labels, dtype=object)
+        if len(labels) != len(data):
+            raise ValueError(f'Wrong number of labels for {grouping}.')
+        keep = np.flatnonzero(np.not_equal(labels, None))
+        x = labels[keep]
+        _, first, codes = np.unique(
+            x.astype(str), return_index=True, return_inverse=True)
+        points.append(keep)
+        groups.append(codes.reshape(-1) + len(levels))
+        levels.extend((grouping, v) for v in x[first])
+    points = np.concatenate(points) if points else np.zeros(0, dtype=int)
+    groups = np.concatenate(groups) if groups else np.zeros(0, dtype=int)
+
+    results = base.parallel_map(
+        _scenario, range(len(names)), workers, _init,
+        ((values, use, offsets, points, groups, len(levels)), ))
+
+    # Fits
+    columns = ('n', 'shifted', 'intercept', 'slope', 'r', 'offset',
+               'mean_va', 'mean_vi')
+    fits = {'scenario': np.array(names, dtype=object)}
+    for i, c in enumerate(columns):
+        fits[c] = np.array([r[0][i] for r in results])
+    for c in ('n', 'shifted'):
+        fits[c] = fits[c].astype(int)
+
+    # Summaries
+    q = np.array(['Va', 'Vi'], dtype=object)
+    summaries = {
+        'scenario': np.repeat(np.array(names, dtype=object), 2),
+        'quantity': np.tile(q, len(names)),
+    }
+    columns = ('n', 'min', 'max', 'median', 'range', 'p90')
+    for i, c in enumerate(columns):
+        summaries[c] = np.concatenate([r[1][i] for r in results])
+    summaries['n'] = summaries['n'].astype(int)
+
+    # Subgroups
+    g = len(levels)
+    grouping = np.array([x[0] for x in levels], dtype=object)
+    level = np.empty(g, dtype=object)
+    level[:] = [x[1] for x in levels]
+    subgroups = {
+        'scenario': np.repeat(np.array(names, dtype=object), 2 * g),
+        'grouping': np.tile(np.repeat(grouping, 2), len(names)),
+        'level': np.tile(np.repeat(level, 2), len(names)),
+        'quantity': np.tile(q, g * len(names)),
+    }
+    for i, c in enumerate(('n', 'mean', 'std')):
+        subgroups[c] = np.concatenate([r[2][i].reshape(-1) for r in results])
+    subgroups['n'] = subgroups['n'].astype(int)
+
+    return base.Table(fits), base.Table(summaries), base.Table(subgroups)
+
+
+def _scenario(s):
+    """
+    Calculates the fit, summaries, and subgroup statistics for the scenario
+    with index ``s``.
+    """
+    values, use, offsets, points, groups, g = _shared
+    offset = offsets[s]
+    v = values - offset[:, None]
+
+    # Fit of Vi against Va, using rows with both
+    both = use[:, 0] & use[:, 1]
+    va, vi = v[both, 0], v[both, 1]
+    ma, mi = np.mean(va), np.mean(vi)
+    sxx = np.sum((va - ma)**2)
+    syy = np.sum((vi - mi)**2)
+    sxy = np.sum((va - ma) * (vi - mi))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = sxy / sxx
+        r = sxy / np.sqrt(sxx * syy)
+    fit = (np.sum(both), np.sum(offset != 0), mi - slope * ma, slope, r,
+           mi - ma, ma, mi)
+
+    # Summaries, as in d3-means.py
+    summary = np.full((6, 2), np.nan)
+    for j in range(2):
+        x = v[use[:, j], j]
+        summary[0, j] = len(x)
+        if len(x):
+            p5, median, p95 = np.percentile(x, [5, 50, 95])
+            lo, hi = np.min(x), np.max(x)
+            summary[1:, j] = (lo, hi, median, hi - lo, p95 - p5)
+
+    # Mean and standard deviation per subgroup and quantity
+    n = np.zeros((g, 2))
+    mean = np.full((g, 2), np.nan)
+    std = np.full((g, 2), np.nan)
+    for j in range(2):
+        sel = use[points, j]
+        p, G = points[sel], groups[sel]
+        x = v[p, j]
+        k = np.bincount(G, minlength=g)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mu = np.bincount(G, weights=x, minlength=g) / k
+            ss = np.bincount(G, weights=(x - mu[G])**2, minlength=g)
+            n[:, j] = k
+            mean[:, j] = mu
+            std[:, j] = np.sqrt(ss / (k - 1))
+    return fit, summary, (n, mean, std)
+
+
+def _init(shared):
+    """ Stores the shared arrays in a worker process. """
+    global _shared
+    _shared = shared
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+#
+# Fixed-effect and random-effects meta-analysis of subgroups.
+#
+import numpy as np
+
+import base
+
+
+# Methods supported by meta_analysis
+METHODS = ('fixed', 'dl', 'pm', 'reml')
+
+# Quantile of the standard normal distribution for 95% confidence intervals
+Z95 = 1.959963984540054
+
+
+def meta_analysis(groupings, estimates, variances, names=None,
+                  methods=METHODS, max_iter=100, tolerance=1e-10):
+    """
+    Calculates inverse-variance weighted pooled estimates for one or more
+    quantities, in every level of one or more groupings, using a fixed-effect
+    model and/or random-effects models.
+
+    Arguments:
+
+    ``groupings``
+        A dict mapping grouping names to arrays of labels, one per point.
+        Points with a label of ``None`` are ignored for that grouping. To pool
+        all points, use a grouping with the same label for every point.
+    ``estimates``
+        An array of shape ``(n, m)`` with the estimates (e.g. reported means)
+        of ``m`` quantities.
+    ``variances``
+        An array of shape ``(n, m)`` with the sampling variance of every
+        estimate (e.g. the squared standard error). Points with a NaN estimate
+        or a variance that is NaN or not positive are ignored for that
+        quantity.
+    ``names``
+        An optional list of names for the ``m`` quantities.
+    ``methods``
+        The methods to use, any of ``'fixed'`` (fixed-effect), ``'dl'``
+        (random-effects, DerSimonian-Laird), ``'pm'`` (random-effects,
+        Paule-Mandel), and ``'reml'`` (random-effects, restricted maximum
+        likelihood).
+    ``max_iter``
+        The maximum number of iterations for the Paule-Mandel and REML
+        estimates of the between-study variance.
+    ``tolerance``
+        The absolute tolerance on the between-study variance at which these
+        iterations stop.
+
+    All levels of all groupings are analysed together: every point is listed
+    once for every level it belongs to, and all sums over levels are
+    calculated with a single ``bincount`` over this list. The iterative
+    estimates update the between-study variance of all levels at once, using
+    Newton's method (inside a bracket) for Paule-Mandel and Fisher scoring
+    for REML, so that the cost per iteration is linear in the number of
+    points times the number of groupings. Levels that have converged are
+    dropped from subsequent iterations.
+
+    Returns a :class:`Table` with a row for every grouping, level, quantity,
+    and method, and columns ``grouping``, ``level``, ``quantity``,
+    ``method``, ``k`` (the number of points), ``estimate`` (the pooled
+    estimate), ``se`` (its standard error), ``lo`` and ``hi`` (a 95%
+    confidence interval), ``tau2`` (the between-study variance, zero for the
+    fixed-effect model), ``i2`` (the percentage of variability due to
+    between-study variance, calculated from ``tau2``), ``q`` (Cochran's Q),
+    and ``p_q`` (the p-value of a chi-squared test for heterogeneity). For
+    levels with a single point, ``tau2``, ``i2``, ``q``, and ``p_q`` are NaN,
+    and all methods return the point itself.
+    """
+    import scipy.stats
+
+    estimates = np.asarray(estimates, dtype=float)
+    variances = np.asarray(variances, dtype=float)
+    if estimates.ndim == 1:
+        estimates = estimates.reshape(-1, 1)
+    if variances.ndim == 1:
+        variances = variances.reshape(-1, 1)
+    if estimates.ndim != 2 or estimates.shape != variances.shape:
+        raise ValueError('Estimates and variances must have the same shape.')
+    n, m = estimates.shape
+    names = [f'y{i}' for i in range(m)] if names is None else list(names)
+    if len(names) != m:
+        raise ValueError('Number of names must match number of quantities.')
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        raise ValueError('Unknown method(s): ' + ', '.join(sorted(unknown)))
+
+    # List every (point, level) membership, numbering levels across groupings
+    levels, points, groups = [], [], []
+    for grouping, labels in groupings.items():
+        labels = np.asarray(labels, dtype=object)
+        if len(labels) != n:
+            raise ValueError(f'Wrong number of labels for {grouping}.')
+        keep = np.flatnonzero(np.not_equal(labels, None))
+        # Levels are sorted on their string representation, which can be done
+        # without a Python-level loop
+        x = labels[keep]
+        _, first, codes = np.unique(
+            x.astype(str), return_index=True, return_inverse=True)
+        values = x[first]
+        points.append(keep)
+        groups.append(codes.reshape(-1) + len(levels))
+        levels.extend((grouping, x) for x in values)
+    points = np.concatenate(points) if points else np.zeros(0, dtype=int)
+    groups = np.concatenate(groups) if groups else np.zeros(0, dtype=int)
+    g = len(levels)
+
+    results = []
+    for j in range(m):
+        y, v = estimates[:, j], variances[:, j]
+        ok = np.isfinite(y) & np.isfinite(v) & (v > 0)
+        sel = ok[points]
+        p, G = points[sel], groups[sel]
+        y, v = y[p], v[p]
+
+        def total(x):
+            return np.bincount(G, weights=x, minlength=g)
+
+        k = np.bincount(G, minlength=g)
+        df = k - 1.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Fixed effect
+            w = 1 / v
+            sw, sw2 = total(w), total(w * w)
+            mu = total(w * y) / sw
+            q = total(w * (y - mu[G])**2)
+            c = sw - sw2 / sw
+            s2 = df * sw / (sw * sw - sw2)
+            multi = k > 1
+            p_q = np.where(multi, scipy.stats.chi2.sf(q, df), np.nan)
+
+            # Between-study variances
+            tau2 = {'fixed': np.zeros(g)}
+            dl = np.where(multi, np.maximum(0, (q - df) / c), np.nan)
+            if 'dl' in methods:
+                tau2['dl'] = dl
+            if 'pm' in methods:
+                tau2['pm'] = _paule_mandel(
+                    y, v, G, k, multi & (q > df), dl, max_iter, tolerance)
+            if 'reml' in methods:
+                tau2['reml'] = _reml(
+                    y, v, G, k, multi, dl, max_iter, tolerance)
+
+            for method in methods:
+                t2 = tau2[method]
+                w = 1 / (v + np.where(multi, t2, 0)[G])
+                sw = total(w)
+                est = total(w * y) / sw
+                se = 1 / np.sqrt(sw)
+                if method == 'fixed':
+                    t2 = np.where(multi, 0, np.nan)
+                i2 = 100 * t2 / (t2 + s2)
+                results.append((k, est, se, est - Z95 * se, est + Z95 * se,
+                                t2, i2, np.where(multi, q, np.nan), p_q))
+
+    # Create table, ordered by level, then quantity, then method
+    rows = []
+    for i, level in enumerate(levels):
+        for j, name in enumerate(names):
+            for h, method in enumerate(methods):
+                r = results[j * len(methods) + h]
+                if r[0][i] > 0:
+                    rows.append(level + (name, method)
+                                + tuple(x[i] for x in r))
+    columns = ('grouping', 'level', 'quantity', 'method', 'k', 'estimate',
+               'se', 'lo', 'hi', 'tau2', 'i2', 'q', 'p_q')
+    if not rows:
+        return base.Table((c, np.zeros(0)) for c in columns)
+    return base.Table(
+        (c, np.array(x, dtype=object if i < 4 else None))
+        for i, (c, x) in enumerate(zip(columns, zip(*rows))))
+
+
+def _paule_mandel(y, v, groups, k, positive, start, max_iter, tolerance):
+    """
+    Returns the Paule-Mandel estimate of the between-study variance for every
+    level, i.e. the value at which the generalised Q statistic equals its
+    expected value ``k - 1``. Levels with ``positive=False`` have a Q that
+    doesn't exceed its expected value at zero, and so get an estimate of zero
+    (or NaN if ``k < 2``).
+
+    The generalised Q decreases monotonically with the between-study
+    variance, so the root lies between zero and the (unweighted) sum of
+    squared deviations divided by ``k - 1``. Newton steps are taken from
+    ``start`` inside this bracket, and replaced by bisection if they leave
+    it.
+    """
+    g = len(k)
+
+    def total(x):
+        return np.bincount(groups, weights=x, minlength=g)
+
+    df = k - 1.0
+    mean = total(y) / k
+    lo = np.zeros(g)
+    hi = total((y - mean[groups])**2) / df
+    t2 = np.where(positive, np.clip(start, lo, hi), 0)
+    active = positive.copy()
+    for i in range(max_iter):
+        w = 1 / (v + t2[groups])
+        sw = total(w)
+        r = y - (total(w * y) / sw)[groups]
+        f = total(w * r * r) - df
+        lo = np.where(f > 0, t2, lo)
+        hi = np.where(f < 0, t2, hi)
+        new = t2 + f / total(w * w * r * r)
+        new = np.where((new > lo) & (new < hi), new, (lo + hi) / 2)
+        step = np.where(active, new - t2, 0)
+        t2 = t2 + step
+        active &= np.abs(step) > tolerance
+        if not np.any(active):
+            break
+        y, v, groups = _drop(active, y, v, groups)
+    return np.where(k > 1, t2, np.nan)
+
+
+def _reml(y, v, groups, k, multi, start, max_iter, tolerance):
+    """
+    Returns the restricted maximum likelihood estimate of the between-study
+    variance for every level, using Fisher scoring from ``start`` and
+    truncating at zero.
+    """
+    g = len(k)
+
+    def total(x):
+        return np.bincount(groups, weights=x, minlength=g)
+
+    t2 = np.where(multi, start, 0)
+    active = multi.copy()
+    for i in range(max_iter):
+        w = 1 / (v + t2[groups])
+        sw, sw2, sw3 = total(w), total(w * w), total(w * w * w)
+        r = y - (total(w * y) / sw)[groups]
+        trace = sw - sw2 / sw
+        info = sw2 - 2 * sw3 / sw + (sw2 / sw)**2
+        new = np.maximum(0, t2 + (total(w * w * r * r) - trace) / info)
+        step = np.where(active, new - t2, 0)
+        t2 = t2 + step
+        active &= np.abs(step) > tolerance
+        if not np.any(active):
+            break
+        y, v, groups = _drop(active, y, v, groups)
+    return np.where(multi, t2, np.nan)
+
+
+def _drop(active, y, v, groups):
+    """
+    Removes the points in levels that are no longer ``active``, if this
+    removes at least half of the remaining points.
+    """
+    keep = active[groups]
+    if 2 * np.count_nonzero(keep) > len(keep):
+        return y, v, groups
+    return y[keep], v[keep], groups[keep]
+
+
+def bivariate_meta_analysis(x, y, var_x, var_y, max_iter=200,
+                            tolerance=1e-10):
+    """
+    Fits a bivariate random-effects model to pairs of estimates ``(x, y)``
+    (e.g. reported mean midpoints of activation and inactivation), with known
+    within-study variances ``var_x`` and ``var_y``, using restricted maximum
+    likelihood (REML).
+
+    Each pair is modelled as drawn from a bivariate normal distribution with
+    mean ``mu`` and covariance ``S + T``, where ``S`` is the diagonal matrix of
+    within-study variances and ``T`` the between-study covariance matrix. Pairs
+    with a NaN estimate, or a variance that is NaN or not positive, are
+    ignored.
+
+    Arguments:
+
+    ``x``, ``y``
+        The estimates.
+    ``var_x``, ``var_y``
+        The within-study (sampling) variance of every estimate, e.g. the
+        squared standard errors.
+    ``max_iter``
+        The maximum number of iterations of the optimiser.
+    ``tolerance``
+        The tolerance on the projected gradient at which the optimiser stops.
+
+    The between-study covariance is parameterised by its Cholesky factor, with
+    the logarithm of the diagonal entries, so that every parameter value gives
+    a valid covariance matrix. The negative restricted log-likelihood and its
+    analytic gradient are evaluated with vectorised 2x2 matrix algebra over
+    all pairs, and minimised with L-BFGS, starting from a method-of-moments
+    estimate. This typically takes a few milliseconds for thousands of pairs,
+    so that the fit can be used inside bootstrap loops.
+
+    Returns a :class:`Table` with a single row, and columns ``k`` (the number
+    of pairs used), ``mean_x``, ``mean_y`` (the pooled estimates), ``se_x``,
+    ``se_y``, ``cov_xy`` (their standard errors and covariance), ``tau2_x``,
+    ``tau2_y``, ``tau_xy`` (the entries of ``T``), ``rho`` (the between-study
+    correlation), ``slope`` and ``intercept`` (of the line through the pooled
+    estimates, along the main axis of the between-study distribution,
+    ``y = intercept + slope * x``), ``loglik`` (the maximised restricted
+    log-likelihood), ``iterations``, and ``converged``. If the between-study
+    covariance ``tau_xy`` is zero, the main axis is horizontal (``slope=0``)
+    if ``tau2_x >= tau2_y``, and vertical otherwise, in which case ``slope``
+    is ``inf`` and ``intercept`` is NaN.
+    """
+    import scipy.optimize
+
+    y = np.stack([np.asarray(v, dtype=float) for v in (x, y)], axis=1)
+    s = np.stack([np.asarray(v, dtype=float) for v in (var_x, var_y)], axis=1)
+    if y.ndim != 2 or y.shape != s.shape:
+        raise ValueError('Expecting 1d arrays of equal length.')
+    ok = np.all(np.isfinite(y) & np.isfinite(s) & (s > 0), axis=1)
+    y, s = y[ok], s[ok]
+    k = len(y)
+    if k < 3:
+        raise ValueError('At least three pairs are needed.')
+
+    # Start from a method-of-moments estimate, made positive definite
+    t, u = np.linalg.eigh(np.cov(y, rowvar=False) - np.diag(np.mean(s, 0)))
+    t = np.maximum(t, 1e-3 * np.mean(s))
+    L = np.linalg.cholesky((u * t) @ u.T)
+    theta = np.array([np.log(L[0, 0]), L[1, 0], np.log(L[1, 1])])
+
+    res = scipy.optimize.minimize(
+        _bivariate_objective, theta, args=(y, s), jac=True,
+        method='L-BFGS-B',
+        options=dict(maxiter=max_iter, gtol=tolerance, ftol=0))
+
+    f, _, mu, H = _bivariate_objective(res.x, y, s, full=True)
+    T = _cholesky(res.x)
+    C = np.linalg.inv(H)
+    t2x, t2y, txy = T[0, 0], T[1, 1], T[0, 1]
+
+    # Main axis of the between-study distribution, using the form without
+    # cancellation for each sign of d
+    d = t2y - t2x
+    r = np.hypot(d, 2 * txy)
+    if txy == 0:
+        slope = 0.0 if d <= 0 else np.inf
+    elif d < 0:
+        slope = 2 * txy / (r - d)
+    else:
+        with np.errstate(over='ignore'):
+            slope = (d + r) / (2 * txy)
+    intercept = mu[1] - slope * mu[0] if np.isfinite(slope) else np.nan
+
+    names = ('k', 'mean_x', 'mean_y', 'se_x', 'se_y', 'cov_xy', 'tau2_x',
+             'tau2_y', 'tau_xy', 'rho', 'slope', 'intercept', 'loglik',
+             'iterations', 'converged')
+    values = (k, mu[0], mu[1], np.sqrt(C[0, 0]), np.sqrt(C[1, 1]), C[0, 1],
+              t2x, t2y, txy, txy / np.sqrt(t2x * t2y), slope,
+              intercept, -f, res.nit, res.success)
+    return base.Table((n, np.array([v])) for n, v in zip(names, values))
+
+
+def _cholesky(theta):
+    """ Returns the covariance matrix for parameters ``theta``. """
+    L = np.array([[np.exp(theta[0]), 0], [theta[1], np.exp(theta[2])]])
+    return L @ L.T
+
+
+def _bivariate_objective(theta, y, s, full=False):
+    """
+    Returns the negative restricted log-likelihood (without constant terms)
+    for a bivariate random-effects model, and its gradient with respect to
+    ``theta``. If ``full=True``, the pooled mean and the sum of the inverse
+    covariance matrices are returned as well.
+    """
+    L = np.array([[np.exp(theta[0]), 0], [theta[1], np.exp(theta[2])]])
+    T = L @ L.T
+
+    # Inverse covariance matrices W for every pair, in closed form, stored as
+    # rows (w00, w01, w10, w11)
+    a = s[:, 0] + T[0, 0]
+    c = s[:, 1] + T[1, 1]
+    b = np.full(len(y), -T[0, 1])
+    det = a * c - b * b
+    W = np.stack((c, b, b, a), axis=1) / det[:, None]
+
+    # Pooled mean, and residuals
+    H = W.sum(axis=0).reshape(2, 2)
+    Hi = np.linalg.inv(H)
+    mu = Hi @ np.stack((W[:, 0] @ y[:, 0] + W[:, 1] @ y[:, 1],
+                        W[:, 2] @ y[:, 0] + W[:, 3] @ y[:, 1]))
+    r = y - mu
+    Wr = np.stack((W[:, 0] * r[:, 0] + W[:, 1] * r[:, 1],
+                   W[:, 2] * r[:, 0] + W[:, 3] * r[:, 1]), axis=1)
+
+    f = 0.5 * (np.sum(np.log(det)) + np.log(np.linalg.det(H))
+               + np.sum(Wr * r))
+
+    # Derivative with respect to T: 1/2 sum(W - W Hi W - W r r' W), where the
+    # sum of W Hi W is obtained from the sums of products of entries of W
+    WW = (W.T @ W).reshape(2, 2, 2, 2)
+    F = 0.5 * (H - np.einsum('ijlm,jl->im', WW, Hi) - Wr.T @ Wr)
+    G = 2 * F @ L
+    grad = np.array([G[0, 0] * L[0, 0], G[1, 0], G[1, 1] * L[1, 1]])
+    if full:
+        return f, grad, mu, H
+    return f, grad
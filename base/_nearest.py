@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+#
+# Nearest-experiment searches, with an optional uncertainty-aware metric.
+#
+import numpy as np
+
+import base
+
+
+# Maximum number of (query, candidate, dimension) values to hold per chunk
+CHUNK_ELEMENTS = 2**22
+
+# Maximum ratio between the uncertainties of experiments in the same tier
+TIER_RATIO = 4
+
+
+class ExperimentIndex(object):
+    """
+    A spatial index over ``m`` experiments, for batched nearest-neighbour and
+    radius searches.
+
+    Arguments:
+
+    ``points``
+        An array of shape ``(m, d)`` with the coordinates of each experiment,
+        e.g. their ``Va`` and ``Vi``. Experiments with any NaN coordinate (or
+        variance) are left out of the index.
+    ``scales``
+        An optional array of ``d`` scales (default: 1), in the units of each
+        coordinate, used to combine quantities with different units (e.g.
+        midpoints and slopes).
+    ``variances``
+        An optional array of shape ``(m, d)`` with the uncertainty in each
+        coordinate of each experiment, as a variance (e.g. ``std**2 / n`` for
+        a mean of ``n`` cells, or ``std**2`` to compare with a single cell).
+
+    The distance between a query point ``x`` and experiment ``i`` is::
+
+        sqrt(sum_j (x_j - p_ij)**2 / (s_j**2 + v_ij + u_j))
+
+    where ``s`` are the ``scales``, ``v`` the ``variances``, and ``u`` an
+    optional variance of the query point itself. Without variances, this is
+    the (scaled) Euclidean distance.
+
+    Experiments are divided into tiers, in which the denominators
+    ``s_j**2 + v_ij`` differ by at most a factor ``TIER_RATIO`` in each
+    dimension, and each tier is stored in a :class:`scipy.spatial.cKDTree`.
+    Coordinates in each tree are divided by the square root of the tier's
+    largest denominators, so that tree distances are a lower bound on the
+    distances above. Searches find candidates in each tree, calculate their
+    exact distances, and (for nearest-neighbour searches) add candidates to
+    any query whose result can't be guaranteed to be exact yet. Without
+    variances, there is a single tier and no reranking is needed.
+    """
+    def __init__(self, points, scales=None, variances=None):
+        super(ExperimentIndex, self).__init__()
+        import scipy.spatial
+
+        points = np.asarray(points, dtype=float)
+        if points.ndim == 1:
+            points = points.reshape(-1, 1)
+        if points.ndim != 2:
+            raise ValueError('Expecting a 2d array of points.')
+        m, d = points.shape
+        scales = np.ones(d) if scales is None else np.asarray(
+            scales, dtype=float)
+        if scales.shape != (d, ) or np.any(scales <= 0):
+            raise ValueError('Expecting one positive scale per dimension.')
+        ok = np.all(np.isfinite(points), axis=1)
+        if variances is not None:
+            variances = np.asarray(variances, dtype=float)
+            if variances.shape != points.shape:
+                raise ValueError('Variances must have the same shape as the'
+                                 ' points.')
+            ok &= np.all(np.isfinite(variances) & (variances >= 0), axis=1)
+
+        self._rows = np.flatnonzero(ok)
+        self._points = points[ok]
+        self._base = np.broadcast_to(scales**2, self._points.shape)
+        self._exact = variances is None
+        if self._exact:
+            levels = np.zeros((len(self._rows), 1), dtype=int)
+        else:
+            self._base = self._base + variances[ok]
+            levels = np.floor(np.log(self._base / scales**2)
+                              / np.log(TIER_RATIO)).astype(int)
+
+        # Tiers: the local indices of their points, the largest denominator
+        # in each dimension, and the tree
+        self._tiers = []
+        if len(self._rows):
+            _, codes = np.unique(levels, axis=0, return_inverse=True)
+            codes = codes.reshape(-1)
+            for i in np.split(np.argsort(codes, kind='stable'),
+                              np.cumsum(np.bincount(codes))[:-1]):
+                top = np.max(self._base[i], axis=0)
+                tree = scipy.spatial.cKDTree(
+                    self._points[i] / np.sqrt(top))
+                self._tiers.append((i, top, tree))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _prepare(self, x, variances):
+        """ Checks query points ``x`` and returns them and their variances. """
+        x = np.asarray(x, dtype=float)
+        x = x.reshape(1, -1) if x.ndim == 1 else x
+        if x.ndim != 2 or x.shape[1] != self._points.shape[1]:
+            raise ValueError('Expecting query points of shape (q, d).')
+        u = np.zeros(x.shape) if variances is None else np.broadcast_to(
+            np.asarray(variances, dtype=float), x.shape)
+        return x, u
+
+    def _distances(self, x, u, candidates):
+        """
+        Returns the exact distances from each query in ``x`` to each of its
+        ``candidates`` (an array of shape ``(q, c)``, padded with ``-1``).
+        """
+        valid = candidates >= 0
+        j = np.where(valid, candidates, 0)
+        diff = x[:, None, :] - self._points[j]
+        w = self._base[j] + u[:, None, :]
+        d = np.sqrt(np.sum(diff * diff / w, axis=2))
+        return np.where(valid, d, np.inf)
+
+    def query(self, x, k=1, variances=None, max_distance=np.inf):
+        """
+        Finds the ``k`` nearest experiments to each query point.
+
+        Arguments:
+
+        ``x``
+            An array of shape ``(q, d)`` with the query points.
+        ``k``
+            The number of experiments to return per query.
+        ``variances``
+            An optional array of shape ``(q, d)`` (or ``d``) with the
+            variances of the query points.
+        ``max_distance``
+            Only experiments within this distance are returned.
+
+        Returns a tuple ``(distances, indices)`` of arrays of shape ``(q, k)``
+        sorted by distance, where ``indices`` are row numbers in the original
+        ``points``. Missing neighbours have distance ``inf`` and index
+        ``-1``.
+        """
+        x, u = self._prepare(x, variances)
+        distances = np.full((len(x), k), np.inf)
+        indices = np.full((len(x), k), -1)
+        if k < 1:
+            return distances, indices
+        for tier in self._tiers:
+            d, i = self._query_tier(tier, x, u, k, max_distance)
+            d = np.concatenate((distances, d), axis=1)
+            i = np.concatenate((indices, i), axis=1)
+            order = np.argsort(d, axis=1, kind='stable')[:, :k]
+            distances = np.take_along_axis(d, order, axis=1)
+            indices = np.take_along_axis(i, order, axis=1)
+        found = indices >= 0
+        indices[found] = self._rows[indices[found]]
+        return distances, indices
+
+    def _query_tier(self, tier, x, u, k, max_distance):
+        """
+        Finds the ``k`` nearest experiments in a single tier, returning their
+        distances and local indices.
+        """
+        points, top, tree = tier
+        n = len(points)
+        q = len(x)
+        z = x / np.sqrt(top)
+
+        # Factor by which tree distances are multiplied to get a lower bound
+        bound = np.sqrt(np.min(top / (top + u), axis=1))
+        with np.errstate(divide='ignore'):
+            upper = max_distance / np.min(bound, initial=1)
+
+        distances = np.full((q, k), np.inf)
+        indices = np.full((q, k), -1)
+        c = min(n, k if self._exact else max(2 * k, k + 8))
+        pending = np.arange(q)
+        while len(pending):
+            size = max(1, CHUNK_ELEMENTS // (c * x.shape[1]))
+            unresolved = []
+            for s in range(0, len(pending), size):
+                p = pending[s:s + size]
+                t, i = tree.query(z[p], c, distance_upper_bound=upper)
+                t, i = t.reshape(len(p), c), i.reshape(len(p), c)
+                i = np.where(i < n, points[np.minimum(i, n - 1)], -1)
+                d = self._distances(x[p], u[p], i)
+                d = np.where(d <= max_distance, d, np.inf)
+                order = np.argsort(d, axis=1, kind='stable')[:, :k]
+                d = np.take_along_axis(d, order, axis=1)
+                i = np.take_along_axis(i, order, axis=1)
+
+                # Any experiment not found is at least this far away
+                missed = np.inf if c == n else bound[p] * t[:, -1]
+                done = missed >= d[:, -1]
+                distances[p[done], :c] = d[done]
+                indices[p[done], :c] = np.where(
+                    np.isfinite(d[done]), i[done], -1)
+                unresolved.append(p[~done])
+            pending = np.concatenate(unresolved)
+            c = min(n, 4 * c)
+        return distances, indices
+
+    def query_radius(self, x, r, variances=None):
+        """
+        Finds all experiments within distance ``r`` (a scalar, or one value
+        per query) of each query point.
+
+        Returns a tuple ``(distances, indices)`` of lists with an array for
+        every query point, sorted by distance.
+        """
+        x, u = self._prepare(x, variances)
+        r = np.broadcast_to(np.asarray(r, dtype=float), (len(x), ))
+        candidates = [[] for _ in x]
+        for points, top, tree in self._tiers:
+            bound = np.sqrt(np.min(top / (top + u), axis=1))
+            for j, c in enumerate(
+                    tree.query_ball_point(x / np.sqrt(top), r / bound)):
+                candidates[j].append(points[c])
+        distances, indices = [], []
+        for j, c in enumerate(candidates):
+            c = np.concatenate(c).reshape(1, -1) if c else np.zeros(
+                (1, 0), dtype=int)
+            d = self._distances(x[j:j + 1], u[j:j + 1], c)[0]
+            keep = np.flatnonzero(d <= r[j])
+            keep = keep[np.argsort(d[keep], kind='stable')]
+            distances.append(d[keep])
+            indices.append(self._rows[c[0, keep]])
+        return distances, indices
+
+
+def experiment_index(data, columns=('va', 'vi'), scales=None, spread=None):
+    """
+    Creates an :class:`ExperimentIndex` for the given ``columns`` of a
+    :class:`Table` ``data``, such as the one returned by :meth:`load`.
+
+    Arguments:
+
+    ``columns``
+        The columns to use as coordinates, e.g. ``('va', 'vi', 'ka', 'ki')``
+        or protocol settings such as ``'pah'``.
+    ``scales``
+        Optional scales for each column, see :class:`ExperimentIndex`.
+    ``spread``
+        Set to ``'sem'`` to use the uncertainty in the mean of each
+        experiment (``std**2 / n``) for ``va`` and ``vi``, or to ``'std'`` to
+        use the spread of the cells in each experiment (``std**2``). Other
+        columns are given no uncertainty.
+
+    Row indices returned by searches refer to rows in ``data``.
+    """
+    if spread not in (None, 'sem', 'std'):
+        raise ValueError('Spread must be None, "sem", or "std".')
+    points = np.stack([data.numeric(c) for c in columns], axis=1)
+    variances = None
+    if spread is not None:
+        variances = np.zeros(points.shape)
+        for j, c in enumerate(columns):
+            if c in ('va', 'vi'):
+                x = c[1]
+                variances[:, j] = data.numeric('std' + x)**2
+                if spread == 'sem':
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        variances[:, j] /= data.numeric('n' + x)
+    return base.ExperimentIndex(points, scales, variances)
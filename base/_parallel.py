@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+#
+# Runs batches of work in parallel.
+#
+import concurrent.futures
+import multiprocessing
+import os
+
+
+# Environment variable that sets the default number of workers
+ENV_WORKERS = 'MIDPOINTS_WORKERS'
+
+
+def parallel_map(function, tasks, workers=None, initializer=None,
+                 initargs=()):
+    """
+    Calls ``function(task)`` for every entry in ``tasks`` and returns a list
+    of the results, in order.
+
+    The tasks are divided over ``workers`` processes. By default, this is the
+    value of the environment variable ``MIDPOINTS_WORKERS`` if set, or one
+    per CPU otherwise.
+    If given, ``initializer(*initargs)`` is called once in every process
+    before any tasks are run, which can be used to send large, shared
+    arguments to each process only once. With a single worker, or a single
+    task, everything is run in the current process.
+
+    Where possible, worker processes are started with ``fork``, so that
+    scripts without an ``if __name__ == '__main__'`` guard can use this
+    method, and so that data loaded before the call is shared with the
+    workers without copying.
+    """
+    tasks = list(tasks)
+    workers = min(workers or _default_workers(), len(tasks))
+    if workers < 2:
+        if initializer is not None:
+            initializer(*initargs)
+        return [function(task) for task in tasks]
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = None
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, mp_context=context, initializer=initializer,
+            initargs=initargs) as pool:
+        return list(pool.map(function, tasks))
+
+
+def _default_workers():
+    """ Returns the default number of worker processes. """
+    try:
+        return max(1, int(os.environ[ENV_WORKERS]))
+    except (KeyError, ValueError):
+        return os.cpu_count() or 1
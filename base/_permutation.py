@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+#
+# Permutation tests for differences between subgroups.
+#
+import itertools
+import math
+
+import numpy as np
+
+import base
+
+
+# Maximum number of (permutation, point) pairs to hold in memory per chunk
+CHUNK_ELEMENTS = 2**22
+
+# Values being tested, set in each worker by _init
+_values = None
+
+
+def permutation_test(groupings, values, names=None, samples=9999,
+                     max_exact=10000, seed=None, workers=None):
+    """
+    Tests for differences in the mean of one or more quantities, between every
+    pair of levels in one or more groupings (e.g. columns of categorical data).
+
+    Arguments:
+
+    ``groupings``
+        A dict mapping grouping names to arrays of labels, one per point.
+        Points with a label of ``None`` are ignored for that grouping.
+    ``values``
+        An array of shape ``(n, m)`` with the ``m`` quantities to test.
+    ``names``
+        An optional list of names for the ``m`` quantities.
+    ``samples``
+        The number of random permutations to use in Monte Carlo tests.
+    ``max_exact``
+        An exact test, enumerating every possible division of the pooled
+        points over the two levels, is used if the number of divisions is at
+        most ``max_exact``. Otherwise a Monte Carlo test is used.
+    ``seed``
+        A seed for the random number generator. Results depend only on the
+        seed and the data, not on the number of workers.
+    ``workers``
+        The number of processes to use (default: one per CPU).
+
+    For each pair of levels, the test statistic is the difference in means,
+    and the null distribution is obtained by shuffling the labels of the
+    pooled points. Shuffles are generated as boolean matrices, one
+    permutation per row, so that the group sums for a whole chunk of
+    permutations are obtained with a single matrix product. Chunks from all
+    pairs in all groupings are spread over multiple processes.
+
+    Returns a :class:`Table` with a row for every grouping, pair of levels, and
+    quantity, and columns ``grouping``, ``level_a``, ``level_b``, ``n_a``,
+    ``n_b``, ``quantity``, ``difference`` (mean of a minus mean of b), ``p``
+    (two-sided), and ``method`` (``'exact'`` or ``'monte-carlo'``).
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    m = values.shape[1]
+    names = [f'y{i}' for i in range(m)] if names is None else list(names)
+    if len(names) != m:
+        raise ValueError('Number of names must match number of quantities.')
+
+    # Create a task (or list of chunked tasks) for every pair of levels
+    pairs, tasks = [], []
+    chunks = []
+    for grouping, labels in groupings.items():
+        labels = np.asarray(labels, dtype=object)
+        if len(labels) != len(values):
+            raise ValueError(f'Wrong number of labels for {grouping}.')
+        levels = {}
+        for i, label in enumerate(labels):
+            if label is not None:
+                levels.setdefault(label, []).append(i)
+        for a, b in itertools.combinations(levels, 2):
+            ia, ib = np.array(levels[a]), np.array(levels[b])
+            index = np.concatenate((ia, ib))
+            na, nb = len(ia), len(ib)
+            total = math.comb(na + nb, na)
+            exact = total <= max_exact
+            observed = _difference(values[ia].sum(axis=0),
+                                   values[index].sum(axis=0), na, nb)
+            pairs.append((grouping, a, b, na, nb, observed, exact,
+                          total if exact else samples))
+            if exact:
+                tasks.append((len(pairs) - 1, index, na, observed, None, None))
+            else:
+                size = max(1, CHUNK_ELEMENTS // len(index))
+                for i in range(0, samples, size):
+                    chunks.append((len(pairs) - 1, index, na, observed,
+                                   min(size, samples - i)))
+
+    # Independent random streams for every Monte Carlo chunk
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks.extend(c + (s, ) for c, s in zip(chunks, seeds))
+    counts = base.parallel_map(_count, tasks, workers, _init, (values, ))
+
+    # Total counts per pair
+    exceed = np.zeros((len(pairs), m))
+    for task, count in zip(tasks, counts):
+        exceed[task[0]] += count
+
+    # Create table
+    rows = []
+    for k, (grouping, a, b, na, nb, observed, exact, n) in enumerate(pairs):
+        # Exact: the observed division is one of the n enumerated. Monte
+        # Carlo: add the observed division to the random ones.
+        p = exceed[k] / n if exact else (exceed[k] + 1) / (n + 1)
+        method = 'exact' if exact else 'monte-carlo'
+        for j in range(m):
+            rows.append((grouping, a, b, na, nb, names[j], observed[j],
+                         min(1, p[j]), method))
+    columns = ('grouping', 'level_a', 'level_b', 'n_a', 'n_b', 'quantity',
+               'difference', 'p', 'method')
+    if not rows:
+        return base.Table((c, np.zeros(0)) for c in columns)
+    return base.Table(
+        (c, np.array(v, dtype=object if i in (0, 1, 2, 5, 8) else None))
+        for i, (c, v) in enumerate(zip(columns, zip(*rows))))
+
+
+def _count(task):
+    """
+    Returns the number of divisions, for a single pair of levels, in which the
+    absolute difference in means is at least as large as observed.
+    """
+    k, index, na, observed, n, seed = task
+    v = _values[index]
+    nb = len(index) - na
+    total = v.sum(axis=0)
+    tolerance = 1e-9 * np.maximum(1, np.abs(observed))
+
+    def exceed(masks):
+        # Counts the divisions in a chunk with a difference at least as large
+        d = _difference(masks @ v, total, na, nb)
+        return np.sum(np.abs(d) >= np.abs(observed) - tolerance, axis=0)
+
+    if seed is not None:
+        # Monte Carlo: shuffle a mask in every row
+        rng = np.random.default_rng(seed)
+        masks = np.zeros((n, len(index)))
+        masks[:, :na] = 1
+        return exceed(rng.permuted(masks, axis=1))
+
+    # Exact: enumerate all divisions, a chunk at a time
+    combinations = itertools.combinations(range(len(index)), na)
+    size = max(1, CHUNK_ELEMENTS // len(index))
+    count = np.zeros(v.shape[1], dtype=int)
+    while True:
+        chunk = np.fromiter(
+            itertools.chain.from_iterable(
+                itertools.islice(combinations, size)), dtype=int)
+        if len(chunk) == 0:
+            return count
+        rows = len(chunk) // na
+        masks = np.zeros((rows, len(index)))
+        masks[np.repeat(np.arange(rows), na), chunk] = 1
+        count += exceed(masks)
+
+
+def _difference(sum_a, total, na, nb):
+    """ Returns the difference in means, given the sum of a and of a + b. """
+    return sum_a / na - (total - sum_a) / nb
+
+
+def _init(values):
+    """ Stores the values in a worker process. """
+    global _values
+    _values = values
+
@@ -2,6 +2,10 @@
 #
 # Plotting methods.
 #
+import numpy as np
+
+import base
+
 
 def axletter(axes, letter, offset=-0.05, tweak=0,
              weight='bold', fontsize=14, ha='center'):
@@ -38,4 +42,26 @@ def axletter(axes, letter, offset=-0.05, tweak=0,
               transform=trans)
 
 
+def fit_line(axes, x, y, fit=None):
+    """
+    Plots a straight line fitted to ``x`` and ``y`` over the range of ``x``,
+    and shows the number of points and the coefficient of determination above
+    the axes.
+
+    A precomputed ``fit`` can be passed in as a row from
+    :meth:`base.regression` (see :meth:`Table.row`). If not given, the fit is
+    calculated from ``x`` and ``y``.
+    """
+    if fit is None:
+        fit = base.regression(x, y).row(0)
+    a, b = fit['intercept'], fit['slope']
+
+    lo, hi = np.min(x), np.max(x)
+    pad = 0.05 * (hi - lo)
+    xx = np.linspace(lo - pad, hi + pad)
+    axes.plot(xx, a + b * xx)
+    axes.text(1, 1.01, f'$n={fit["n"]}$, $r^2={fit["r2"]:.2f}$',
+              ha='right', va='bottom', transform=axes.transAxes)
+
+
 #def axtext_low(axes, text, x=0, y)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+#
+# Optional instrumentation of database queries.
+#
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from ._cache import normalise
+
+
+# Environment variable that enables profiling. If set, it should contain the
+# path of a directory to write reports to.
+ENV_PROFILE = 'MIDPOINTS_PROFILE'
+
+# Number of statements to show in summaries
+N_SUMMARY = 10
+
+# Statistics per normalised statement, in order of first execution
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def enabled():
+    """ Returns ``True`` if profiling is enabled via ``MIDPOINTS_PROFILE``. """
+    return bool(os.environ.get(ENV_PROFILE))
+
+
+def profile_report():
+    """
+    Returns a dict with the statistics gathered so far, for every statement
+    executed on a profiling connection (see :meth:`connect`), and for every
+    query answered from the query cache (see :meth:`record`).
+
+    Statements are grouped on their normalised text. For each statement, the
+    report lists the number of executions, the total wall time (including the
+    time spent fetching rows), the total number of rows returned, and the
+    ``EXPLAIN QUERY PLAN`` output for the first execution. Statements with a
+    plan that scans a whole table without using an index are marked as
+    ``full_scan``.
+
+    The report also contains a ``summary`` with the slowest and the most
+    frequently repeated statements.
+    """
+    with _stats_lock:
+        statements = [dict(s) for s in _stats.values()]
+    for s in statements:
+        s['full_scan'] = any(
+            d.startswith('SCAN ') and ' USING ' not in d
+            for _, _, d in s['plan'])
+    slowest = sorted(statements, key=lambda s: -s['time'])
+    repeated = sorted(statements, key=lambda s: -s['count'])
+    return dict(
+        script=_script(),
+        executions=sum(s['count'] for s in statements),
+        time=sum(s['time'] for s in statements),
+        statements=statements,
+        summary=dict(
+            slowest=[s['query'] for s in slowest[:N_SUMMARY]],
+            repeated=[s['query'] for s in repeated[:N_SUMMARY]
+                      if s['count'] > 1],
+            full_scans=[s['query'] for s in statements if s['full_scan']],
+        ),
+    )
+
+
+def write_profile(name=None, directory=None):
+    """
+    Writes the current :meth:`profile_report` to ``directory/name.json``,
+    prints a summary to ``stderr``, and clears all statistics.
+
+    The ``directory`` defaults to the value of ``MIDPOINTS_PROFILE``, and the
+    ``name`` to the name of the running script. Returns the path written to,
+    or ``None`` if no statements were recorded.
+    """
+    report = profile_report()
+    with _stats_lock:
+        _stats.clear()
+    if not report['statements']:
+        return None
+
+    directory = directory or os.environ.get(ENV_PROFILE) or '.'
+    path = os.path.join(directory, (name or report['script']) + '.json')
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    # Summary
+    stats = {s['query']: s for s in report['statements']}
+    lines = [f'Profiled {report["executions"]} executions of'
+             f' {len(stats)} statements in {report["time"]:.3f} s,'
+             f' written to {path}']
+    for title, key in (('Slowest', 'slowest'), ('Most repeated', 'repeated'),
+                       ('Full table scans', 'full_scans')):
+        if report['summary'][key]:
+            lines.append(f'{title}:')
+        for q in report['summary'][key]:
+            s = stats[q]
+            q = q if len(q) < 60 else q[:57] + '...'
+            lines.append(f'  {s["time"]:8.4f} s {s["count"]:>6}x'
+                         f' {s["rows"]:>8} rows  {q}')
+    print('\n'.join(lines), file=sys.stderr)
+    return path
+
+
+def record(query, seconds, rows, source):
+    """
+    Records a ``query`` that was answered without executing it on a
+    profiling connection, e.g. from the on-disk query cache (with
+    ``source='cache'``), taking ``seconds`` and returning ``rows`` rows.
+
+    Such queries are listed separately from statements executed on the
+    database, with their ``source`` added to the start of the query text,
+    and without a query plan. Does nothing unless profiling is enabled.
+    """
+    if not enabled():
+        return
+    key = f'[{source}] {normalise(query)}'
+    with _stats_lock:
+        s = _stats.setdefault(key, dict(
+            query=key, count=0, time=0, rows=0, plan=[], source=source))
+        s['count'] += 1
+        s['time'] += seconds
+        s['rows'] += rows
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """
+    An ``sqlite3.Connection`` that creates :class:`ProfilingCursor` objects,
+    and that records every statement executed on it.
+    """
+    def cursor(self, factory=None):
+        return super(ProfilingConnection, self).cursor(
+            factory or ProfilingCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """
+    An ``sqlite3.Cursor`` that records the wall time and number of rows of
+    every statement executed with it. Time spent fetching rows is added to
+    the statement that produced them.
+    """
+    _stat = None
+
+    def execute(self, sql, parameters=()):
+        self._stat = _stat(self.connection, sql, parameters)
+        t = time.perf_counter()
+        try:
+            return super(ProfilingCursor, self).execute(sql, parameters)
+        finally:
+            self._add(t, 0)
+
+    def executemany(self, sql, parameters):
+        self._stat = _stat(self.connection, sql, None)
+        t = time.perf_counter()
+        try:
+            return super(ProfilingCursor, self).executemany(sql, parameters)
+        finally:
+            self._add(t, 0)
+
+    def executescript(self, script):
+        self._stat = _stat(self.connection, script, None)
+        t = time.perf_counter()
+        try:
+            return super(ProfilingCursor, self).executescript(script)
+        finally:
+            self._add(t, 0)
+
+    def fetchone(self):
+        t = time.perf_counter()
+        row = super(ProfilingCursor, self).fetchone()
+        self._add(t, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        t = time.perf_counter()
+        if size is None:
+            rows = super(ProfilingCursor, self).fetchmany()
+        else:
+            rows = super(ProfilingCursor, self).fetchmany(size)
+        self._add(t, len(rows))
+        return rows
+
+    def fetchall(self):
+        t = time.perf_counter()
+        rows = super(ProfilingCursor, self).fetchall()
+        self._add(t, len(rows))
+        return rows
+
+    def __next__(self):
+        t = time.perf_counter()
+        try:
+            row = super(ProfilingCursor, self).__next__()
+        except StopIteration:
+            self._add(t, 0)
+            raise
+        self._add(t, 1)
+        return row
+
+    def _add(self, t, rows):
+        """ Adds the time since ``t`` and a number of rows. """
+        s = self._stat
+        if s is not None:
+            with _stats_lock:
+                s['time'] += time.perf_counter() - t
+                s['rows'] += rows
+
+
+def _explain(connection, sql, parameters):
+    """ Returns the query plan for a single select statement, or ``[]``. """
+    words = sql.split(None, 1)
+    if parameters is None or not words or words[0].lower() not in (
+            'select', 'with'):
+        return []
+    try:
+        c = sqlite3.Cursor(connection)
+        c.row_factory = None
+        c.execute('EXPLAIN QUERY PLAN ' + sql, parameters)
+        return [[row[0], row[1], row[3]] for row in c]
+    except sqlite3.Error:
+        return []
+
+
+def _script():
+    """ Returns the name of the running script, without extension. """
+    name = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else ''
+    return os.path.splitext(name)[0] or 'python'
+
+
+def _stat(connection, sql, parameters):
+    """
+    Returns the statistics dict for a statement, creating it (and obtaining
+    a query plan) on first execution, and counts one execution.
+    """
+    key = normalise(sql)
+    with _stats_lock:
+        s = _stats.get(key)
+        if s is not None:
+            s['count'] += 1
+            return s
+    new = dict(query=key, count=1, time=0, rows=0,
+               plan=_explain(connection, sql, parameters), source='sqlite')
+    with _stats_lock:
+        s = _stats.setdefault(key, new)
+        if s is not new:
+            s['count'] += 1
+    return s
+
+
+def _write_at_exit():
+    """ Writes a report for any statistics not written yet. """
+    if enabled():
+        write_profile()
+
+
+atexit.register(_write_at_exit)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+#
+# Simulation of activation and inactivation protocols with a Hodgkin-Huxley
+# style sodium current model.
+#
+import numpy as np
+
+import base
+
+
+# Maximum number of (sweep, time point) pairs to evaluate per chunk
+CHUNK_ELEMENTS = 2**22
+
+# Number of bisection steps used to refine each peak
+BISECTIONS = 30
+
+# Temperature at which the model's rates are defined, and their Q10
+T_REF = 37
+Q10 = 3
+
+
+def _rates(v, phi):
+    """
+    Returns a list with the steady state and time constant (in ms) of the
+    ``m``, ``h``, and ``j`` gates of the Luo-Rudy (1991) sodium current, at
+    voltages ``v`` (in mV), with all rates multiplied by ``phi``.
+    """
+    v = np.asarray(v, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # alpha_m = 0.32 x / (1 - exp(-0.1 x)), with its limit of 3.2 at x=0
+        x = v + 47.13
+        am = np.where(np.abs(x) < 1e-6, 3.2, 0.32 * x / -np.expm1(-0.1 * x))
+        bm = 0.08 * np.exp(-v / 11)
+        low = v < -40
+        ah = np.where(low, 0.135 * np.exp((80 + v) / -6.8), 0)
+        bh = np.where(
+            low, 3.56 * np.exp(0.079 * v) + 3.1e5 * np.exp(0.35 * v),
+            1 / (0.13 * (1 + np.exp((v + 10.66) / -11.1))))
+        aj = np.where(
+            low, (-1.2714e5 * np.exp(0.2444 * v)
+                  - 3.474e-5 * np.exp(-0.04391 * v))
+            * (v + 37.78) / (1 + np.exp(0.311 * (v + 79.23))), 0)
+        bj = np.where(
+            low, 0.1212 * np.exp(-0.01052 * v)
+            / (1 + np.exp(-0.1378 * (v + 40.14))),
+            0.3 * np.exp(-2.535e-7 * v) / (1 + np.exp(-0.1 * (v + 32))))
+    return [(a / (a + b), 1 / (phi * (a + b)))
+            for a, b in ((am, bm), (ah, bh), (aj, bj))]
+
+
+def _step(x, inf, tau, t):
+    """ Returns the state of a gate after ``t`` ms at a fixed voltage. """
+    return inf + (x - inf) * np.exp(-t / tau)
+
+
+def peak_conductance(hold, steps, test, duration=20, samples=100,
+                     temperature=22):
+    """
+    Simulates voltage-clamp sweeps with the Hodgkin-Huxley style sodium
+    current of Luo and Rudy (1991), ``g = m^3 h j``, and returns the peak
+    (relative) conductance in the final step of every sweep.
+
+    Arguments:
+
+    ``hold``
+        An array with the holding potential (in mV) of every sweep. Each sweep
+        starts from the steady state at this potential. All arrays are
+        broadcast against each other.
+    ``steps``
+        A list of ``(voltage, duration)`` tuples, for the steps applied before
+        the final step, where each entry can be a scalar or an array with one
+        value per sweep. Voltages are in mV, and durations in ms.
+    ``test``
+        An array with the voltage of the final step, of every sweep.
+    ``duration``
+        The duration of the final step (in ms).
+    ``samples``
+        The number of (logarithmically spaced) times at which the conductance
+        in the final step is evaluated to locate the peak, before refining it.
+    ``temperature``
+        The temperature (in degrees Celsius). The model's rates are defined at
+        37 degrees, and are scaled with a Q10 of 3. Can be an array with one
+        value per sweep.
+
+    At a fixed voltage, each gate relaxes exponentially to its steady state,
+    so that every step is solved analytically, for all sweeps at once. In the
+    final step, the peak is bracketed using a coarse time grid, and then
+    located by bisection on the (analytic) derivative of ``log(g)``.
+
+    Because the conductance is returned directly, the result does not depend
+    on the reversal potential. Sweeps with a NaN voltage return NaN.
+    """
+    phi = Q10**((np.asarray(temperature, dtype=float) - T_REF) / 10)
+    hold = np.asarray(hold, dtype=float)
+    test = np.asarray(test, dtype=float)
+
+    # Steady state at the holding potential, then each step in turn
+    gates = [inf for inf, tau in _rates(hold, phi)]
+    for v, t in steps:
+        gates = [_step(x, inf, tau, t)
+                 for x, (inf, tau) in zip(gates, _rates(v, phi))]
+
+    # Final step, in chunks of sweeps
+    shape = np.broadcast_shapes(test.shape, *(np.shape(x) for x in gates))
+    times = np.concatenate(([0], np.geomspace(1e-3, duration, samples - 1)))
+    final = [tuple(np.broadcast_to(y, shape).reshape(-1) for y in (x, i, t))
+             for x, (i, t) in zip(gates, _rates(test, phi))]
+    n = final[0][0].size
+    peak = np.empty(n)
+    size = max(1, CHUNK_ELEMENTS // len(times))
+    for i in range(0, n, size):
+        j = slice(i, i + size)
+        chunk = [tuple(y[j, None] for y in x) for x in final]
+
+        # Coarse grid
+        g = _conductance(chunk, times)
+        k = np.argmax(np.nan_to_num(g, nan=-1), axis=1)
+        p = np.take_along_axis(g, k[:, None], axis=1)[:, 0]
+
+        # Bisection on d log(g) / dt, between the neighbours of the maximum
+        lo = times[np.maximum(k - 1, 0)][:, None]
+        hi = times[np.minimum(k + 1, len(times) - 1)][:, None]
+        for _ in range(BISECTIONS):
+            t = (lo + hi) / 2
+            rising = _rising(chunk, t)
+            lo = np.where(rising, t, lo)
+            hi = np.where(rising, hi, t)
+        peak[j] = np.fmax(p, _conductance(chunk, (lo + hi) / 2)[:, 0])
+    return peak.reshape(shape)
+
+
+def _conductance(gates, t):
+    """ Returns ``m^3 h j`` at times ``t`` for the given gate parameters. """
+    (m, h, j) = (_step(x, inf, tau, t) for x, inf, tau in gates)
+    return m**3 * h * j
+
+
+def _rising(gates, t):
+    """ Returns ``True`` where ``m^3 h j`` is increasing at times ``t``. """
+    d = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for (x, inf, tau), power in zip(gates, (3, 1, 1)):
+            y = _step(x, inf, tau, t)
+            d = d + power * (inf - y) / (tau * y)
+    return d > 0
+
+
+def _sweeps(low, high, step):
+    """
+    Returns a 2d array with the voltages of every protocol (one per row),
+    padded with NaN, for protocols stepping from ``low`` to ``high`` in steps
+    of ``step``.
+    """
+    low, high, step = (np.asarray(x, dtype=float) for x in (low, high, step))
+    low, high = np.minimum(low, high), np.maximum(low, high)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = np.floor((high - low) / step + 1e-9) + 1
+        n = np.where(np.isfinite(n) & (step > 0), n, 0).astype(int)
+    grid = np.arange(max(1, np.max(n, initial=1)))
+    v = low[:, None] + step[:, None] * grid
+    v[grid >= n[:, None]] = np.nan
+    return v
+
+
+def _unique(*columns):
+    """
+    Broadcasts the given per-protocol arguments against each other, and
+    returns a tuple ``(unique, inverse)`` where ``unique`` is a list of arrays
+    describing each distinct protocol once, and ``inverse`` maps the original
+    protocols onto them.
+    """
+    x = np.stack(np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(c, dtype=float)) for c in columns]), axis=1)
+
+    # NaN never compares equal, so use a placeholder while finding duplicates
+    x, inverse = np.unique(
+        np.where(np.isnan(x), np.inf, x), axis=0, return_inverse=True)
+    x[np.isinf(x)] = np.nan
+    return list(x.T), inverse.reshape(-1)
+
+
+def _fit(v, g, k0):
+    """
+    Normalises each row of conductances ``g`` measured at voltages ``v``,
+    fits a Boltzmann curve to each, and returns a :class:`Table`.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        y = g / np.max(np.where(np.isfinite(g), g, -np.inf), axis=1)[:, None]
+
+        # Initial guess: the voltage closest to half the maximum
+        i = np.argmin(np.nan_to_num(np.abs(y - 0.5), nan=np.inf), axis=1)
+    mid0 = v[np.arange(len(v)), i]
+    steps = np.sum(np.isfinite(v) & np.isfinite(y), axis=1)
+    use = steps >= 3
+    mid = np.full(len(v), np.nan)
+    k = np.full(len(v), np.nan)
+    converged = np.zeros(len(v), dtype=bool)
+    if np.any(use):
+        m, s, _, c = base.fit_boltzmann(
+            v[use], y[use], mid0[use], np.full(np.sum(use), k0))
+        mid[use] = np.where(c, m, np.nan)
+        k[use] = np.where(c, s, np.nan)
+        converged[use] = c
+    return base.Table(dict(steps=steps, mid=mid, k=k, converged=converged))
+
+
+def simulate_activation(hold, low, high, step, duration=20, temperature=22):
+    """
+    Simulates an activation protocol for every entry in the given arrays, and
+    fits a Boltzmann curve to the normalised peak conductances.
+
+    Arguments:
+
+    ``hold``
+        The holding potential of each protocol (in mV).
+    ``low``, ``high``, ``step``
+        The lowest and highest step potential, and the size of the steps.
+    ``duration``
+        The duration of each step (in ms), in which the peak is found.
+    ``temperature``
+        The temperature, see :meth:`peak_conductance`.
+
+    Each distinct protocol is simulated once. All sweeps of all protocols are
+    simulated together, see :meth:`peak_conductance`, and all curves are
+    fitted together, see :meth:`fit_boltzmann`.
+
+    Returns a :class:`Table` with one row per protocol, and columns ``steps``
+    (the number of voltage steps), ``mid`` and ``k`` (the fitted midpoint and
+    slope factor), and ``converged``. Protocols with missing values or fewer
+    than three steps, or for which the fit failed, have NaN midpoints and
+    slopes.
+    """
+    (hold, low, high, step, temperature), inverse = _unique(
+        hold, low, high, step, temperature)
+    v = _sweeps(low, high, step)
+    g = peak_conductance(
+        hold[:, None], [], v, duration=duration,
+        temperature=temperature[:, None])
+    return _fit(v, g, 5).select(inverse)
+
+
+def simulate_inactivation(hold, low, high, step, test, prepulse=500,
+                          duration=20, temperature=22):
+    """
+    Simulates an inactivation protocol for every entry in the given arrays,
+    and fits a Boltzmann curve to the normalised peak conductances during the
+    test step.
+
+    Arguments:
+
+    ``hold``
+        The holding potential of each protocol (in mV).
+    ``low``, ``high``, ``step``
+        The lowest and highest conditioning potential, and the size of the
+        steps.
+    ``test``
+        The test potential.
+    ``prepulse``
+        The duration of the conditioning step (in ms).
+    ``duration``
+        The duration of the test step (in ms), in which the peak is found.
+    ``temperature``
+        The temperature, see :meth:`peak_conductance`.
+
+    Returns a :class:`Table` with the same columns as
+    :meth:`simulate_activation`.
+    """
+    (hold, low, high, step, test, prepulse, temperature), inverse = _unique(
+        hold, low, high, step, test, prepulse, temperature)
+    v = _sweeps(low, high, step)
+    g = peak_conductance(
+        hold[:, None], [(v, prepulse[:, None])], test[:, None],
+        duration=duration, temperature=temperature[:, None])
+    return _fit(v, g, -5).select(inverse)
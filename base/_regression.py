@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+#
+# Batched linear regression.
+#
+import numpy as np
+
+import base
+
+
+def regression(x, y, factors=None, responses=None):
+    """
+    Fits a line ``y_k = a + b * x_j`` for every column ``x_j`` in ``x`` and
+    every column ``y_k`` in ``y``, and returns the results as a
+    :class:`Table`.
+
+    Arguments:
+
+    ``x``
+        An array of shape ``(n, p)`` with the candidate factors. Missing values
+        should be set to NaN.
+    ``y``
+        An array of shape ``(n, q)`` with the responses. Missing values should
+        be set to NaN.
+    ``factors``
+        An optional list of ``p`` names for the columns of ``x``.
+    ``responses``
+        An optional list of ``q`` names for the columns of ``y``.
+
+    Each pair is fitted using only the rows where both the factor and response
+    are set, so that the results are identical to fitting each pair
+    separately. All ``p * q`` fits are calculated together, using a handful of
+    matrix products over the data.
+
+    The returned table has one row per pair (ordered by factor, then
+    response), and columns ``factor``, ``response``, ``n`` (the number of
+    points used), ``slope``, ``intercept``, ``r`` (Pearson's correlation
+    coefficient), ``r2``, ``p`` (the two-sided p-value for a non-zero slope),
+    ``se_slope``, ``se_intercept``, ``mean_x``, ``ss_x`` (the sum of squared
+    deviations from ``mean_x``), and ``s`` (the standard deviation of the
+    residuals). Pairs with fewer than three points are returned with their
+    ``n``, and NaNs for all other statistics.
+    The last three columns can be used to calculate confidence bands with
+    :meth:`regression_band`.
+    """
+    import scipy.stats
+
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if x.ndim == 1:
+        x = x.reshape(-1, 1)
+    if y.ndim == 1:
+        y = y.reshape(-1, 1)
+    if x.ndim != 2 or y.ndim != 2 or len(x) != len(y):
+        raise ValueError('Expecting 2d arrays x and y with equal length.')
+    p, q = x.shape[1], y.shape[1]
+    factors = [f'x{j}' for j in range(p)] if factors is None else factors
+    responses = [f'y{k}' for k in range(q)] if responses is None else responses
+    if len(factors) != p or len(responses) != q:
+        raise ValueError('Number of names must match number of columns.')
+
+    # Masks, and data centered on the column means to reduce rounding errors
+    # in the sums of squares. Missing values are set to zero.
+    mx, my = ~np.isnan(x), ~np.isnan(y)
+    cx = np.nansum(x, axis=0) / np.maximum(1, np.sum(mx, axis=0))
+    cy = np.nansum(y, axis=0) / np.maximum(1, np.sum(my, axis=0))
+    x0 = np.where(mx, x - cx, 0)
+    y0 = np.where(my, y - cy, 0)
+    mx, my = mx.astype(float), my.astype(float)
+
+    # Pairwise sums, over the rows where both x_j and y_k are set
+    n = mx.T @ my
+    sx = x0.T @ my
+    sy = mx.T @ y0
+    sxx = (x0 * x0).T @ my
+    syy = mx.T @ (y0 * y0)
+    sxy = x0.T @ y0
+
+    # Number of points per pair, and the same with NaN if too few to fit
+    count = np.rint(n).astype(int)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = np.where(n > 2, n, np.nan)
+        ssx = sxx - sx * sx / n
+        ssy = syy - sy * sy / n
+        ssxy = sxy - sx * sy / n
+        mean_x = sx / n + cx[:, None]
+        mean_y = sy / n + cy[None, :]
+
+        slope = ssxy / ssx
+        intercept = mean_y - slope * mean_x
+        r = ssxy / np.sqrt(ssx * ssy)
+        dof = n - 2
+        s = np.sqrt(np.maximum(ssy - slope * ssxy, 0) / dof)
+        se_slope = s / np.sqrt(ssx)
+        se_intercept = s * np.sqrt(1 / n + mean_x**2 / ssx)
+        pval = 2 * scipy.stats.t.sf(np.abs(slope / se_slope), dof)
+
+    columns = dict(
+        factor=np.repeat(np.array(factors, dtype=object), q),
+        response=np.tile(np.array(responses, dtype=object), p),
+        n=count,
+        slope=slope,
+        intercept=intercept,
+        r=r,
+        r2=r * r,
+        p=pval,
+        se_slope=se_slope,
+        se_intercept=se_intercept,
+        mean_x=mean_x,
+        ss_x=ssx,
+        s=s,
+    )
+    return base.Table((k, v.ravel()) for k, v in columns.items())
+
+
+def regression_band(fit, x, alpha=95):
+    """
+    Returns the half-width of the ``alpha`` percent confidence band for a
+    single ``fit`` (a row from :meth:`regression`, as returned by
+    :meth:`Table.row`) at the points ``x``.
+
+    Use::
+
+        y = fit['intercept'] + fit['slope'] * x
+        ci = base.regression_band(fit, x)
+        ax.fill_between(x, y - ci, y + ci)
+
+    """
+    import scipy.stats
+
+    alpha = 1 - (100 - alpha) / 200
+    t = scipy.stats.t.ppf(alpha, fit['n'] - 2)
+    x = np.asarray(x)
+    return t * fit['s'] * np.sqrt(
+        1 / fit['n'] + (x - fit['mean_x'])**2 / fit['ss_x'])
+
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+#
+# Summary statistics quoted in the text, shared by the d* scripts and by
+# summaries.py.
+#
+import numpy as np
+
+import base
+
+
+# Width of the 5th to 95th percentile range of a standard normal
+# distribution, see normal_range()
+W90 = 3.2897072539029457
+
+
+def no_oocytes(data):
+    """
+    Returns the rows of a :class:`Table` ``data`` with a cell type other than
+    ``'Oocyte'``. As in sql, rows without a cell type are excluded too.
+    """
+    return data.select(data.notnull('cell') & (data['cell'] != 'Oocyte'))
+
+
+def normal_range():
+    """
+    Returns a dict with the 5th to 95th percentile range of a standard normal
+    distribution, and checks of the areas it contains (``d0``).
+    """
+    import scipy.stats
+    norm = scipy.stats.norm
+    p05 = norm.ppf(0.05)
+    return {
+        'Should be 5%': float(norm.cdf(p05)),
+        'Should be 90%': float(norm.cdf(-p05) - norm.cdf(p05)),
+        'Width of the 5th-95th percentile range': float(2 * -p05),
+        'Alternatively, +-': float(-p05),
+    }
+
+
+def experiment_counts(data):
+    """
+    Returns a dict with the numbers of experiments, studies, and cells in
+    ``data`` (``d1``).
+    """
+    na, ni = data['na'], data['ni']
+    ya, yi = na > 0, ni > 0
+    ns_a, ns_i = na[ya].astype(int), ni[yi].astype(int)
+    return {
+        'Total experiments': len(data),
+        'Total studies': len(set(data['pub'])),
+        'Total Va experiments': int(np.sum(ya & ~data.mask('va'))),
+        'Va n min, max, median': [
+            int(np.min(ns_a)), int(np.max(ns_a)), float(np.median(ns_a))],
+        'Total Vi experiments': int(np.sum(yi & ~data.mask('vi'))),
+        'Vi n min, max, median': [
+            int(np.min(ns_i)), int(np.max(ns_i)), float(np.median(ns_i))],
+        'Total Va+Vi experiments': int(np.sum(ya & yi)),
+        'Va-only experiments': int(np.sum(ya & (ni == 0))),
+        'Vi-only experiments': int(np.sum(yi & (na == 0))),
+        'Total cells act': int(np.sum(na)),
+        'Total cells inact': int(np.sum(ni)),
+        'Total lower bound': int(np.sum(np.maximum(na, ni))),
+    }
+
+
+def sigma_summary(data):
+    """
+    Returns a dict with the smallest, largest, and median standard deviations
+    of the midpoints in ``data``, and the corresponding widths of the 90th
+    percentile range (``d2``).
+    """
+    r = {}
+    for x, name in (('i', 'inactivation'), ('a', 'activation')):
+        std = data['std' + x][data['n' + x] > 0]
+        median, top = float(np.median(std)), float(np.max(std))
+        r[f'Standard deviation of {name}'] = {
+            'Min': float(np.min(std)),
+            'Max': top,
+            'Median': median,
+        }
+        r[f'90th percentile {name}'] = {
+            'Median': median * W90,
+            'Max': top * W90,
+        }
+    return r
+
+
+def midpoint_summary(data):
+    """
+    Returns a dict with the spread of the reported midpoints of inactivation
+    and activation in ``data`` (``d3``), see :meth:`spread`.
+    """
+    return {
+        'Mean midpoint of inactivation': spread(data['vi'][data['ni'] > 0]),
+        'Mean midpoint of activation': spread(data['va'][data['na'] > 0]),
+    }
+
+
+def study_ranges(data, pubs=('Kapplinger 2015', 'Tan 2005')):
+    """
+    Returns a dict with the lowest and highest midpoints, and their
+    difference, in each of the publications ``pubs`` (``d4``).
+    """
+    r = {}
+    for pub in pubs:
+        sub = data.select(data['pub'] == pub)
+        r[pub] = {}
+        for x in ('va', 'vi'):
+            v = sub[x][~sub.mask(x)].tolist()
+            lo, hi = min(v), max(v)
+            r[pub][x.capitalize()] = [lo, hi, hi - lo]
+    return r
+
+
+def temperature_summary(data):
+    """
+    Returns a dict with the lowest and highest temperatures in ``data``, and
+    the smallest, largest, and average difference between the two (``d5``).
+    """
+    tmin = data['tmin'][~data.mask('tmin')].tolist()
+    tmax = data['tmax'][~data.mask('tmax')].tolist()
+    both = data.notnull('tmin', 'tmax')
+    dt = (data['tmax'][both] - data['tmin'][both]).tolist()
+    return {
+        'Minimum T': min(tmin),
+        'Maximum T': max(tmax),
+        'Minimum dT': min(dt),
+        'Maximum dT': max(dt),
+        'Average dT': sum(dt) / len(dt),
+    }
+
+
+def slope_summary(data):
+    """
+    Returns a dict with the spread of the reported slopes of inactivation and
+    activation in ``data`` (``d6``), see :meth:`spread`.
+    """
+    return {
+        'Slope of inactivation': spread(data['ki'][~data.mask('ki')]),
+        'Slope of activation': spread(data['ka'][~data.mask('ka')]),
+    }
+
+
+def protocol_summary(data):
+    """
+    Returns a dict with the most common activation and inactivation
+    protocols in ``data``, counting one experiment per publication (``d7``).
+
+    For every protocol setting, the occurrences of each value are given as a
+    dict, in sorted order. Next, the modal protocol is given, along with the
+    number of publications using it (exactly, or in some of its settings).
+    """
+    def group(keep, column=None):
+        # Emulates "where ... group by pub", which returns the last matching
+        # row of each publication, ordered by publication
+        last = {}
+        for i, pub in zip(np.flatnonzero(keep), data['pub'][keep]):
+            last[pub] = i
+        rows = [last[pub] for pub in sorted(last)]
+        if column is None:
+            return sorted(last)
+        return data[column][rows].tolist()
+
+    def equal(column, value):
+        x = data[column]
+        if x.dtype != object:
+            return ~data.mask(column) & (x == float(value))
+        out = np.zeros(len(x), dtype=bool)
+        for i, v in enumerate(x):
+            try:
+                out[i] = float(v) == float(value)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+    def occurrences(column):
+        x = np.array(group(~data.mask(column), column))
+        v, c = np.unique(x, return_counts=True)
+        return v[np.argmax(c)], dict(zip(v.tolist(), c.tolist()))
+
+    r = {}
+    for kind, columns, names in (
+            ('Activation', ('pah', 'palo', 'pad', 'pahi'),
+             ('V hold', 'V low', 'V step', 'V high')),
+            ('Inactivation', ('pih', 'pilo', 'pid', 'pihi', 'pit'),
+             ('V hold', 'V low', 'V step', 'V high', 'V test'))):
+        p = r[f'{kind} protocol'] = {}
+        modal = {}
+        for column, name in zip(columns, names):
+            modal[column], p[name] = occurrences(column)
+        p['Modal protocol'] = {
+            name: _python(modal[c]) for c, name in zip(columns, names)}
+        eq = {c: equal(c, modal[c]) for c in columns}
+
+        # Combinations of settings
+        hold, low, step, high = columns[:4]
+        combos = [('exact modal', columns, True)]
+        if kind == 'Activation':
+            combos.append(('low/high/step combo', (low, high, step), False))
+        else:
+            test = columns[4]
+            combos.append(
+                ('low/high/step/test combo', (low, high, step, test), False))
+            combos.append(('low/high/step combo', (low, high, step), False))
+            combos.append(('low/high/test combo', (low, high, test), False))
+        combos.append(('low/high combo', (low, high), True))
+        for label, cs, pubs in combos:
+            keep = np.logical_and.reduce([eq[c] for c in cs])
+            keep &= ~data.mask(cs[0])
+            g = group(keep)
+            p[label] = {'occurs': len(g), 'pubs': g} if pubs else len(g)
+    return r
+
+
+def ljp_mentions(data):
+    """
+    Returns a dict with the number of publications in ``data`` that did or
+    did not correct for the LJP, or did not mention it, and the corresponding
+    percentages (``d8``). Each publication is counted once, using its last
+    experiment.
+    """
+    last = {}
+    for pub, ljpc in zip(data['pub'], data['ljp_corrected']):
+        last[pub] = ljpc
+    values = list(last.values())
+    yes = sum(1 for x in values if x == 'yes')
+    un = sum(1 for x in values if x is None)
+    no = len(values) - yes - un
+    f = 100 / len(values)
+    return {
+        'Yes': yes,
+        'No': no,
+        'No mention': un,
+        'Percentages': [f * yes, f * no, f * un],
+    }
+
+
+def pooled_midpoints(data, groupings=None):
+    """
+    Pools the midpoints in ``data``, weighted by their reported standard
+    deviations and numbers of cells, using :meth:`meta_analysis` (``d9``).
+
+    Unreported midpoints are ignored. The ``groupings`` are passed to
+    :meth:`meta_analysis`, and default to a single group with all
+    experiments, named ``'all'``.
+    """
+    estimates, variances = [], []
+    for x in 'ai':
+        n = data.numeric('n' + x)
+        n[n == 0] = np.nan
+        estimates.append(data.numeric('v' + x))
+        variances.append(data.numeric('std' + x)**2 / n)
+    if groupings is None:
+        groupings = {'all': ['all'] * len(data)}
+    return base.meta_analysis(
+        groupings, np.stack(estimates, axis=1), np.stack(variances, axis=1),
+        ['Va', 'Vi'])
+
+
+def spread(x):
+    """
+    Returns a dict with the minimum, maximum, median, range, and 90th
+    percentile range (the difference between the 95th and 5th percentiles)
+    of the values in ``x``.
+    """
+    return {
+        'Min': float(np.min(x)),
+        'Max': float(np.max(x)),
+        'Median': float(np.median(x)),
+        'Range': float(np.max(x) - np.min(x)),
+        '90th p': float(np.percentile(x, 95) - np.percentile(x, 5)),
+    }
+
+
+def _python(x):
+    """ Converts NumPy scalars to Python objects. """
+    return x.item() if hasattr(x, 'item') else x
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+#
+# Column-oriented storage for query results.
+#
+import numpy as np
+
+
+# Number of rows to fetch from sqlite per call to ``fetchmany``
+CHUNK_SIZE = 10000
+
+
+class Table(object):
+    """
+    A read-only, column-oriented view of a query result.
+
+    Each column is stored as a single NumPy array, along with a boolean mask
+    that is ``True`` wherever the database returned ``NULL``. Columns that only
+    contain integers (and nulls) are stored as ``int64`` with nulls set to 0,
+    columns of integers and floats as ``float64`` with nulls set to NaN, and
+    all other columns (text, or mixed text and numbers) as ``object`` arrays
+    with nulls set to ``None``.
+
+    Subsets of rows can be selected with :meth:`select`, which returns a new
+    table that shares its data with the original.
+
+    Arguments:
+
+    ``columns``
+        An ordered dict (or list of tuples) mapping column names to arrays.
+    ``masks``
+        An optional dict mapping column names to null masks. Columns without
+        an entry are assumed to contain no nulls.
+
+    """
+    def __init__(self, columns, masks=None):
+        super(Table, self).__init__()
+        self._columns = dict(columns)
+        self._masks = dict(masks) if masks else {}
+        self._index = None
+        self._cache = {}
+        if self._columns:
+            self._n = len(next(iter(self._columns.values())))
+        else:
+            self._n = 0
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __getitem__(self, name):
+        """ Returns the values in column ``name``. """
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        x = self._columns[name]
+        if self._index is not None:
+            x = x[self._index]
+        self._cache[name] = x
+        return x
+
+    def __iter__(self):
+        """ Iterates over the rows of this table, as tuples. """
+        return zip(*[self[name] for name in self._columns])
+
+    def __len__(self):
+        return self._n
+
+    def mask(self, name):
+        """
+        Returns a boolean array that is ``True`` wherever column ``name`` is
+        null.
+        """
+        key = (name, )
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        m = self._masks.get(name)
+        if m is None:
+            if name not in self._columns:
+                raise KeyError(name)
+            m = np.zeros(self._n, dtype=bool)
+        elif self._index is not None:
+            m = m[self._index]
+        self._cache[key] = m
+        return m
+
+    def names(self):
+        """ Returns a list of the column names. """
+        return list(self._columns)
+
+    def notnull(self, *names):
+        """
+        Returns a boolean array that is ``True`` for each row where none of
+        the given columns are null.
+        """
+        m = np.ones(self._n, dtype=bool)
+        for name in names:
+            m &= ~self.mask(name)
+        return m
+
+    def numeric(self, name):
+        """
+        Returns the values in column ``name`` as a float array, with NaN for
+        nulls and for any values that cannot be converted to a number (e.g.
+        empty strings).
+        """
+        x = self[name]
+        if x.dtype == object:
+            y = np.empty(len(x))
+            for i, v in enumerate(x):
+                try:
+                    y[i] = float(v)
+                except (TypeError, ValueError):
+                    y[i] = np.nan
+            return y
+        x = x.astype(float)
+        x[self.mask(name)] = np.nan
+        return x
+
+    def row(self, i):
+        """ Returns the ``i``-th row as a dict. """
+        return {name: self[name][i] for name in self._columns}
+
+    def select(self, rows):
+        """
+        Returns a new :class:`Table` containing only the selected ``rows``,
+        which can be given as a boolean array or as an array of indices.
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            if len(rows) != self._n:
+                raise ValueError(
+                    'Boolean row selection must have the same length as the'
+                    ' table.')
+            rows = np.flatnonzero(rows)
+        t = Table.__new__(Table)
+        t._columns = self._columns
+        t._masks = self._masks
+        t._index = rows if self._index is None else self._index[rows]
+        t._cache = {}
+        t._n = len(rows)
+        return t
+
+
+def decode(meta, arrays):
+    """
+    Creates a :class:`Table` from the ``(meta, arrays)`` returned by
+    :meth:`encode`.
+    """
+    columns, masks = {}, {}
+    for i, c in enumerate(meta['columns']):
+        name, kind = c['name'], c['kind']
+        if kind == 'object':
+            codes = arrays[f'c{i}.codes']
+            categories = np.empty(len(c['categories']) + 1, dtype=object)
+            categories[:-1] = c['categories']
+            columns[name] = categories[codes]   # Code -1 maps to None
+            m = codes < 0
+        else:
+            columns[name] = arrays[f'c{i}.values']
+            m = arrays.get(f'c{i}.mask')
+        if m is not None and m.any():
+            masks[name] = m
+    return Table(columns, masks)
+
+
+def encode(table):
+    """
+    Converts a :class:`Table` to a tuple ``(meta, arrays)``, where ``meta`` is
+    a JSON-serialisable dict describing the columns, and ``arrays`` is a dict
+    of NumPy arrays with numerical dtypes, suitable for storing with
+    ``np.save`` or ``np.savez``.
+
+    Object columns are dictionary-encoded: the distinct values are stored in
+    ``meta`` and each row is stored as an ``int32`` code, with -1 for null.
+    """
+    meta = dict(rows=len(table), columns=[])
+    arrays = {}
+    for i, name in enumerate(table.names()):
+        x, m = table[name], table.mask(name)
+        c = dict(name=name)
+        if x.dtype == object:
+            lookup = {}
+            arrays[f'c{i}.codes'] = np.fromiter(
+                (-1 if v is None else lookup.setdefault(v, len(lookup))
+                 for v in x), dtype=np.int32, count=len(x))
+            c['kind'] = 'object'
+            c['categories'] = list(lookup)
+        else:
+            c['kind'] = 'int' if x.dtype.kind == 'i' else 'float'
+            arrays[f'c{i}.values'] = np.ascontiguousarray(x)
+            if m.any():
+                arrays[f'c{i}.mask'] = m
+        meta['columns'].append(c)
+    return meta, arrays
+
+
+def fetch(connection, query, parameters=()):
+    """
+    Runs a ``query`` on the given sqlite ``connection`` and returns the result
+    as a :class:`Table`.
+
+    Rows are fetched in large chunks and converted to NumPy arrays one column
+    at a time, avoiding the creation of a Python object per row.
+    """
+    c = connection.cursor()
+
+    # Bypass any row factory: plain tuples are much faster to transpose
+    c.row_factory = None
+    c.execute(query, parameters)
+    names = [d[0] for d in c.description]
+
+    chunks = [[] for name in names]
+    while True:
+        rows = c.fetchmany(CHUNK_SIZE)
+        if not rows:
+            break
+        for i, values in enumerate(zip(*rows)):
+            chunks[i].append(_convert(values))
+        del rows
+
+    columns, masks = {}, {}
+    for name, parts in zip(names, chunks):
+        x, m = _concatenate(parts)
+        columns[name] = x
+        if m.any():
+            masks[name] = m
+    return Table(columns, masks)
+
+
+def _concatenate(parts):
+    """
+    Joins a list of ``(kind, array, mask)`` tuples into a single array and
+    mask, using the most general kind found.
+    """
+    kinds = set(p[0] for p in parts)
+    if 'object' in kinds:
+        dtype, fill = object, None
+    elif 'float' in kinds:
+        dtype, fill = float, np.nan
+    elif 'int' in kinds:
+        dtype, fill = np.int64, 0
+    else:
+        dtype, fill = float, np.nan
+
+    arrays = []
+    for kind, x, m in parts:
+        if x is None:
+            x = np.empty(len(m), dtype=dtype)
+            x[:] = fill
+        elif kind != 'object' and dtype is object:
+            # Mixed numbers and text: store numbers as Python objects too
+            y = np.empty(len(x), dtype=object)
+            y[:] = x.tolist()
+            y[m] = None
+            x = y
+        elif kind == 'int' and dtype is float:
+            x = x.astype(float)
+            x[m] = np.nan
+        arrays.append(x)
+    if not arrays:
+        return np.zeros(0, dtype=dtype), np.zeros(0, dtype=bool)
+    if len(arrays) == 1:
+        return arrays[0].astype(dtype, copy=False), parts[0][2]
+    return (np.concatenate(arrays).astype(dtype, copy=False),
+            np.concatenate([p[2] for p in parts]))
+
+
+def _convert(values):
+    """
+    Converts a tuple of Python values to a ``(kind, array, mask)`` tuple, where
+    ``kind`` is one of ``'null'``, ``'int'``, ``'float'``, or ``'object'``.
+    """
+    n = len(values)
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=n)
+    types = set(map(type, values))
+    types.discard(type(None))
+    if not types:
+        return 'null', None, mask
+    if types == {int}:
+        if mask.any():
+            values = [0 if v is None else v for v in values]
+        return 'int', np.array(values, dtype=np.int64), mask
+    if types <= {int, float}:
+        # None is converted to NaN
+        return 'float', np.array(values, dtype=float), mask
+    x = np.empty(n, dtype=object)
+    x[:] = values
+    return 'object', x, mask
+
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+#
+# Writes tables in LaTeX, CSV, and Markdown format.
+#
+import csv
+import functools
+import itertools
+import string
+
+
+# Supported output formats, and their file extensions
+FORMATS = {'tex': '.tex', 'csv': '.csv', 'md': '.md'}
+
+# Number of rows to format and write at a time
+CHUNK_SIZE = 10000
+
+# Buffer size for output files
+BUFFER_SIZE = 2**20
+
+
+class Column(object):
+    """
+    Describes a column in a table written with :meth:`write_table`.
+
+    Arguments:
+
+    ``name``
+        The column name, used as header in CSV files.
+    ``header``
+        The header used in Markdown files (default: ``name``).
+    ``tex``
+        The header used in LaTeX files (default: ``header``).
+    ``format``
+        A format string for a single value, e.g. ``'{:.3g}'``, used in CSV and
+        Markdown files.
+    ``tex_format``
+        A format string used in LaTeX files (default: ``format``).
+    ``align``
+        The LaTeX column type, e.g. ``'l'`` or ``'p{6cm}'``.
+    ``formats``
+        An optional sequence of output formats the column appears in, e.g.
+        ``('csv', )`` for a column that is not shown in LaTeX.
+
+    Values of ``None`` are written as empty cells.
+    """
+    def __init__(self, name, header=None, tex=None, format='{}',
+                 tex_format=None, align='l', formats=None):
+        super(Column, self).__init__()
+        self.name = name
+        self.header = name if header is None else header
+        self.tex = self.header if tex is None else tex
+        self.format = format
+        self.tex_format = format if tex_format is None else tex_format
+        self.align = align
+        self.formats = tuple(FORMATS if formats is None else formats)
+
+
+def write_table(name, columns, rows, formats=('tex', ), caption=None,
+                layout=None, max_rows=None):
+    """
+    Writes a table to ``name.tex``, ``name.csv``, and/or ``name.md``, in a
+    single pass over ``rows``, and returns a list of the files written.
+
+    Arguments:
+
+    ``name``
+        The file name, without extension.
+    ``columns``
+        A list of :class:`Column` objects.
+    ``rows``
+        An iterable of rows, each a sequence with a value for every column.
+    ``formats``
+        The formats to write, any of ``'tex'``, ``'csv'``, and ``'md'``.
+    ``caption``
+        An optional caption, used in LaTeX and Markdown.
+    ``layout``
+        A LaTeX column specification, e.g. ``'l|ll'``. If not given, the
+        column types are separated by vertical bars.
+    ``max_rows``
+        The maximum number of rows per LaTeX file. If set, the table is split
+        into multiple longtables, written to ``name.tex``, ``name-2.tex``, etc.
+
+    Headers, footers, and a row template are compiled once per table and
+    format. Rows are then formatted and written in chunks.
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError('Unknown format(s): ' + ', '.join(sorted(unknown)))
+
+    writers = []
+    try:
+        for f in formats:
+            index = [i for i, c in enumerate(columns) if f in c.formats]
+            cols = [columns[i] for i in index]
+            if f == 'tex':
+                w = _Latex(name, cols, index, caption, layout, max_rows)
+            elif f == 'csv':
+                w = _Csv(name, cols, index)
+            else:
+                w = _Markdown(name, cols, index, caption)
+            writers.append(w)
+
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, CHUNK_SIZE))
+            if not chunk:
+                break
+            for w in writers:
+                w.write(chunk)
+    finally:
+        for w in writers:
+            w.close()
+
+    return [x for w in writers for x in w.files]
+
+
+def _compile(forms, index):
+    """
+    Compiles a list of single-value format strings into a list of format
+    strings that each read their value from a position in ``index``, e.g.
+    ``'{:.3g}'`` at position 2 becomes ``'{2:.3g}'``.
+    """
+    compiled = []
+    for i, form in zip(index, forms):
+        parts, fields = [], 0
+        for text, field, spec, conversion in string.Formatter().parse(form):
+            parts.append(text.replace('{', '{{').replace('}', '}}'))
+            if field is not None:
+                if field != '':
+                    raise ValueError(f'Expecting a single {{}} in {form}.')
+                fields += 1
+                conversion = '!' + conversion if conversion else ''
+                parts.append(f'{{{i}{conversion}:{spec}}}')
+        if fields != 1:
+            raise ValueError(f'Expecting a single {{}} in {form}.')
+        compiled.append(''.join(parts))
+    return compiled
+
+
+class _Writer(object):
+    """
+    Base class for table writers, that format each row by joining the cells
+    with ``separator`` and adding a ``prefix`` and ``suffix``.
+    """
+    ext = None
+    separator = prefix = suffix = ''
+
+    def __init__(self, name, index, forms):
+        super(_Writer, self).__init__()
+        self._name = name
+        self._index = index
+        self._forms = forms
+        self._row = (self.prefix
+                     + self.separator.join(_compile(forms, index))
+                     + self.suffix).format
+        self._f = None
+        self.files = []
+
+    def _open(self, part=1):
+        """ Opens the file for the given part, and returns it. """
+        path = self._name + ('' if part == 1 else f'-{part}') + self.ext
+        self._f = open(path, 'w', buffering=BUFFER_SIZE, newline='',
+                       encoding='utf-8')
+        self.files.append(path)
+        return self._f
+
+    def _cells(self, row):
+        """ Formats the cells in a single row, writing ``None`` as ''. """
+        return ['' if row[i] is None else form.format(row[i])
+                for i, form in zip(self._index, self._forms)]
+
+    def _lines(self, chunk):
+        """
+        Returns a list of formatted lines, using the compiled row template
+        for rows without ``None`` values.
+        """
+        row, cells = self._row, self._cells
+        pre, sep, suf = self.prefix, self.separator, self.suffix
+        return [pre + sep.join(cells(r)) + suf if None in r else row(*r)
+                for r in chunk]
+
+    def close(self):
+        """ Writes any footer and closes the file. """
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def write(self, chunk):
+        """ Writes a chunk of rows. """
+        self._f.writelines(self._lines(chunk))
+
+
+class _Csv(_Writer):
+    """ Writes comma-separated values, with a header row of column names. """
+    ext = '.csv'
+
+    def __init__(self, name, columns, index):
+        super(_Csv, self).__init__(
+            name, index, [c.format for c in columns])
+        self._raw = all(form == '{}' for form in self._forms)
+        self._csv = csv.writer(self._open())
+        self._csv.writerow([c.name for c in columns])
+
+    def write(self, chunk):
+        if self._raw:
+            index = self._index
+            self._csv.writerows([r[i] for i in index] for r in chunk)
+        else:
+            self._csv.writerows(self._cells(r) for r in chunk)
+
+
+class _Latex(_Writer):
+    """ Writes a LaTeX longtable, split over files of ``max_rows`` rows. """
+    ext = '.tex'
+    separator = ' & '
+    suffix = ' \\\\\n'
+
+    def __init__(self, name, columns, index, caption, layout, max_rows):
+        super(_Latex, self).__init__(
+            name, index, [c.tex_format for c in columns])
+        self._head, self._head_continued, self._foot = _latex_fragments(
+            tuple(c.tex for c in columns),
+            layout or '|'.join(c.align for c in columns), caption)
+        self._max_rows = max_rows
+        self._budget = max_rows or float('inf')
+        self._open().write(self._head)
+
+    def close(self):
+        if self._f is not None:
+            self._f.write(self._foot)
+        super(_Latex, self).close()
+
+    def write(self, chunk):
+        lines = self._lines(chunk)
+        while lines:
+            if self._budget == 0:
+                self.close()
+                self._open(len(self.files) + 1).write(self._head_continued)
+                self._budget = self._max_rows
+            n = min(len(lines), self._budget)
+            self._f.writelines(lines[:n])
+            lines = lines[n:]
+            self._budget -= n
+
+
+class _Markdown(_Writer):
+    """ Writes a Markdown (pipe) table, with an optional caption. """
+    ext = '.md'
+    separator = ' | '
+    prefix = '| '
+    suffix = ' |\n'
+
+    def __init__(self, name, columns, index, caption):
+        super(_Markdown, self).__init__(
+            name, index, [c.format for c in columns])
+        f = self._open()
+        if caption:
+            f.write(' '.join(caption.split()) + '\n\n')
+        headers = [c.header.replace('|', r'\|') for c in columns]
+        f.write('| ' + ' | '.join(headers) + ' |\n')
+        f.write('|' + '---|' * len(columns) + '\n')
+
+    def _lines(self, chunk):
+        # Always format per cell, to escape pipe characters
+        cells, sep = self._cells, self.separator
+        return [self.prefix + sep.join(x.replace('|', r'\|') for x in cells(r))
+                + self.suffix for r in chunk]
+
+
+@functools.lru_cache()
+def _latex_fragments(headers, layout, caption):
+    """
+    Returns the first header, the header for continuation files, and the
+    footer for a LaTeX longtable.
+    """
+    eol = '\n'
+    begin = (r'\startrowcolors' + eol
+             + r'\begin{longtable}{' + layout + '}' + eol)
+    columns = (
+        r'\hline' + eol
+        + r'\rowcolor{white}' + eol
+        + ' & '.join(headers) + r' \\' + eol
+        + r'\hline' + eol
+    )
+    head = (
+        begin
+        + (r'\caption{' + caption + r'} \\' + eol if caption else '')
+        + columns
+        + r'\endfirsthead' + eol
+        + columns
+        + r'\endhead' + eol
+        + r'\hline' + eol
+        + r'\endfoot' + eol
+    )
+    head_continued = (
+        begin
+        + columns
+        + r'\endhead' + eol
+        + r'\hline' + eol
+        + r'\endfoot' + eol
+    )
+    foot = r'\end{longtable}' + eol
+    return head, head_continued, foot
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#
+# Benchmarks drawing the per-experiment error bars in Figure 2, with a Line2D
+# per bar or marker (the old method) and with collections (the new one).
+#
+# Usage: benchmarks/errorbars.py [max_experiments]
+#
+import io
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.collections  # noqa
+import matplotlib.pyplot as plt  # noqa
+import numpy as np  # noqa
+
+# Sigma multiplier to get 90-th percentile
+s90 = 1.6448536269514729
+
+# Numbers of experiments to test
+sizes = [100, 300, 1000, 3000, 10000, 30000, 100000, 300000]
+
+# Largest number of experiments to draw with the old method
+max_lines = 10000
+
+# Styles, as in f2-all.py
+sstd = dict(color='#999')
+ssem = dict(color='k', lw=3)
+m = 'o'
+ms = 3
+
+
+def data(n, seed=1):
+    """ Returns an array with ``n`` rows of random mean, SEM, and std. """
+    rng = np.random.default_rng(seed)
+    mu = np.sort(rng.normal(-60, 15, n))
+    std = rng.gamma(3, 2, n)
+    sem = std / np.sqrt(rng.integers(3, 30, n))
+    return np.stack((mu, sem, std), axis=1)
+
+
+def lines(ax, d):
+    """ Draws the error bars with three artists per experiment. """
+    for k, (mu, sem, std) in enumerate(d):
+        ax.plot((mu - s90 * std, mu + s90 * std), (k, k), **sstd, zorder=2)
+        ax.plot((mu - sem, mu + sem), (k, k), **ssem, zorder=3)
+        ax.plot(mu, k, m, color='tab:blue', markersize=ms, zorder=4)
+
+
+def collections(ax, d):
+    """ Draws the error bars with three artists in total. """
+    mu, sem, std = d.T
+    k = np.arange(len(d))
+    for lo, hi, style, z in ((mu - s90 * std, mu + s90 * std, sstd, 2),
+                             (mu - sem, mu + sem, ssem, 3)):
+        segments = np.stack((np.stack((lo, k), axis=1),
+                             np.stack((hi, k), axis=1)), axis=1)
+        ax.add_collection(matplotlib.collections.LineCollection(
+            segments, colors=style['color'], linewidths=style.get('lw'),
+            capstyle='projecting', zorder=z))
+    ax.plot(mu, k, m, color='tab:blue', markersize=ms, zorder=4)
+
+
+def run(method, d):
+    """ Returns the times taken to create, draw, and save a figure. """
+    t0 = time.perf_counter()
+    fig = plt.figure(figsize=(9, 10.5))
+    ax = fig.add_subplot()
+    ax.set_xlim(-120, 0)
+    ax.set_ylim(-2, 1 + len(d))
+    method(ax, d)
+    t1 = time.perf_counter()
+    fig.canvas.draw()
+    t2 = time.perf_counter()
+    fig.savefig(io.BytesIO(), format='pdf')
+    t3 = time.perf_counter()
+    plt.close(fig)
+    return t1 - t0, t2 - t1, t3 - t2
+
+
+if __name__ == '__main__':
+    n_max = int(sys.argv[1]) if len(sys.argv) > 1 else sizes[-1]
+
+    print(f'{"n":>7} {"Method":<12} {"Create":>8} {"Draw":>8} {"Save":>8}'
+          f' {"Total":>8}')
+    for n in sizes:
+        if n > n_max:
+            break
+        d = data(n)
+        for method in (lines, collections):
+            if method is lines and n > max_lines:
+                continue
+            t = run(method, d)
+            print(f'{n:>7} {method.__name__:<12}'
+                  + ''.join(f' {x:>7.3f}s' for x in t)
+                  + f' {sum(t):>7.3f}s')
+
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+#
+# Benchmarks summary statistics obtained by rescanning midpoints_wt against
+# those maintained incrementally by triggers (see base.install_statistics).
+#
+# Usage: benchmarks/incremental.py [--sizes real,1000,10000,...]
+#
+# For every size, a copy of the database (see pipeline.py) is made in a
+# temporary directory, statistics are installed, and the time to insert a
+# single experiment and obtain the Va/Vi fit for HEK cells (excluding oocytes)
+# is measured, with and without rescanning the table.
+#
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Root directory
+DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, DIR)
+
+import base  # noqa
+from pipeline import database, SIZES  # noqa
+
+# Number of single-row inserts to time
+n_inserts = 20
+
+
+def rescan():
+    """ Calculates the fit for HEK cells by querying the whole table. """
+    d = base.query('select va, vi, na, ni, cell from midpoints_wt',
+                   cache=False)
+    d = d.select((d['cell'] == 'HEK') & (d['na'] > 0) & (d['ni'] > 0))
+    b, a = np.polyfit(d['va'], d['vi'], 1)
+    return a, b
+
+
+def incremental():
+    """ Calculates the fit for HEK cells from the incremental statistics. """
+    r = base.incremental_statistics(
+        include={'cell': ['HEK']}, quantiles=()).row(0)
+    return r['intercept'], r['slope']
+
+
+def insert(con, row, columns):
+    """ Inserts a copy of ``row`` with new midpoints. """
+    row = dict(row, va=row['va'] + 1, vi=row['vi'] - 1)
+    marks = ', '.join('?' * len(columns))
+    con.execute(f'insert into midpoints_wt ({", ".join(columns)})'
+                f' values ({marks})', [row[c] for c in columns])
+    con.commit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmarks incrementally maintained statistics.')
+    parser.add_argument(
+        '--sizes', default=','.join(SIZES),
+        help='Comma separated database sizes (default: %(default)s)')
+    args = parser.parse_args()
+
+    print(f'{"Size":>7} {"Install":>8} {"Insert":>8} {"Rescan":>8}'
+          f' {"Incremental":>11} {"Difference":>10}')
+    real = base.PATH_DB
+    for size in args.sizes.split(','):
+        source = database(size) or real
+        with tempfile.TemporaryDirectory() as temp:
+            path = os.path.join(temp, 'midpoints.sqlite')
+            shutil.copy(source, path)
+            base.PATH_DB = path
+
+            t0 = time.perf_counter()
+            base.install_statistics()
+            t_install = time.perf_counter() - t0
+
+            t_insert = t_rescan = t_incremental = 0
+            difference = 0
+            with base.connect(readonly=False) as con:
+                columns = [r[1] for r in con.execute(
+                    'pragma table_info(midpoints_wt)')]
+                row = dict(con.execute(
+                    'select * from midpoints_wt where cell = "HEK"'
+                    ' and na > 0 and ni > 0 limit 1').fetchone())
+                for i in range(n_inserts):
+                    t0 = time.perf_counter()
+                    insert(con, row, columns)
+                    t1 = time.perf_counter()
+                    x = rescan()
+                    t2 = time.perf_counter()
+                    y = incremental()
+                    t3 = time.perf_counter()
+                    t_insert += t1 - t0
+                    t_rescan += t2 - t1
+                    t_incremental += t3 - t2
+                    difference = max(difference, np.max(np.abs(
+                        np.array(x) - np.array(y))))
+
+            print(f'{size:>7} {t_install:>7.3f}s'
+                  + ''.join(f' {t / n_inserts * 1000:>6.2f}ms' for t in (
+                      t_insert, t_rescan))
+                  + f' {t_incremental / n_inserts * 1000:>9.2f}ms'
+                  + f' {difference:>10.1e}')
+        base.PATH_DB = real
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+#
+# Benchmarks the figure, table, and number scripts on databases of increasing
+# size.
+#
+# Usage:
+#
+#   benchmarks/pipeline.py [--sizes real,1000,10000,...] [--baseline FILE]
+#                          [--save-baseline] [target ...]
+#
+# Each script is run in a fresh process, once for every database size, with
+# the on-disk query cache and any columnar export (see export.py) disabled.
+# Databases other than 'real' are created with synthetic.py and stored in
+# benchmarks/data/. For every run, the time spent on database queries,
+# computation, rendering figures, and saving figures and tables is measured
+# separately, along with the peak memory use.
+#
+# The results are written to benchmarks/results/<commit>.json, and compared
+# to a baseline (benchmarks/results/baseline.json, if it exists). Runs that
+# are slower or use more memory than in the baseline (beyond a tolerance) are
+# reported as regressions, and cause a non-zero exit code.
+#
+import argparse
+import json
+import os
+import platform
+import re
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Root directory, with the scripts to benchmark
+DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, DIR)
+
+# Storage for synthetic databases and results
+PATH_DATA = os.path.join(DIR, 'benchmarks', 'data')
+PATH_RESULTS = os.path.join(DIR, 'benchmarks', 'results')
+PATH_BASELINE = os.path.join(PATH_RESULTS, 'baseline.json')
+
+# Scripts benchmarked by default
+TARGETS = re.compile(r'^([dfst][0-9]+|x1)-[\w-]+\.py$')
+
+# Default database sizes
+SIZES = ['real', '1000', '10000', '100000']
+
+# Phases timed in every run
+PHASES = ('startup', 'query', 'compute', 'render', 'save', 'total')
+
+# Relative increase in time or memory flagged as a regression
+TOLERANCE = 0.2
+
+# Smallest absolute increase in time (in seconds) flagged as a regression
+MIN_SECONDS = 0.05
+
+
+def database(size):
+    """
+    Returns the path to a synthetic database with ``size`` experiments,
+    creating it if needed, or ``None`` for the real database.
+    """
+    if size == 'real':
+        return None
+    path = os.path.join(PATH_DATA, f'synthetic-{size}.sqlite')
+    if not os.path.exists(path):
+        import synthetic
+        print(f'Creating {os.path.relpath(path, DIR)}')
+        os.makedirs(PATH_DATA, exist_ok=True)
+        synthetic.generate(path, int(size), seed=1)
+    return path
+
+
+def commit():
+    """ Returns the current commit hash, with '-dirty' for local changes. """
+    def git(*args):
+        return subprocess.run(
+            ('git', ) + args, cwd=DIR, capture_output=True, text=True,
+        ).stdout.strip()
+    h = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    if git('status', '--porcelain', '--untracked-files=no'):
+        h += '-dirty'
+    return h
+
+
+def run(target, size, timeout):
+    """
+    Runs a single ``target`` on the database of the given ``size`` in a new
+    process, and returns a dict with the results.
+    """
+    env = dict(os.environ)
+    env.pop('MIDPOINTS_DB', None)
+    path = database(size)
+    if path is not None:
+        env['MIDPOINTS_DB'] = path
+    result = dict(target=target, size=size, ok=False)
+    with tempfile.TemporaryDirectory() as d:
+        try:
+            p = subprocess.run(
+                (sys.executable, os.path.abspath(__file__), '--child', target),
+                cwd=d, env=env, capture_output=True, text=True,
+                timeout=timeout)
+        except subprocess.TimeoutExpired:
+            result['error'] = f'Timed out after {timeout} s'
+            return result
+    if p.returncode != 0:
+        result['error'] = (p.stderr.strip().splitlines() or ['?'])[-1]
+        return result
+    result.update(json.loads(p.stdout.strip().splitlines()[-1]))
+    result['ok'] = True
+    return result
+
+
+def child(target):
+    """
+    Runs ``target`` in the current process, and prints a JSON dict with the
+    time spent in each phase and the peak memory use.
+
+    Query time is measured by profiling all database connections (see
+    ``base.connect``). Render time is the time to draw a figure before saving,
+    and save time is the remaining time spent in ``savefig`` and in writing
+    tables with ``base.write_table``. Anything else counts as compute.
+    """
+    import resource
+
+    # Imports shared by all scripts
+    t0 = time.perf_counter()
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.figure
+    import matplotlib.pyplot  # noqa
+    import numpy  # noqa
+    import scipy.stats  # noqa
+    import base
+    startup = time.perf_counter() - t0
+
+    # Profile queries, don't use or fill the on-disk cache, and don't use a
+    # columnar export (see export.py)
+    temp = tempfile.mkdtemp()
+    os.environ['MIDPOINTS_PROFILE'] = temp
+    os.environ['MIDPOINTS_COLUMNS'] = '0'
+    base.PATH_CACHE = temp
+    timers = dict(render=0, save=0)
+
+    def query_time():
+        return base.profile_report()['time']
+
+    savefig = matplotlib.figure.Figure.savefig
+
+    def timed_savefig(fig, *args, **kwargs):
+        t0 = time.perf_counter()
+        fig.canvas.draw()
+        t1 = time.perf_counter()
+        try:
+            return savefig(fig, *args, **kwargs)
+        finally:
+            timers['render'] += t1 - t0
+            timers['save'] += time.perf_counter() - t1
+
+    write_table = base.write_table
+
+    def timed_write_table(*args, **kwargs):
+        # Rows may be fetched from the database while writing
+        t0, q0 = time.perf_counter(), query_time()
+        try:
+            return write_table(*args, **kwargs)
+        finally:
+            timers['save'] += time.perf_counter() - t0 - (query_time() - q0)
+
+    matplotlib.figure.Figure.savefig = timed_savefig
+    base.write_table = timed_write_table
+
+    # Run
+    sys.argv = [os.path.join(DIR, target + '.py')]
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as f:
+        sys.stdout = f
+        t0 = time.perf_counter()
+        runpy.run_path(sys.argv[0], run_name='__main__')
+        total = time.perf_counter() - t0
+        sys.stdout = stdout
+
+    query = query_time()
+    base.write_profile('profile', temp)
+    shutil.rmtree(temp)
+    phases = dict(
+        startup=startup,
+        query=query,
+        compute=max(0, total - query - timers['render'] - timers['save']),
+        render=timers['render'],
+        save=timers['save'],
+        total=total,
+    )
+    rows = base.query('select count(*) from midpoints_wt', cache=False)
+    print(json.dumps(dict(
+        rows=int(rows[rows.names()[0]][0]),
+        peak_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        **phases,
+    )))
+
+
+def compare(results, baseline):
+    """
+    Compares a list of ``results`` to a ``baseline`` list, and returns a list
+    of strings describing any regressions.
+    """
+    known = {(r['target'], r['size']): r for r in baseline if r['ok']}
+    regressions = []
+    for r in results:
+        b = known.get((r['target'], r['size']))
+        if b is None:
+            continue
+        label = f'{r["target"]} ({r["size"]})'
+        if not r['ok']:
+            regressions.append(f'{label}: failed ({r.get("error")})')
+            continue
+        for phase in PHASES:
+            new, old = r[phase], b[phase]
+            if new > old * (1 + TOLERANCE) and new - old > MIN_SECONDS:
+                regressions.append(
+                    f'{label}: {phase} {old:.3f} s -> {new:.3f} s')
+        if r['peak_mb'] > b['peak_mb'] * (1 + TOLERANCE):
+            regressions.append(f'{label}: peak memory {b["peak_mb"]:.0f} MiB'
+                               f' -> {r["peak_mb"]:.0f} MiB')
+    return regressions
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--child':
+        child(sys.argv[2])
+        sys.exit(0)
+
+    import build
+
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the figure, table, and number scripts.')
+    parser.add_argument(
+        'targets', nargs='*', metavar='target',
+        help='Scripts to run, without .py (default: all d, f, s, t, and x1)')
+    parser.add_argument(
+        '--sizes', default=','.join(SIZES),
+        help='Comma-separated database sizes, or "real" for the real data')
+    parser.add_argument(
+        '--baseline', default=PATH_BASELINE,
+        help='Results file to compare to')
+    parser.add_argument(
+        '--save-baseline', action='store_true',
+        help='Store the results as the new baseline')
+    parser.add_argument(
+        '--timeout', type=float, default=600,
+        help='Maximum time per run, in seconds')
+    args = parser.parse_args()
+
+    known = build.discover()
+    targets = args.targets or [
+        x for x in known if TARGETS.match(x + '.py') is not None]
+    unknown = [x for x in targets if x not in known]
+    if unknown:
+        parser.error('Unknown target(s): ' + ', '.join(unknown))
+    sizes = [x.strip() for x in args.sizes.split(',') if x.strip()]
+    for size in sizes:
+        if size != 'real' and not size.isdigit():
+            parser.error(f'Invalid size: {size}')
+
+    # Run
+    w = max(len(x) for x in targets)
+    print(f'{"Target":<{w}} {"Size":>8} ' + ' '.join(
+        f'{x.capitalize():>8}' for x in PHASES) + f' {"Peak MiB":>9}')
+    results = []
+    for size in sizes:
+        for target in targets:
+            r = run(target, size, args.timeout)
+            results.append(r)
+            if r['ok']:
+                print(f'{target:<{w}} {r["rows"]:>8} ' + ' '.join(
+                    f'{r[x]:>8.3f}' for x in PHASES)
+                    + f' {r["peak_mb"]:>9.1f}')
+            else:
+                print(f'{target:<{w}} {size:>8}  FAILED: {r["error"]}')
+
+    # Store
+    h = commit()
+    report = dict(
+        commit=h,
+        date=time.strftime('%Y-%m-%d %H:%M:%S'),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        results=results,
+    )
+    os.makedirs(PATH_RESULTS, exist_ok=True)
+    path = os.path.join(PATH_RESULTS, f'{h}.json')
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f'Results written to {os.path.relpath(path, DIR)}')
+    if args.save_baseline:
+        with open(PATH_BASELINE, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f'Baseline written to {os.path.relpath(PATH_BASELINE, DIR)}')
+
+    # Compare
+    regressions = []
+    if not args.save_baseline and os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'])
+        print(f'Compared to baseline from commit {baseline["commit"]}:'
+              f' {len(regressions)} regression(s)')
+        for x in regressions:
+            print(f'  {x}')
+    sys.exit(1 if regressions or not all(r['ok'] for r in results) else 0)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+#
+# Runs all figure, table, and number scripts, in parallel.
+#
+# Usage:
+#
+#   build.py [-j N] [--force] [--png] [--csv] [--md] [--profile DIR]
+#            [target ...]
+#
+# Targets are script names without the .py extension, e.g. f2-all. If no
+# targets are given, all scripts are run. A script is skipped if neither its
+# source, nor the database, nor the base module has changed since its last
+# successful run, and its outputs (figures, tables, and log) are unchanged.
+# Output from each script is written to logs/<target>.txt.
+#
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import re
+import runpy
+import sys
+import time
+import traceback
+
+import base
+
+# Root directory
+DIR = os.path.dirname(os.path.realpath(__file__))
+
+# Build state and log locations
+PATH_STATE = os.path.join(DIR, '.build.json')
+PATH_LOGS = os.path.join(DIR, 'logs')
+
+# Figure, table, and number scripts
+SCRIPT = re.compile(r'^[dfstx][0-9]+-[\w-]+\.py$')
+
+# Extensions of figure and table files written by the scripts
+OUTPUTS = ('pdf', 'png', 'tex', 'csv', 'md')
+
+
+def discover():
+    """ Returns a sorted list of all target names. """
+    return sorted(
+        x[:-3] for x in os.listdir(DIR) if SCRIPT.match(x) is not None)
+
+
+def inputs(target):
+    """
+    Returns a hash of the inputs to ``target``: the script source, the base
+    module source, and the database contents.
+    """
+    h = hashlib.sha256()
+    paths = [os.path.join(DIR, target + '.py')]
+    paths.extend(sorted(glob.glob(os.path.join(base.DIR, '*.py'))))
+    for path in paths:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    h.update(base.fingerprint().encode())
+    return h.hexdigest()
+
+
+def outputs(target):
+    """
+    Returns a dict mapping the (relative) paths of all current outputs of
+    ``target`` to their modification times. Outputs are the log, and all
+    files named ``<target>.<ext>`` or ``<target>-<n>.<ext>`` (for multi-part
+    tables), where ``ext`` is one of ``OUTPUTS``.
+    """
+    pattern = re.compile(
+        rf'^{re.escape(target)}(-[0-9]+)?\.({"|".join(OUTPUTS)})$')
+    paths = [x for x in os.listdir(DIR) if pattern.match(x) is not None]
+    paths.append(os.path.join(os.path.basename(PATH_LOGS), target + '.txt'))
+    times = {}
+    for path in sorted(paths):
+        try:
+            times[path] = os.stat(os.path.join(DIR, path)).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return times
+
+
+def up_to_date(target, state, h, argv):
+    """
+    Checks if ``target`` has a ``state`` from a successful run with inputs
+    ``h`` and arguments ``argv``, and if all outputs of that run still exist
+    and are unmodified.
+    """
+    s = state.get(target)
+    if not s or s['inputs'] != h or s['argv'] != argv:
+        return False
+    recorded = s.get('outputs')
+    if not recorded:
+        return False
+    current = outputs(target)
+    return all(current.get(x) == t for x, t in recorded.items())
+
+
+def _init(workers):
+    """
+    Imports expensive modules once per worker process, and limits the number
+    of processes that scripts in this worker can start with
+    :meth:`base.parallel_map` to ``workers``.
+    """
+    os.chdir(DIR)
+    os.environ['MIDPOINTS_WORKERS'] = str(workers)
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa
+    import numpy  # noqa
+    import scipy.stats  # noqa
+
+
+def _run(target, argv):
+    """
+    Runs a single target in the current process, and returns a tuple
+    ``(target, success, wall time)``.
+    """
+    import matplotlib.pyplot as plt
+
+    path = os.path.join(DIR, target + '.py')
+    log = os.path.join(PATH_LOGS, target + '.txt')
+    ok = True
+    t0 = time.perf_counter()
+    with open(log, 'w') as f:
+        with contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+            sys.argv = [path] + argv
+            try:
+                runpy.run_path(path, run_name='__main__')
+            except SystemExit as e:
+                ok = e.code in (None, 0)
+            except Exception:
+                traceback.print_exc()
+                ok = False
+            finally:
+                plt.close('all')
+                base.write_profile(target)  # No-op unless profiling
+    return target, ok, time.perf_counter() - t0
+
+
+def build(targets, workers=None, force=False, argv=None):
+    """
+    Runs the given ``targets`` in a process pool with ``workers`` processes
+    (default: one per CPU), skipping any that are up to date unless ``force``
+    is set. Returns ``True`` if all targets were successful.
+    """
+    argv = list(argv or [])
+    try:
+        with open(PATH_STATE, 'r') as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        state = {}
+
+    # Check which targets need running
+    todo = {}
+    w = max(len(x) for x in targets) if targets else 0
+    for target in targets:
+        h = inputs(target)
+        if not force and up_to_date(target, state, h, argv):
+            print(f'  {target:<{w}}  up to date')
+        else:
+            todo[target] = h
+    if not todo:
+        return True
+
+    # Run
+    os.makedirs(PATH_LOGS, exist_ok=True)
+    cpus = workers or os.cpu_count() or 1
+    workers = min(cpus, len(todo))
+    success = True
+    t0 = time.perf_counter()
+
+    # Share the CPUs between the build workers, so that scripts using
+    # parallel_map don't start a full pool of processes in every worker
+    inner = max(1, cpus // workers)
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init, initargs=(inner, )) as pool:
+        futures = [pool.submit(_run, x, argv) for x in todo]
+        for future in concurrent.futures.as_completed(futures):
+            target, ok, t = future.result()
+            if ok:
+                print(f'  {target:<{w}}  {t:7.2f} s')
+                state[target] = dict(inputs=todo[target], argv=argv, time=t,
+                                     outputs=outputs(target))
+            else:
+                print(f'  {target:<{w}}  {t:7.2f} s  FAILED, see'
+                      f' {os.path.relpath(PATH_LOGS)}/{target}.txt')
+                state.pop(target, None)
+                success = False
+
+            # Store after every target, so that an interrupted build is
+            # resumed where it stopped
+            with open(PATH_STATE, 'w') as f:
+                json.dump(state, f, indent=1)
+
+    print(f'Built {len(todo)} targets with {workers} processes in'
+          f' {time.perf_counter() - t0:.2f} s')
+    return success
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Runs all figure, table, and number scripts.')
+    parser.add_argument(
+        'targets', nargs='*', metavar='target',
+        help='Scripts to run, without .py (default: all)')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='Number of processes (default: number of CPUs)')
+    parser.add_argument(
+        '--force', action='store_true',
+        help='Run targets even if they are up to date')
+    parser.add_argument(
+        '--png', action='store_true',
+        help='Save figures as PNG instead of PDF')
+    parser.add_argument(
+        '--profile', metavar='DIR',
+        help='Write a report of all database queries per target to DIR'
+             ' (implies --force)')
+    parser.add_argument(
+        '--csv', action='store_true',
+        help='Write tables as CSV, as well as LaTeX')
+    parser.add_argument(
+        '--md', action='store_true',
+        help='Write tables as Markdown, as well as LaTeX')
+    args = parser.parse_args()
+
+    known = discover()
+    targets = args.targets or known
+    unknown = [x for x in targets if x not in known]
+    if unknown:
+        parser.error('Unknown target(s): ' + ', '.join(unknown))
+
+    if args.profile:
+        os.environ['MIDPOINTS_PROFILE'] = os.path.abspath(args.profile)
+        args.force = True
+
+    argv = [x for x in ('png', 'csv', 'md') if getattr(args, x)]
+    sys.exit(0 if build(targets, args.jobs, args.force, argv) else 1)
+
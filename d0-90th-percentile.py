@@ -2,19 +2,17 @@
 #
 # 5 to 95th-percentile of a normal distribution, used to calculate
 #
-import scipy
+import base
 
-# Get the 5-th percentile point of a normal distribution, centered at 0
-# https://docs.scipy.org/doc/scipy/reference/generated/scipy.stats.norm.html
-p05 = scipy.stats.norm.ppf(0.05)
-
-# If we integrate up to this value, we expect to find 5% of the total area
-print('Should be 5%:', scipy.stats.norm.cdf(p05))
-
-# So 90% of the values are within -p05 and +p05
-print('Should be 90%:', scipy.stats.norm.cdf(-p05) - scipy.stats.norm.cdf(p05))
+# Get the 5-th percentile point of a normal distribution, centered at 0, and
+# check that 5% of the area is below it, and 90% within -p05 and +p05, see
+# base.normal_range()
+r = base.normal_range()
+print('Should be 5%:', r['Should be 5%'])
+print('Should be 90%:', r['Should be 90%'])
 
 # The width of this bracket is 2 * -p05
-print('Width of the 5th-95th percentile range:', 2 * -p05)
-print('Alternatively, +-', -p05)
+print('Width of the 5th-95th percentile range:',
+      r['Width of the 5th-95th percentile range'])
+print('Alternatively, +-', r['Alternatively, +-'])
 
@@ -3,63 +3,36 @@
 # Calculates statistics about the standard deviations reported in the midpoints
 # data.
 #
-import numpy as np
-
 import base
 
 nooocytes = True
 
+# Load data
+data = base.load()
 if nooocytes:
-    w = 'where cell != "Oocyte"'
-    a = 'and cell != "Oocyte"'
-else:
-    w = a = ''
-
-with base.connect() as con:
-    c = con.cursor()
-
-    # Count total number of reports (1 or more per publication)
-    row = next(c.execute(f'select count(pub) from midpoints_wt {w}'))
-    print(f'Total experiments: {row[0]}')
-
-    # Count total number of publications
-    row = next(c.execute(f'select count(distinct(pub)) from midpoints_wt {w}'))
-    print(f'Total studies: {row[0]}')
-
-    # Count Va measurements
-    print()
-    row = next(c.execute(
-        f'select count(va) from midpoints_wt where na > 0 {a}'))
-    print(f'Total Va experiments: {row[0]}')
-    ns = np.array([int(row[0]) for row in c.execute(
-        f'select na from midpoints_wt where na > 0 {a}')])
-    print(f'  Min, max, median', np.min(ns), np.max(ns), np.median(ns))
-
-    # Count Vi measurements
-    row = next(c.execute(
-        f'select count(vi) from midpoints_wt where ni > 0 {a}'))
-    print(f'Total Vi experiments: {row[0]}')
-    ns = np.array([int(row[0]) for row in c.execute(
-        f'select ni from midpoints_wt where ni > 0 {a}')])
-    print(f'  Min, max, median', np.min(ns), np.max(ns), np.median(ns))
-
-    # Count Va + Vi measurements
-    print()
-    row = next(c.execute(
-        f'select count(vi) from midpoints_wt where na > 0 and ni > 0 {a}'))
-    print(f'Total Va+Vi experiments: {row[0]}')
-    row = next(c.execute(
-        f'select count(vi) from midpoints_wt where na > 0 and ni == 0 {a}'))
-    print(f'Va-only experiments: {row[0]}')
-    row = next(c.execute(
-        f'select count(vi) from midpoints_wt where ni > 0 and na == 0 {a}'))
-    print(f'Vi-only experiments: {row[0]}')
-
-    # Cell count
-    print()
-    row = next(c.execute(f'select sum(na), sum(ni) from midpoints_wt {w}'))
-    print(f'Total cells act: {int(row[0])}')
-    print(f'Total cells inact: {int(row[1])}')
-    row = next(c.execute(f'select sum(max(na, ni)) from midpoints_wt {w}'))
-    print(f'Total lower bound: {int(row[0])}')
+    data = base.no_oocytes(data)
+r = base.experiment_counts(data)
+
+# Count total number of reports (1 or more per publication), and publications
+print(f'Total experiments: {r["Total experiments"]}')
+print(f'Total studies: {r["Total studies"]}')
+
+# Count Va and Vi measurements
+print()
+print(f'Total Va experiments: {r["Total Va experiments"]}')
+print('  Min, max, median', *r['Va n min, max, median'])
+print(f'Total Vi experiments: {r["Total Vi experiments"]}')
+print('  Min, max, median', *r['Vi n min, max, median'])
+
+# Count Va + Vi measurements
+print()
+print(f'Total Va+Vi experiments: {r["Total Va+Vi experiments"]}')
+print(f'Va-only experiments: {r["Va-only experiments"]}')
+print(f'Vi-only experiments: {r["Vi-only experiments"]}')
+
+# Cell count
+print()
+print(f'Total cells act: {r["Total cells act"]}')
+print(f'Total cells inact: {r["Total cells inact"]}')
+print(f'Total lower bound: {r["Total lower bound"]}')
 
@@ -2,33 +2,25 @@
 #
 # Calculates statistics about the means reported in the midpoints data.
 #
-import numpy as np
-
 import base
 
 nooocytes = True
-qand = ' and cell != "Oocyte"'
 
-# Query db
-with base.connect() as con:
-    c = con.cursor()
-    q = f'select ki from midpoints_wt where ki is not null {qand}'
-    ki = np.array([row['ki'] for row in c.execute(q)])
-    q = f'select ka from midpoints_wt where ka is not null {qand}'
-    ka = np.array([row['ka'] for row in c.execute(q)])
+# Load data
+data = base.load()
+if nooocytes:
+    data = base.no_oocytes(data)
 
 # Calculate
-print('Slope of inactivation')
-print(f'Min:    {np.min(ki)}')
-print(f'Max:    {np.max(ki)}')
-print(f'Median: {np.median(ki):.1f}')
-print(f'Range:  {np.max(ki) - np.min(ki):.1f}')
-print(f'90th p: {np.percentile(ki, 95) - np.percentile(ki, 5):.1f}')
-print()
-print('Slope of activation')
-print(f'Min:    {np.min(ka)}')
-print(f'Max:    {np.max(ka)}')
-print(f'Median: {np.median(ka):.1f}')
-print(f'Range:  {np.max(ka) - np.min(ka):.1f}')
-print(f'90th p: {np.percentile(ka, 95) - np.percentile(ka, 5):.1f}')
+r = base.slope_summary(data)
+for i, name in enumerate(('inactivation', 'activation')):
+    if i:
+        print()
+    s = r[f'Slope of {name}']
+    print(f'Slope of {name}')
+    print(f'Min:    {s["Min"]}')
+    print(f'Max:    {s["Max"]}')
+    print(f'Median: {s["Median"]:.1f}')
+    print(f'Range:  {s["Range"]:.1f}')
+    print(f'90th p: {s["90th p"]:.1f}')
 
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+#
+# Pooled midpoints, weighted by the reported standard deviations and numbers
+# of cells, using fixed-effect and random-effects meta-analysis.
+#
+import numpy as np
+
+import base
+
+nooocytes = True
+
+# Minimum number of experiments for a subgroup to be shown
+min_k = 3
+
+# Random-effects method to show for subgroups
+method = 'reml'
+
+# Load data
+data = base.load()
+if nooocytes:
+    data = base.no_oocytes(data)
+
+# Groupings, including one that pools all experiments
+groupings = {'all': ['all'] * len(data)}
+for name in ('sequence', 'beta1', 'cell', 'journal'):
+    groupings[name] = [None if v == '' else v for v in data[name]]
+groupings['ljp_corrected'] = [
+    'not mentioned' if v is None else v for v in data['ljp_corrected']]
+
+# Pooled estimates, ignoring unreported midpoints
+results = base.pooled_midpoints(data, groupings)
+
+# Show pooled estimates of all methods
+print('All experiments')
+print(f'{"":<3} {"Method":<6} {"k":>4} {"Estimate":>8} {"95% CI":>17}'
+      f' {"tau^2":>7} {"I^2":>6}')
+for i in np.flatnonzero(results['grouping'] == 'all'):
+    r = results.row(i)
+    print(f'{r["quantity"]:<3} {r["method"]:<6} {r["k"]:>4}'
+          f' {r["estimate"]:>8.2f} [{r["lo"]:>7.2f}, {r["hi"]:>7.2f}]'
+          f' {r["tau2"]:>7.2f} {r["i2"]:>5.1f}%')
+
+# Show subgroups
+print()
+print(f'Subgroups with at least {min_k} experiments ({method})')
+print(f'{"Grouping":<13} {"Level":<20} {"":<3} {"k":>4} {"Estimate":>8}'
+      f' {"95% CI":>17} {"tau^2":>7} {"I^2":>6}')
+show = ((results['grouping'] != 'all') & (results['method'] == method)
+        & (results['k'] >= min_k))
+for i in np.flatnonzero(show):
+    r = results.row(i)
+    print(f'{r["grouping"]:<13} {str(r["level"]):<20.20} {r["quantity"]:<3}'
+          f' {r["k"]:>4} {r["estimate"]:>8.2f}'
+          f' [{r["lo"]:>7.2f}, {r["hi"]:>7.2f}]'
+          f' {r["tau2"]:>7.2f} {r["i2"]:>5.1f}%')
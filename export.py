@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+#
+# Exports the midpoints data to a memory-mappable, column-oriented format.
+#
+# Usage:
+#
+#   export.py [path]
+#
+# Writes all rows of midpoints_wt, with their publication details (as returned
+# by base.load), to a directory with one .npy file per column and a
+# manifest.json, see base.export_columns. Text columns are dictionary-encoded.
+#
+# By default, the export is written next to the database (e.g. to
+# base/midpoints-columns for base/midpoints.sqlite), where base.load finds it
+# and memory-maps it instead of querying the database, as long as the database
+# is unchanged. Processes that load the data at the same time then share a
+# single copy through the page cache. To export a different database, set the
+# environment variable MIDPOINTS_DB, e.g.:
+#
+#   MIDPOINTS_DB=big.sqlite ./export.py
+#
+import argparse
+import os
+import time
+
+import base
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Exports the midpoints data to .npy files.')
+    parser.add_argument(
+        'path', nargs='?', default=None,
+        help='Directory to write to (default: next to the database)')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    path = base.export_columns(args.path)
+    size = sum(e.stat().st_size for e in os.scandir(path))
+    print(f'Exported {len(base.open_columns(path))} rows to {path}'
+          f' ({size / 1024**2:.1f} MB) in {time.perf_counter() - t0:.1f} s')
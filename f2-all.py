@@ -18,16 +18,19 @@ nooocytes = True
 
 # Gather data
 print('Gathering data')
-with base.connect() as con:
-    c = con.cursor()
+data = base.load()
+if nooocytes:
+    data = base.no_oocytes(data)
 
-    qand = ' and cell != "Oocyte"' if nooocytes else ''
-    q = ('select vi, semi, stdi, ni from midpoints_wt'
-         f' where ni > 0 {qand} order by vi')
-    i = [row for row in c.execute(q)]
-    q = ('select va, sema, stda, na from midpoints_wt'
-         f' where na > 0 {qand} order by va')
-    a = [row for row in c.execute(q)]
+
+def sorted_columns(data, names):
+    """ Returns a 2d array with the given columns, sorted on the first. """
+    x = np.stack([data[name] for name in names], axis=1)
+    return x[np.argsort(x[:, 0], kind='stable')]
+
+
+i = sorted_columns(data.select(data['ni'] > 0), ('vi', 'semi', 'stdi', 'ni'))
+a = sorted_columns(data.select(data['na'] > 0), ('va', 'sema', 'stda', 'na'))
 
 #
 # Create figure
@@ -70,22 +73,26 @@ ci = 'tab:orange'
 m = 'o'
 ms = 3
 
-offset = max(0, (len(a) - len(i)) / 2)
-for k, d in enumerate(i):
-    mu, sem, std, n = d
 
-    k += offset
-    ax1.plot((mu - s90 * std, mu + s90 * std), (k, k), **sstd, zorder=2)
-    ax1.plot((mu - sem, mu + sem), (k, k), **ssem, zorder=3)
-    ax1.plot(mu, k, m, color=ci, markersize=ms, zorder=4)
+def bars(ax, d, k, color):
+    """
+    Draws the percentile range, SEM, and mean for every experiment in ``d``
+    at the heights ``k``, using a single artist for each.
+    """
+    mu, sem, std = d[:, 0], d[:, 1], d[:, 2]
+    for lo, hi, style, z in ((mu - s90 * std, mu + s90 * std, sstd, 2),
+                             (mu - sem, mu + sem, ssem, 3)):
+        segments = np.stack((np.stack((lo, k), axis=1),
+                             np.stack((hi, k), axis=1)), axis=1)
+        ax.add_collection(matplotlib.collections.LineCollection(
+            segments, colors=style['color'], linewidths=style.get('lw'),
+            capstyle='projecting', zorder=z))
+    ax.plot(mu, k, m, color=color, markersize=ms, zorder=4)
 
-offset = max(0, (len(i) - len(a)) / 2)
-for k, d in enumerate(a):
-    mu, sem, std, n = d
 
-    ax1.plot((mu - s90 * std, mu + s90 * std), (k, k), **sstd, zorder=2)
-    ax1.plot((mu - sem, mu + sem), (k, k), **ssem, zorder=3)
-    ax1.plot(mu, k, m, color=ca, markersize=ms, zorder=4)
+offset = max(0, (len(a) - len(i)) / 2)
+bars(ax1, i, offset + np.arange(len(i)), ci)
+bars(ax1, a, np.arange(len(a)), ca)
 
 ms2 = 12
 elements = [
@@ -103,8 +110,8 @@ ax1.legend(loc='upper left', frameon=False, handles=elements)
 #
 # Middle: histogram of Vi, Va
 #
-vi, _, stdi, ni = np.array([row for row in i]).T
-va, _, stda, na = np.array([row for row in a]).T
+vi, _, stdi, ni = i.T
+va, _, stda, na = a.T
 
 bins = np.arange(*xlim, 2.5)
 kwargs = dict(bins=bins, facecolor='none')
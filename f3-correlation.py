@@ -20,6 +20,12 @@ nooocytes = True
 # Show ellipses
 ellipses = False
 
+# Draw a density image instead of ellipses above this number of experiments
+max_ellipses = 2000
+
+# Calculate bootstrap intervals
+bootstrap = True
+
 # Plot tweaks
 highlight_example = True
 #iexample = 72 if nooocytes else 82
@@ -27,31 +33,17 @@ iexample = 15 if nooocytes else 16
 
 # Gather data
 print('Gathering data')
-with base.connect() as con:
-    c = con.cursor()
-
-    # Get all data
-    def get(query):
-        """ Return rows of [pub, va, vi, stda, stdi, na, ni]. """
-        pub, va, vi, stda, stdi, na, ni = [], [], [], [], [], [], []
-        for row in c.execute(query):
-            pub.append(row['pub'])
-            va.append(row['va'])
-            vi.append(row['vi'])
-            stda.append(row['stda'])
-            stdi.append(row['stdi'])
-            na.append(row['na'])
-            ni.append(row['ni'])
-        return pub, va, vi, stda, stdi, na, ni
-
-    qand = 'and cell != "Oocyte"' if nooocytes else ''
-    q = ('select pub, va, stda, vi, stdi, na, ni from midpoints_wt'
-         f' where (na > 0 and ni > 0 {qand})')
-    d_all = get(q)
-    n_all = len(d_all[0])
+data = base.load()
+if nooocytes:
+    data = base.no_oocytes(data)
+data = data.select((data['na'] > 0) & (data['ni'] > 0))
+
+# Columns [pub, va, vi, stda, stdi, na, ni]
+d_all = tuple(data[x] for x in ('pub', 'va', 'vi', 'stda', 'stdi', 'na', 'ni'))
+n_all = len(data)
 
 # Extract va and vi
-va, vi = np.array(d_all[1]), np.array(d_all[2])
+va, vi = d_all[1], d_all[2]
 
 # Find example point
 i = np.where(va < -55)[0]
@@ -112,12 +104,55 @@ def ci_linear_1d(x, y, alpha=95):
     return lambda z: ts * np.sqrt(ni + (z - mu)**2 * di)
 
 
+def gaussian_density(x, y, mx, my, sx, sy):
+    """
+    Returns a 2d array with the sum of the probability density functions of
+    independent normal distributions ``(mx[k], sx[k])`` and ``(my[k], sy[k])``
+    evaluated on the grid ``(x, y)``, with shape ``(len(y), len(x))``.
+
+    Because every term is separable, the sum is calculated as a single matrix
+    product of the 1d densities, in chunks of experiments.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    mx, my, sx, sy = (np.asarray(v, dtype=float) for v in (mx, my, sx, sy))
+    z = np.zeros((len(y), len(x)))
+    size = max(1, 2**22 // max(len(x), len(y)))
+    for i in range(0, len(mx), size):
+        j = slice(i, i + size)
+        gx = scipy.stats.norm.pdf(x[None, :], mx[j, None], sx[j, None])
+        gy = scipy.stats.norm.pdf(y[None, :], my[j, None], sy[j, None])
+        z += gy.T @ gx
+    return z
+
+
 # Fit line with slope of 1
 a2 = np.polyfit(va, vi - va, 0)[0]
 b2 = 1
 print('Slope=1 fit')
 print(f'  a, b: {a2}, {b2}')
 
+# Bivariate random-effects model, using the within-study variances
+bv = base.bivariate_meta_analysis(
+    va, vi, d_all[3]**2 / d_all[5], d_all[4]**2 / d_all[6]).row(0)
+print('Bivariate random-effects model (REML)')
+print(f'  Pooled mean: {bv["mean_x"]:.1f} +- {bv["se_x"]:.2f},'
+      f' {bv["mean_y"]:.1f} +- {bv["se_y"]:.2f}')
+print(f'  Between-study SD: {np.sqrt(bv["tau2_x"]):.1f},'
+      f' {np.sqrt(bv["tau2_y"]):.1f}')
+print(f'  Between-study correlation: {bv["rho"]:.2f}')
+print(f'  Main axis a, b: {bv["intercept"]:.1f}, {bv["slope"]:.2f}')
+
+# Bootstrap intervals, resampling experiments or whole publications
+if bootstrap:
+    for name, clusters in (('experiments', None), ('publications', d_all[0])):
+        print(f'Bootstrap 95% intervals, resampling {name}')
+        ci = base.bootstrap_fit(va, vi, clusters, seed=1)
+        for row in (ci.row(i) for i in range(len(ci))):
+            print(f'  {row["statistic"]:<12} {row["estimate"]:6.2f}'
+                  f'  percentile [{row["percentile_lo"]:6.2f},'
+                  f' {row["percentile_hi"]:6.2f}]'
+                  f'  BCa [{row["bca_lo"]:6.2f}, {row["bca_hi"]:6.2f}]')
+
 #
 # Create figure
 #
@@ -139,13 +174,19 @@ ax.grid(True, ls=':')
 ax.set(xlim=xlim, ylim=ylim)
 #ax.axis('equal')  This changes the limits
 
-# Ellipses
-if ellipses:
-    for va, vi, stda, stdi in zip(*d_all[1:5]):
-        e = matplotlib.patches.Ellipse(
-            (va, vi), width=2 * s90 * stda, height=2 * s90 * stdi,
-            facecolor='tab:blue', edgecolor='k', alpha=0.05)
-        ax.add_artist(e).set_rasterized(True)
+# Ellipses, or a density image if there are too many
+density = ellipses and n_all > max_ellipses
+if density:
+    ex, ey = np.linspace(*xlim, 501), np.linspace(*ylim, 541)
+    z = gaussian_density(ex, ey, *d_all[1:5])
+    ax.imshow(z, extent=xlim + ylim, origin='lower', aspect='auto',
+              cmap='Blues', interpolation='bilinear', zorder=0,
+              rasterized=True)
+elif ellipses:
+    ax.add_collection(matplotlib.collections.EllipseCollection(
+        2 * s90 * d_all[3], 2 * s90 * d_all[4], 0, units='xy',
+        offsets=np.stack(d_all[1:3], axis=1), offset_transform=ax.transData,
+        facecolor='tab:blue', edgecolor='k', alpha=0.05, rasterized=True))
 
 # Projections / orthogonal
 a, b = a1, b1
@@ -209,7 +250,10 @@ ms2 = 12
 elements = []
 elements.append(l2d(marker=m, color='k', ls='none', markerfacecolor='w',
                     label=f'Experiments ({len(d_all[1])})'))
-if ellipses:
+if density:
+    elements.append(matplotlib.patches.Patch(
+        color='tab:blue', label='Density of experiments'))
+elif ellipses:
     elements.append(l2d(marker=m, color='tab:blue', ls='none',
                         label=r'90th percentiles'))
 elements.append(l2d(marker='*', ls='none', color='yellow', markersize=11,
@@ -15,13 +15,10 @@ nooocytes = True
 
 # Gather data
 print('Gathering data')
-with base.connect() as con:
-    c = con.cursor()
-
-    qand = 'and cell != "Oocyte"' if nooocytes else ''
-    q = ('select va, vi, sequence, beta1, cell, pub from midpoints_wt'
-         f' where (ni > 0 and na > 0 {qand})')
-    p = [row for row in c.execute(q)]
+qand = 'and cell != "Oocyte"' if nooocytes else ''
+q = ('select va, vi, sequence, beta1, cell, pub from midpoints_wt'
+     f' where (ni > 0 and na > 0 {qand})')
+p = list(base.query(q))
 
 #
 # Create figure
@@ -160,6 +157,25 @@ ax23.plot(v[:, 0], v[:, 1], 'o', zorder=2, color='#ccc',
           label=f'Other ({len(v)})', **kwargs)
 ax23.legend(ncol=1, loc=(0.10, 0.995), **leg)
 
+# Permutation tests for differences in Va, Vi, and offset from the linear fit
+print('Testing subgroups')
+v = np.array([r[:2] for r in p])
+values = np.stack((v[:, 0], v[:, 1], v[:, 1] - (a1 + b1 * v[:, 0])), axis=1)
+groupings = dict(
+    sequence=[r[2] for r in p],
+    beta1=[r[3] for r in p],
+    cell=[r[4] for r in p],
+    kapplinger=[r[5] == 'Kapplinger 2015' for r in p],
+    tan=[r[5] == 'Tan 2005' for r in p],
+)
+tests = base.permutation_test(
+    groupings, values, ['va', 'vi', 'offset'], seed=1)
+for t in (tests.row(i) for i in range(len(tests))):
+    print(f'  {t["grouping"]:<10} {str(t["level_a"]):>5} vs'
+          f' {str(t["level_b"]):<5} ({t["n_a"]:>3}, {t["n_b"]:>3})'
+          f'  {t["quantity"]:<6} {t["difference"]:6.2f} mV'
+          f'  p={t["p"]:.3f} ({t["method"]})')
+
 #y = 0.105
 x0 = -0.069
 x1 = 0
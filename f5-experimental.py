@@ -14,51 +14,35 @@ nooocytes = True
 qand = 'and cell != "Oocyte"' if nooocytes else ''
 
 
-def fit_line(ax, x, y):
-    """ Fit line to x and y and plot on ax """
-    p = np.corrcoef(x, y)[1, 0]
-    b, a = np.polyfit(x, y, 1)
-
-    lo, hi = np.min(x), np.max(x)
-    pad = 0.05 * (hi - lo)
-    xx = np.linspace(lo - pad, hi + pad)
-    ax.plot(xx, a + b * xx)
-    ax.text(1, 1.01, f'$n={len(x)}$, $r^2={p**2:.2f}$',
-            ha='right', va='bottom', transform=ax.transAxes)
-
-
 def va(factor, extra=''):
     """ Fetch data for Va and given factor """
     q = (f'select {factor}, va from midpoints_wt'
          f' where (na > 0 and {factor} is not null {extra} {qand})')
-    p = np.array([row for row in c.execute(q)])
-    return p[:, 0], p[:, 1]
+    p = base.query(q)
+    return p[factor].astype(float), p['va']
 
 
 def vi(factor):
     """ Fetch data for Vi and given factor """
     q = (f'select {factor}, vi from midpoints_wt'
          f' where (ni > 0 and {factor} is not null {qand})')
-    p = np.array([row for row in c.execute(q)])
-    return p[:, 0], p[:, 1]
+    p = base.query(q)
+    return p[factor].astype(float), p['vi']
 
 
 # Gather data
 print('Gathering data')
-with base.connect() as con:
-    c = con.cursor()
-
-    q = ('select va, vi, sequence, beta1, cell, ljp_corrected, pub'
-         f' from midpoints_wt where (ni > 0 and na > 0 {qand})')
-    p = [row for row in c.execute(q)]
-
-    # Activation slope
-    x_vaka, y_vaka = va('ka')
-    # V peak
-    x_vpeak, y_vpeak = va('vpeak')
-    # Holding potential
-    x_vapah, y_vapah = va('pah')
-    x_vipih, y_vipih = vi('pih')
+q = ('select va, vi, sequence, beta1, cell, ljp_corrected, pub'
+     f' from midpoints_wt where (ni > 0 and na > 0 {qand})')
+p = list(base.query(q))
+
+# Activation slope
+x_vaka, y_vaka = va('ka')
+# V peak
+x_vpeak, y_vpeak = va('vpeak')
+# Holding potential
+x_vapah, y_vapah = va('pah')
+x_vipih, y_vipih = vi('pih')
 
 
 #
@@ -107,14 +91,14 @@ ax12.set_xlabel(r'$V_{hold,a}$')
 ax12.set_ylabel(r'$\mu_a$ (mV)')
 ax12.grid(True, ls=':')
 ax12.plot(x_vapah, y_vapah, 'o', markerfacecolor='none')
-fit_line(ax12, x_vapah, y_vapah)
+base.fit_line(ax12, x_vapah, y_vapah)
 
 ax13 = fig.add_subplot(gr2[0, 1])
 ax13.set_xlabel(r'$V_{hold,i}$')
 ax13.set_ylabel(r'$\mu_i$ (mV)')
 ax13.grid(True, ls=':')
 ax13.plot(x_vipih, y_vipih, 'o', markerfacecolor='none')
-fit_line(ax13, x_vipih, y_vipih)
+base.fit_line(ax13, x_vipih, y_vipih)
 
 #
 # Voltage control
@@ -126,7 +110,7 @@ ax22.text(1.18, -0.29, 'Less steep', ha='right', transform=ax22.transAxes)
 ax22.set_ylabel(r'$\mu_a$ (mV)')
 ax22.grid(True, ls=':')
 ax22.plot(x_vaka, y_vaka, 'o', markerfacecolor='none')
-fit_line(ax22, x_vaka, y_vaka)
+base.fit_line(ax22, x_vaka, y_vaka)
 
 #
 # Voltage-shift
@@ -136,7 +120,7 @@ ax23.set_xlabel(r'$V_{peak}$ (mV)')
 ax23.set_ylabel(r'$\mu_a$ (mV)')
 ax23.grid(True, ls=':')
 ax23.plot(x_vpeak, y_vpeak, 'o', markerfacecolor='none')
-fit_line(ax23, x_vpeak, y_vpeak)
+base.fit_line(ax23, x_vpeak, y_vpeak)
 
 
 
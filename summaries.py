@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+#
+# Calculates the numbers from all d* scripts in a single process.
+#
+# Usage:
+#
+#   summaries.py [--json] [d0 d1 ...]
+#
+# Each summary uses the same function as the corresponding d* script (e.g.
+# base.experiment_counts for d1), but all are calculated from a single (cached)
+# load of the data, see base.load(). The base module (and NumPy) are only
+# imported when the first summary is calculated, and the data is only loaded
+# if a summary needs it, so that e.g. `summaries.py --help` starts quickly.
+#
+import argparse
+import json
+import sys
+
+
+def d0(data):
+    """ 5 to 95th-percentile of a normal distribution. """
+    import base
+    return base.normal_range()
+
+
+def d1(data):
+    """ Numbers of experiments, studies, and cells. """
+    import base
+    return base.experiment_counts(base.no_oocytes(data))
+
+
+def d2(data):
+    """ Standard deviations, and the corresponding 90th percentile ranges. """
+    import base
+    return base.sigma_summary(base.no_oocytes(data))
+
+
+def d3(data):
+    """ Mean midpoints of activation and inactivation. """
+    import base
+    return base.midpoint_summary(base.no_oocytes(data))
+
+
+def d4(data):
+    """ Between-experiment variability in two studies. """
+    import base
+    return base.study_ranges(data)
+
+
+def d5(data):
+    """ Lowest and highest temperatures. """
+    import base
+    return base.temperature_summary(base.no_oocytes(data))
+
+
+def d6(data):
+    """ Slopes of activation and inactivation. """
+    import base
+    return base.slope_summary(base.no_oocytes(data))
+
+
+def d7(data):
+    """ Most common activation and inactivation protocols. """
+    import base
+    return base.protocol_summary(base.no_oocytes(data))
+
+
+def d8(data):
+    """ Number of studies mentioning the LJP. """
+    import base
+    return base.ljp_mentions(base.no_oocytes(data))
+
+
+def d9(data):
+    """ Pooled midpoints, from fixed-effect and random-effects models. """
+    import base
+    t = base.pooled_midpoints(base.no_oocytes(data))
+    r = {}
+    for i in range(len(t)):
+        row = t.row(i)
+        r.setdefault(row['quantity'], {})[row['method']] = {
+            x: _python(row[x]) for x in
+            ('k', 'estimate', 'lo', 'hi', 'tau2', 'i2')}
+    return r
+
+
+# All summaries, and whether they use the data
+SUMMARIES = {
+    'd0': (d0, False),
+    'd1': (d1, True),
+    'd2': (d2, True),
+    'd3': (d3, True),
+    'd4': (d4, True),
+    'd5': (d5, True),
+    'd6': (d6, True),
+    'd7': (d7, True),
+    'd8': (d8, True),
+    'd9': (d9, True),
+}
+
+
+def _python(x):
+    """ Converts NumPy scalars to Python objects. """
+    return x.item() if hasattr(x, 'item') else x
+
+
+def summarise(names=None):
+    """
+    Calculates the summaries with the given ``names`` (default: all), and
+    returns a dict mapping names to dicts of results.
+    """
+    names = list(SUMMARIES) if names is None else names
+    data = None
+    results = {}
+    for name in names:
+        f, needs_data = SUMMARIES[name]
+        if needs_data and data is None:
+            import base
+            data = base.load()
+        results[name] = f(data)
+    return results
+
+
+def _print(results, indent=''):
+    """ Prints a nested dict of results. """
+    for key, value in results.items():
+        if isinstance(value, dict):
+            print(f'{indent}{key}')
+            _print(value, indent + '  ')
+        else:
+            if isinstance(value, list):
+                value = ', '.join(str(x) for x in value)
+            print(f'{indent}{key}: {value}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Calculates the numbers from all d* scripts.')
+    parser.add_argument(
+        'names', nargs='*', metavar='name',
+        help='Summaries to calculate, e.g. d1 (default: all)')
+    parser.add_argument(
+        '--json', action='store_true', help='Write the results as JSON')
+    args = parser.parse_args()
+
+    unknown = [x for x in args.names if x not in SUMMARIES]
+    if unknown:
+        parser.error('Unknown summaries: ' + ', '.join(unknown))
+    results = summarise(args.names or None)
+    if args.json:
+        json.dump(results, sys.stdout, indent=1)
+        print()
+    else:
+        for name, values in results.items():
+            print(f'{name}: {SUMMARIES[name][0].__doc__.strip()}')
+            _print(values, '  ')
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+#
+# Creates a synthetic midpoints database of any size, for performance testing.
+#
+# Usage:
+#
+#   synthetic.py [--seed S] N path
+#
+# The new database has the same schema as base/midpoints.sqlite, and contains
+# all of its data, plus synthetic experiments (and publications) to make up a
+# total of N rows in midpoints_wt. To run a script on the new database, set
+# the environment variable MIDPOINTS_DB to its path, e.g.:
+#
+#   ./synthetic.py 1000000 big.sqlite
+#   MIDPOINTS_DB=big.sqlite ./f2-all.py
+#
+# The flat table midpoints_flat (see base.create_flat_table), its indices, and
+# its triggers are not copied, so that rows can be inserted in bulk, and the
+# table is recreated at the end.
+#
+# Synthetic experiments are sampled as follows:
+#
+# - Whether Va, Vi, or both are reported is sampled with the same frequencies
+#   as in the real data.
+# - Va and Vi are sampled from a bivariate normal distribution with the mean
+#   and covariance of the real experiments reporting both.
+# - Standard deviations are sampled from log-normal distributions fitted to
+#   the real ones, and n from the empirical distribution of real n values.
+#   SEMs are derived from these.
+# - All other columns (protocols, solutions, cell types, sequences, etc.) are
+#   copied together from a real experiment with the same reporting pattern,
+#   so that combinations and null rates are realistic. Experiments in the same
+#   synthetic publication share this real experiment, as far as possible.
+# - The number of experiments per publication, and the years and journals of
+#   publications, are sampled from the real data.
+#
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+import base
+
+
+# Number of rows to generate and insert per transaction
+CHUNK_SIZE = 100000
+
+# Probability that an experiment uses the same template as the first
+# experiment in its publication
+P_SHARED = 0.8
+
+
+def generate(path, n, seed=None, source=None, chunk_size=CHUNK_SIZE):
+    """
+    Creates a synthetic database with ``n`` experiments at ``path``, based on
+    the database at ``source`` (default: ``base.PATH_DB``).
+
+    The database is written to a temporary file with journaling disabled, in
+    large transactions, and then moved to ``path``.
+    """
+    source = base.PATH_DB if source is None else source
+    rng = np.random.default_rng(seed)
+    temp = path + '.tmp'
+    if os.path.exists(temp):
+        os.remove(temp)
+
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(temp, isolation_level=None)
+    try:
+        dst.execute('PRAGMA journal_mode = OFF')
+        dst.execute('PRAGMA synchronous = OFF')
+        dst.execute('PRAGMA locking_mode = EXCLUSIVE')
+        dst.execute('PRAGMA cache_size = -262144')
+
+        # Copy schema (except the flat table) and all real data
+        tables = []
+        dst.execute('BEGIN')
+        for kind, name, sql in src.execute(
+                'select type, name, sql from sqlite_master'
+                ' where sql is not null order by rowid'):
+            if name == base.FLAT_TABLE or name.startswith(
+                    base.FLAT_TABLE + '_'):
+                continue
+            dst.execute(sql)
+            if kind == 'table':
+                tables.append(name)
+        for name in tables:
+            _copy(src, dst, name)
+        dst.execute('COMMIT')
+
+        # Fit to real data
+        model = _Model(src)
+
+        # Add synthetic experiments, and their publications
+        todo = n - model.n
+        pubs = 0
+        while todo > 0:
+            size = min(chunk_size, todo)
+            dst.execute('BEGIN')
+            pubs = model.insert(dst, rng, size, pubs)
+            dst.execute('COMMIT')
+            todo -= size
+
+        # Recreate the flat table, with its indices and triggers
+        dst.execute('BEGIN')
+        base.create_flat_table(dst)
+    finally:
+        src.close()
+        dst.close()
+    os.replace(temp, path)
+
+
+class _Model(object):
+    """ Distributions fitted to the real experiments and publications. """
+    def __init__(self, con):
+        c = con.execute('select * from midpoints_wt order by rowid')
+        self.columns = [x[0] for x in c.description]
+        rows = c.fetchall()
+        self.n = len(rows)
+        data = {k: np.array(v, dtype=object)
+                for k, v in zip(self.columns, zip(*rows))}
+        self.templates = data
+
+        # Reporting patterns: both, Va only, Vi only
+        na = data['na'].astype(float)
+        ni = data['ni'].astype(float)
+        self.patterns = np.where(ni == 0, 1, np.where(na == 0, 2, 0))
+        self.pools = [np.nonzero(self.patterns == k)[0] for k in range(3)]
+        self.pattern_p = np.array([len(x) for x in self.pools]) / self.n
+
+        # Bivariate normal for Va and Vi
+        both = (na > 0) & (ni > 0)
+        v = np.stack((data['va'][both], data['vi'][both]), axis=1)
+        v = v.astype(float)
+        self.v_mean = np.mean(v, axis=0)
+        self.v_cov = np.cov(v, rowvar=False)
+
+        # Log-normal standard deviations, and empirical n
+        self.std = []
+        self.ns = []
+        for s, m in (('stda', na), ('stdi', ni)):
+            x = np.log(data[s][m > 0].astype(float))
+            self.std.append((np.mean(x), np.std(x, ddof=1)))
+            self.ns.append(m[m > 0])
+
+        # Experiments per publication
+        self.counts = np.unique(data['pub'], return_counts=True)[1]
+        q = ('select year, journal from publication where key in'
+             ' (select pub from midpoints_wt)')
+        self.years, self.journals = (
+            np.array(x, dtype=object) for x in zip(*con.execute(q)))
+
+    def insert(self, con, rng, n, pubs):
+        """
+        Inserts ``n`` synthetic experiments, numbering new publications from
+        ``pubs``, and returns the new number of publications.
+        """
+        # Number of experiments per publication, and publication per experiment
+        counts = rng.choice(self.counts, size=n)
+        ends = np.cumsum(counts)
+        m = np.searchsorted(ends, n) + 1
+        counts = counts[:m]
+        counts[-1] -= ends[m - 1] - n
+        first = np.repeat(np.arange(m), counts)
+
+        # Publication table entries
+        years = rng.choice(self.years, size=m)
+        journals = rng.choice(self.journals, size=m)
+        keys = [f'Synthetic{pubs + i} {y}' for i, y in enumerate(years)]
+        con.executemany(
+            'insert into publication values (?, ?, ?, ?, ?)',
+            zip(keys, (f'Synthetic{pubs + i}' for i in range(m)),
+                years.tolist(), journals.tolist(),
+                (f'Synthetic publication {pubs + i}' for i in range(m))))
+        con.executemany(
+            'insert into publication_tex values (?, ?)',
+            ((k, k.replace(' ', '') + 'Synthetic') for k in keys))
+
+        # Reporting patterns, and templates with the same pattern: shared per
+        # publication where possible, or chosen per experiment
+        pattern = rng.choice(3, size=n, p=self.pattern_p)
+        template = np.zeros(n, dtype=int)
+        for k, pool in enumerate(self.pools):
+            i = pattern == k
+            template[i] = pool[rng.integers(0, len(pool), size=np.sum(i))]
+        shared = rng.integers(0, self.n, size=m)[first]
+        use = (self.patterns[shared] == pattern) & (rng.random(n) < P_SHARED)
+        template[use] = shared[use]
+
+        # Sampled columns
+        v = rng.multivariate_normal(self.v_mean, self.v_cov, size=n)
+        has = (pattern != 2, pattern != 1)
+        sampled = {'pub': np.array(keys, dtype=object)[first]}
+        for j, (x, stats, ns) in enumerate(zip('ai', self.std, self.ns)):
+            std = np.exp(rng.normal(stats[0], stats[1], size=n))
+            count = rng.choice(ns, size=n)
+            sem = std / np.sqrt(count)
+            for name, value in (('v', v[:, j]), ('sem', sem), ('n', count),
+                                ('std', std)):
+                sampled[name + x] = np.where(has[j], value, 0)
+
+        # Insert, with all other columns copied from the templates
+        columns = [sampled[k].tolist() if k in sampled
+                   else self.templates[k][template].tolist()
+                   for k in self.columns]
+        con.executemany(
+            f'insert into midpoints_wt values'
+            f' ({", ".join("?" * len(columns))})', zip(*columns))
+        return pubs + m
+
+
+def _copy(src, dst, table):
+    """ Copies all rows in ``table`` from ``src`` to ``dst``. """
+    c = src.execute(f'select * from "{table}"')
+    q = ', '.join('?' * len(c.description))
+    dst.executemany(f'insert into "{table}" values ({q})', c)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Creates a synthetic midpoints database.')
+    parser.add_argument(
+        'n', type=int, help='Total number of experiments')
+    parser.add_argument(
+        'path', help='Path of the database to create')
+    parser.add_argument(
+        '--seed', type=int, default=None, help='Random seed')
+    args = parser.parse_args()
+
+    if os.path.abspath(args.path) == os.path.abspath(base.PATH_DB):
+        sys.exit('Refusing to overwrite the source database.')
+    t0 = time.perf_counter()
+    generate(args.path, args.n, args.seed)
+    print(f'Created {args.path} with {args.n} experiments in'
+          f' {time.perf_counter() - t0:.1f} s')
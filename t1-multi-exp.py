@@ -2,60 +2,37 @@
 #
 # Calculates max between exp var in Kapplinger and Tan
 #
+# Add 'csv' and/or 'md' as arguments to also write CSV and Markdown tables.
+#
+import sys
+
 import base
 
-filename = 't1-multi-exp.tex'
+filename = 't1-multi-exp'
 nooocytes = True
 
+# Output formats
+formats = ['tex'] + [x for x in ('csv', 'md') if x in sys.argv]
+
 qo = 'where cell != "Oocyte"' if nooocytes else ''
 
-# Collect journal references
-refs = {}
-with base.connect() as con:
-    c = con.cursor()
-    q = 'select key, tex from publication_tex'
-    for k, row in enumerate(c.execute(q)):
-        refs[row['key']] = row['tex']
+columns = [
+    base.Column('pub', 'Publication', formats=('csv', 'md')),
+    base.Column('ref', 'Publication', tex_format=r'\citet{{{}}}',
+                align='p{6cm}', formats=('tex', )),
+    base.Column('experiments', 'Number of experiments', format='{:.3g}'),
+]
 
 caption = """
 All reviewed studies containing more than one experiment.
 """.strip()
 
-print(f'Writing to {filename}...')
-with open(filename, 'w') as f:
-    # Head
-    eol = '\n'
-    f.write(r'\startrowcolors' + eol)
-    f.write(r'\begin{longtable}{p{6cm}|l}' + eol)
-    f.write(r'\caption{' + caption + r'} \\' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\rowcolor{white}' + eol)
-    f.write(r'Publication')
-    f.write(r' & Number of experiments')
-    f.write(r'\\ \hline' + eol)
-    f.write(r'\endfirsthead' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\rowcolor{white}' + eol)
-    f.write(r'Publication')
-    f.write(r' & Number of experiments')
-    f.write(r'\\ \hline' + eol)
-    f.write(r'\endhead' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\endfoot' + eol)
-
-    # Body
-    form = '{:.3g}'
-    with base.connect() as con:
-        c = con.cursor()
-        rows = c.execute(f'select pub, count(*) as c from midpoints_wt {qo}'
-                         ' group by pub having c > 1 order by c desc;')
-        for row in rows:
-            x = []
-            x.append(r'\citet{' + refs[row['pub']] + '}')
-            x.append(form.format(row['c']))
-            f.write(' & '.join(x) + r' \\' + eol)
-
-    # Footer
-    f.write(r'\end{longtable}' + eol)
-
-print('Done.')
+with base.connect() as con:
+    c = con.cursor()
+    c.row_factory = None
+    rows = c.execute(
+        'select pub, tex, count(*) as c'
+        f' from {base.FLAT_TABLE} {qo} group by pub having c > 1'
+        ' order by c desc, pub desc;')
+    files = base.write_table(filename, columns, rows, formats, caption)
+print('Written to ' + ', '.join(files))
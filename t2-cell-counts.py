@@ -3,13 +3,20 @@
 # Calculates statistics about the standard deviations reported in the midpoints
 # data.
 #
+# Add 'csv' and/or 'md' as arguments to also write CSV and Markdown tables.
+#
+import sys
+
 import numpy as np
 
 import base
 
-filename = 't2-cell-counts.tex'
+filename = 't2-cell-counts'
 nooocytes = True
 
+# Output formats
+formats = ['tex'] + [x for x in ('csv', 'md') if x in sys.argv]
+
 a = 'and cell != "Oocyte"' if nooocytes else ''
 with base.connect() as con:
     c = con.cursor()
@@ -37,37 +44,15 @@ final column provides the cumulative percentage (e.g. {cumulative[i]}\% of
 experiments had an $|n_a - n_i| \leq {bins[i]}$).
 """.strip()
 
-print(f'Writing to {filename}...')
-with open(filename, 'w') as f:
-    # Head
-    eol = '\n'
-    f.write(r'\startrowcolors' + eol)
-    f.write(r'\begin{longtable}{l|l|l|l}' + eol)
-    f.write(r'\caption{' + caption + r'} \\' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\rowcolor{white}' + eol)
-    f.write(r'$|n_a - n_i|$')
-    f.write(r' & Number of occurrences')
-    f.write(r' & Percentage')
-    f.write(r' & Cumulative percentage')
-    f.write(r'\\ \hline' + eol)
-    f.write(r'\endfirsthead' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\rowcolor{white}' + eol)
-    f.write(r'$|n_a - n_i|$')
-    f.write(r' & Number of occurrences')
-    f.write(r' & Percentage')
-    f.write(r' & Cumulative percentage')
-    f.write(r'\\ \hline' + eol)
-    f.write(r'\endhead' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\endfoot' + eol)
-
-    # Body
-    for b, c, p, q in zip(bins, counts, percentages, cumulative):
-        f.write(rf'{b:2d} & {c:2d} & {p:>4.1f}\% & {q:>5.1f}\% \\{eol}')
-
-    # Footer
-    f.write(r'\end{longtable}' + eol)
-
-print('Done.')
+columns = [
+    base.Column('difference', r'|na - ni|', r'$|n_a - n_i|$',
+                tex_format='{:2d}'),
+    base.Column('occurrences', 'Number of occurrences', tex_format='{:2d}'),
+    base.Column('percentage', 'Percentage', tex_format=r'{:>4.1f}\%'),
+    base.Column('cumulative', 'Cumulative percentage',
+                tex_format=r'{:>5.1f}\%'),
+]
+files = base.write_table(
+    filename, columns, zip(bins, counts, percentages, cumulative), formats,
+    caption)
+print('Written to ' + ', '.join(files))
@@ -2,105 +2,84 @@
 #
 # Creates a tex table of all reported midpoints.
 #
+# Add 'csv' and/or 'md' as arguments to also write CSV and Markdown tables.
+#
+import sys
+
 import base
 
-filename = 't3-all-midpoints.tex'
+filename = 't3-all-midpoints'
 nooocytes = True
 
-qo = 'where cell != "Oocyte"' if nooocytes else ''
+# Maximum number of rows per tex file, or None to write a single file. If set,
+# the rows are split over 't3-all-midpoints.tex', 't3-all-midpoints-2.tex',
+# etc., each containing a separate longtable.
+max_rows = None
 
-# Collect journal references
-refs = {}
-with base.connect() as con:
-    c = con.cursor()
-    q = 'select key, tex from publication_tex'
-    for k, row in enumerate(c.execute(q)):
-        refs[row['key']] = row['tex']
+# Number of rows to fetch from the database at a time
+chunk_size = 10000
 
-# Fields to select from DB
-fields = [
-    'pub',
-    'va',
-    'na',
-    'stda',
-    'vi',
-    'ni',
-    'stdi',
-    'sequence',
-    'cell',
-    'beta1',
-]
+# Output formats
+formats = ['tex'] + [x for x in ('csv', 'md') if x in sys.argv]
 
+qo = 'where m.cell != "Oocyte"' if nooocytes else ''
 
-# Sequence formatting
-def seq(s):
-    if s == 'astar':
-        return 'a*'
-    elif s == 'bstar':
-        return 'b*'
-    elif s is None:
-        return '?'
-    return s
+# Fields to select from DB, with the reference joined in, sequence and cell
+# names formatted, and midpoints omitted if not reported
+fields = [
+    'm.pub',
+    'm.tex',
+    'case when m.na != 0 then m.va end',
+    'case when m.na != 0 then m.stda end',
+    'case when m.na != 0 then m.na end',
+    'case when m.ni != 0 then m.vi end',
+    'case when m.ni != 0 then m.stdi end',
+    'case when m.ni != 0 then m.ni end',
+    'replace(m.cell, "Oocyte", "Ooc.")',
+    'case m.sequence when "astar" then "a*" when "bstar" then "b*"'
+    ' else ifnull(m.sequence, "?") end',
+    'm.beta1',
+]
 
+# Columns
+form = '{:.3g}'
+columns = [
+    base.Column('pub', 'Study', formats=('csv', 'md')),
+    base.Column('ref', 'Study', tex_format=r'\citet{{{}}}', align='p{6cm}',
+                formats=('tex', )),
+    base.Column('va', 'Va', r'$V_a$', format=form),
+    base.Column('stda', 'σa', r'$\sigma_a$', format=form),
+    base.Column('na', 'na', r'$n_a$', format=form),
+    base.Column('vi', 'Vi', r'$V_i$', format=form),
+    base.Column('stdi', 'σi', r'$\sigma_i$', format=form),
+    base.Column('ni', 'ni', r'$n_i$', format=form),
+    base.Column('cell', 'Cell'),
+    base.Column('sequence', 'α', r'$\alpha$'),
+    base.Column('beta1', 'β1', r'$\beta1$'),
+]
 
 # Caption
-i = 3
 caption = r"""
 All experiments reviewed in this manuscript.
 A structured database containing the same data is available from \repo.
 """.strip()
 
-# Create table
-print(f'Writing to {filename}...')
-with open(filename, 'w') as f:
-    # Header
-    eol = '\n'
-    f.write(r'\startrowcolors' + eol)
-    f.write(r'\begin{longtable}{p{6cm}|lll|lll|lll}' + eol)
-    f.write(r'\caption{' + caption + r'} \\' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\rowcolor{white}' + eol)
-    f.write(r'Study')
-    f.write(r' & $V_a$ & $\sigma_a$  & $n_a$')
-    f.write(r' & $V_i$ & $\sigma_i$  & $n_i$')
-    f.write(r' & Cell & $\alpha$ & $\beta1$ \\' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\endfirsthead' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\rowcolor{white}' + eol)
-    f.write('Study')
-    f.write(r' & $V_a$ & $\sigma_a$  & $n_a$')
-    f.write(r' & $V_i$ & $\sigma_i$  & $n_i$')
-    f.write(r' & Cell & $\alpha$ & $\beta1$ \\' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\endhead' + eol)
-    f.write(r'\hline' + eol)
-    f.write(r'\endfoot' + eol)
-    # Body
-    form = '{:.3g}'
+
+def rows():
+    """ Yields all rows, fetching ``chunk_size`` at a time. """
     with base.connect() as con:
         c = con.cursor()
-        q = 'select ' + ', '.join(fields) + f' from midpoints_wt {qo}'
-        for k, row in enumerate(c.execute(q)):
-            x = []
-            x.append(r'\citet{' + refs[row['pub']] + '}')
-            if row['na'] != 0:
-                x.append(form.format(row['va']))
-                x.append(form.format(row['stda']))
-                x.append(form.format(row['na']))
-            else:
-                x.append('&&')
-            if row['ni'] != 0:
-                x.append(form.format(row['vi']))
-                x.append(form.format(row['stdi']))
-                x.append(form.format(row['ni']))
-            else:
-                x.append('&&')
-            x.append(row['cell'].replace('Oocyte', 'Ooc.'))
-            x.append(seq(row['sequence']))
-            x.append(row['beta1'])
-            f.write(' & '.join(x) + r' \\' + eol)
-    # Footer
-    f.write(r'\end{longtable}' + eol)
+        c.row_factory = None
+        c.execute('select ' + ', '.join(fields)
+                  + f' from {base.FLAT_TABLE} as m {qo} order by m.id')
+        while True:
+            chunk = c.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield from chunk
+
 
-print('Done.')
+# Create table(s)
+files = base.write_table(filename, columns, rows(), formats, caption,
+                         'p{6cm}|lll|lll|lll', max_rows)
+print('Written to ' + ', '.join(files))
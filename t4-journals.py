@@ -12,11 +12,10 @@ w = 'where cell != "Oocyte"' if nooocytes else ''
 with base.connect() as con:
     c = con.cursor()
     q = ('select journal, COUNT(pub) as c'
-         ' from midpoints_wt inner join publication'
-         f' on midpoints_wt.pub = publication.key {w}'
-         ' group by publication.journal'
-         #' order by publication.journal'
-         ' order by c desc'
+         f' from {base.FLAT_TABLE} {w}'
+         ' group by journal'
+         #' order by journal'
+         ' order by c desc, journal desc'
     )
     for row in c.execute(q):
         print(list(row))
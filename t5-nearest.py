@@ -5,24 +5,23 @@
 import base
 import numpy as np
 
+# Number of experiments to show (None for all)
+n_show = None
 
-pub, va, vi = [], [], []
-with base.connect() as con:
-    c = con.cursor()
-    q = ('select pub, va, vi from midpoints_wt'
-         f' where (na > 0 and ni > 0 and cell != "Oocyte")')
-    for row in c.execute(q):
-        pub.append(row[0])
-        va.append(float(row[1]))
-        vi.append(float(row[2]))
+# Use a distance that accounts for the uncertainty in each experiment's mean
+# (see base.ExperimentIndex)
+uncertainty = False
 
-va, vi = np.array(va), np.array(vi)
+q = ('select pub, va, vi, stda, stdi, na, ni from midpoints_wt'
+     f' where (na > 0 and ni > 0 and cell != "Oocyte")')
+d = base.query(q)
+pub, va, vi = d['pub'], d['va'].astype(float), d['vi'].astype(float)
 ma, mi = np.mean(va), np.mean(vi)
 
 print(ma, mi)
 
-distance = np.sqrt((va - ma)**2 + (vi - mi)**2)
-order = np.argsort(distance)
+index = base.experiment_index(d, spread='sem' if uncertainty else None)
+distance, order = index.query([ma, mi], k=n_show or len(index))
 
-for i in order:
-    print(pub[i], distance[i])
+for i, x in zip(order[0], distance[0]):
+    print(pub[i], x)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+#
+# Screens all numerical columns for linear correlations with the midpoints and
+# their standard deviations.
+#
+import numpy as np
+
+import base
+
+# Exclude ooocytes
+nooocytes = True
+
+# Number of results to show
+n_show = 25
+
+# Columns not to use as factors: counts, values derived from the responses
+# (standard errors are calculated from the standard deviations and counts),
+# and the voltage of peak current (measured from the same I-V curve as Va)
+exclude = ['na', 'ni', 'sema', 'semi', 'vpeak']
+
+# Gather data
+data = base.load()
+if nooocytes:
+    data = base.no_oocytes(data)
+
+# Responses, with NaN for experiments not reporting Va or Vi
+arows, irows = data['na'] > 0, data['ni'] > 0
+y = dict(
+    va=np.where(arows, data['va'], np.nan),
+    vi=np.where(irows, data['vi'], np.nan),
+    stda=np.where(arows, data['stda'], np.nan),
+    stdi=np.where(irows, data['stdi'], np.nan),
+)
+
+# All other columns with at least 3 different numerical values
+x = {}
+for name in data.names():
+    if name not in y and name not in exclude:
+        v = data.numeric(name)
+        if len(np.unique(v[np.isfinite(v)])) > 2:
+            x[name] = v
+
+# Fit all pairs at once
+fits = base.regression(np.stack(list(x.values()), axis=1),
+                       np.stack(list(y.values()), axis=1), list(x), list(y))
+print(f'Fitted {len(fits)} pairs of {len(x)} factors and {len(y)} responses')
+
+# Show strongest correlations
+order = np.argsort(fits['p'])
+print(f'{"Factor":<10} {"Response":<8} {"n":>4} {"Slope":>10} {"r2":>5}'
+      f' {"p":>8}')
+for i in order[:n_show]:
+    f = fits.row(i)
+    print(f'{f["factor"]:<10} {f["response"]:<8} {f["n"]:>4}'
+          f' {f["slope"]:>10.3g} {f["r2"]:>5.2f} {f["p"]:>8.2g}')
+
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+#
+# Screens the categorical columns for differences in the midpoints, and in the
+# offset from the linear fit of Vi against Va, using permutation tests. Each p
+# is shown along with a Holm-Bonferroni adjusted p, which accounts for the
+# number of tests.
+#
+import numpy as np
+
+import base
+
+# Exclude ooocytes
+nooocytes = True
+
+# Categorical columns to test (free text, and numbers stored as text, are not
+# categories)
+columns = [
+    'sequence', 'sequence_full', 'beta1', 'cell', 'cell_full', 'trtype',
+    'ljp_corrected', 'boltz_ag', 'boltz_ii', 'mix_e', 'mix_i', 'journal',
+]
+
+# Minimum number of experiments for a level to be tested
+min_points = 3
+
+# Number of results to show
+n_show = 25
+
+# Gather data, for experiments reporting both Va and Vi
+data = base.load()
+if nooocytes:
+    data = base.no_oocytes(data)
+data = data.select((data['na'] > 0) & (data['ni'] > 0))
+
+# Quantities to test
+va, vi = data.numeric('va'), data.numeric('vi')
+fit = base.regression(va, vi).row(0)
+values = np.stack(
+    (va, vi, vi - (fit['intercept'] + fit['slope'] * va)), axis=1)
+
+# Labels per column, ignoring levels with too few experiments
+groupings = {}
+for name in columns:
+    labels = [None if v is None or v == '' else v for v in data[name]]
+    counts = {v: labels.count(v) for v in set(labels) - {None}}
+    labels = [v if counts.get(v, 0) >= min_points else None for v in labels]
+    if len(set(labels) - {None}) > 1:
+        groupings[name] = labels
+
+# Test all pairs at once
+tests = base.permutation_test(
+    groupings, values, ['va', 'vi', 'offset'], seed=1)
+print(f'Tested {len(tests)} pairs of levels and quantities in'
+      f' {len(groupings)} columns')
+
+# Holm-Bonferroni adjusted p-values, to account for the number of tests
+order = np.argsort(tests['p'], kind='stable')
+m = len(order)
+holm = np.empty(m)
+holm[order] = np.minimum(
+    1, np.maximum.accumulate((m - np.arange(m)) * tests['p'][order]))
+
+# Show most significant differences
+print(f'{"Column":<13} {"Level a":<12} {"Level b":<12} {"n_a":>4} {"n_b":>4}'
+      f' {"Quantity":<8} {"Diff.":>7} {"p":>8} {"p (Holm)":>8}')
+for i in order[:n_show]:
+    t = tests.row(i)
+    print(f'{t["grouping"]:<13} {str(t["level_a"]):<12.12}'
+          f' {str(t["level_b"]):<12.12} {t["n_a"]:>4} {t["n_b"]:>4}'
+          f' {t["quantity"]:<8} {t["difference"]:>7.2f} {t["p"]:>8.2g}'
+          f' {holm[i]:>8.2g}')
+
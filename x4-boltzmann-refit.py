@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+#
+# Simulates the cells underlying every reported Boltzmann fit, on the voltage
+# steps of each experiment's protocol, and refits them, to estimate how much
+# of the reported spread in midpoints could be caused by the fitting.
+#
+import time
+
+import numpy as np
+
+import base
+
+# Exclude ooocytes
+nooocytes = True
+
+# Measurement noise, relative to the maximum of each curve
+noise = 0.02
+
+# Number of experiments to show
+n_show = 5
+
+# Load data
+data = base.load()
+if nooocytes:
+    data = base.no_oocytes(data)
+
+for name, x, low, high, step in (('Activation', 'a', 'palo', 'pahi', 'pad'),
+                                 ('Inactivation', 'i', 'pilo', 'pihi', 'pid')):
+    d = data.select(data['n' + x] > 0)
+    t0 = time.perf_counter()
+    sim = base.simulate_boltzmann(
+        d.numeric('v' + x), d.numeric('std' + x), d.numeric('k' + x),
+        d.numeric('n' + x), d.numeric(low), d.numeric(high), d.numeric(step),
+        noise=noise, seed=1)
+    t1 = time.perf_counter() - t0
+
+    use = sim['cells'] > 0
+    cells, failed = np.sum(sim['cells']), np.sum(sim['failed'])
+    print(f'{name}: simulated and refitted {cells} cells in'
+          f' {np.sum(use)} experiments in {t1:.2f} s ({failed} failed)')
+
+    # Spread introduced by fitting, relative to the reported spread
+    reported = d.numeric('std' + x)[use]
+    error = sim['error_std'][use]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = (error / reported)**2
+    print(f'  Median bias in mean midpoint: '
+          f'{np.nanmedian(sim["error_mean"][use]):.3f} mV')
+    print(f'  Median std of fitting error: {np.nanmedian(error):.3f} mV')
+    print(f'  Median fraction of reported variance: '
+          f'{np.nanmedian(fraction[np.isfinite(fraction)]):.4f}')
+
+    # Dependence on step size
+    for s in np.unique(d.numeric(step)[use]):
+        i = d.numeric(step)[use] == s
+        print(f'  Step {s:>4.0f} mV: {np.sum(i):>3} experiments,'
+              f' median error std {np.nanmedian(error[i]):.3f} mV')
+
+    # Largest fitting-induced spread
+    print('  Largest fitting error std:')
+    index = np.flatnonzero(use)
+    for i in index[np.argsort(-np.nan_to_num(error))][:n_show]:
+        print(f'    {d["pub"][i]:<20} {d.numeric(low)[i]:>5.0f} to'
+              f' {d.numeric(high)[i]:>4.0f} by {d.numeric(step)[i]:>2.0f},'
+              f' k={d.numeric("k" + x)[i]:>5.1f}:'
+              f' {sim["error_std"][i]:.3f} mV'
+              f' (reported std {d.numeric("std" + x)[i]:.1f} mV)')
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+#
+# Simulates the activation and inactivation protocol of every experiment with
+# a single Hodgkin-Huxley style sodium current model, to estimate how much of
+# the reported spread in midpoints could be caused by differences in protocol.
+#
+import time
+
+import numpy as np
+
+import base
+
+# Exclude ooocytes
+nooocytes = True
+
+# Use each experiment's temperature (if reported, else room temperature)
+use_temperature = True
+
+# Number of protocol variants in the sensitivity sweep
+n_variants = 5000
+
+# Load data
+data = base.load()
+if nooocytes:
+    data = base.no_oocytes(data)
+
+# Temperatures, using the middle of any reported range
+tmin, tmax = data.numeric('tmin'), data.numeric('tmax')
+tmin, tmax = np.fmin(tmin, tmax), np.fmax(tmin, tmax)
+temperature = np.where(np.isfinite(tmin), (tmin + tmax) / 2, 22)
+if not use_temperature:
+    temperature[:] = 22
+
+for name, x, columns in (
+        ('Activation', 'a', ('pah', 'palo', 'pahi', 'pad')),
+        ('Inactivation', 'i', ('pih', 'pilo', 'pihi', 'pid', 'pit'))):
+    select = data['n' + x] > 0
+    d = data.select(select)
+    p = [d.numeric(c) for c in columns]
+    t0 = time.perf_counter()
+    if x == 'a':
+        sim = base.simulate_activation(
+            *p, temperature=temperature[select])
+    else:
+        sim = base.simulate_inactivation(
+            *p, temperature=temperature[select])
+    t1 = time.perf_counter() - t0
+
+    use = np.isfinite(sim['mid'])
+    print(f'{name}: simulated {np.sum(sim["steps"][use])} sweeps in'
+          f' {np.sum(use)} of {len(d)} protocols in {t1:.2f} s')
+
+    # Spread caused by protocol differences, relative to the reported spread
+    simulated, reported = sim['mid'][use], d.numeric('v' + x)[use]
+    print(f'  Simulated midpoints: median {np.median(simulated):.2f} mV,'
+          f' std {np.std(simulated, ddof=1):.2f} mV, 5-95th percentile'
+          f' range {np.ptp(np.percentile(simulated, [5, 95])):.2f} mV')
+    print(f'  Reported midpoints:  median {np.median(reported):.2f} mV,'
+          f' std {np.std(reported, ddof=1):.2f} mV, 5-95th percentile'
+          f' range {np.ptp(np.percentile(reported, [5, 95])):.2f} mV')
+    r = base.regression(simulated, reported).row(0)
+    print(f'  Reported against simulated midpoint: slope {r["slope"]:.2f},'
+          f' R^2 {r["r2"]:.3f}, p {r["p"]:.3g}')
+
+    # Sensitivity to the protocol: resample each setting from the reported
+    # ones, all at once, or one at a time around the median protocol
+    median = [np.nanmedian(v) for v in p]
+    rng = np.random.default_rng(1)
+    variants = [rng.choice(v[np.isfinite(v)], n_variants) for v in p]
+    t0 = time.perf_counter()
+    if x == 'a':
+        var = base.simulate_activation(*variants)
+    else:
+        var = base.simulate_inactivation(*variants)
+    t1 = time.perf_counter() - t0
+    print(f'  Swept {n_variants} protocol variants in {t1:.2f} s:'
+          f' simulated midpoint std {np.nanstd(var["mid"], ddof=1):.2f} mV')
+    for i, c in enumerate(columns):
+        v = [np.full(n_variants, m) for m in median]
+        v[i] = variants[i]
+        if x == 'a':
+            one = base.simulate_activation(*v)
+        else:
+            one = base.simulate_inactivation(*v)
+        print(f'    Varying only {c:<4}: midpoint std'
+              f' {np.nanstd(one["mid"], ddof=1):.2f} mV')
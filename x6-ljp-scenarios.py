@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+#
+# Recalculates the main statistics under alternative corrections for the
+# liquid junction potential (LJP), to see how sensitive they are to the way
+# (or whether) each study corrected for it.
+#
+import numpy as np
+
+import base
+
+# Exclude ooocytes
+nooocytes = True
+
+# Minimum number of experiments for a subgroup to be shown
+min_n = 5
+
+# Scenarios, see base.ljp_offsets(). Offsets are subtracted from the
+# midpoints. Rows reported as corrected are never changed.
+scenarios = {
+    'as reported': {},
+    'known LJP': dict(known=True),
+    'known or imputed': dict(known=True, impute=True),
+}
+for offset in (-10, -5, 5, 10):
+    scenarios[f'all uncorrected, subtract {offset:+} mV'] = dict(
+        offset=offset)
+    scenarios[f'known, imputed, or subtract {offset:+} mV'] = dict(
+        known=True, impute=True, offset=offset)
+
+# Load data
+data = base.load()
+if nooocytes:
+    data = base.no_oocytes(data)
+
+groupings = {}
+for name in ('sequence', 'beta1', 'cell'):
+    groupings[name] = [None if v == '' else v for v in data[name]]
+
+fits, summaries, subgroups = base.ljp_scenarios(data, scenarios, groupings)
+
+# Fit of figure 3
+w = max(len(x) for x in scenarios)
+print('Fit of Vi against Va (figure 3)')
+print(f'{"Scenario":<{w}} {"n":>4} {"shifted":>7} {"a":>6} {"b":>5}'
+      f' {"r":>5} {"a (b=1)":>7} {"mean Va":>7} {"mean Vi":>7}')
+for i in range(len(fits)):
+    r = fits.row(i)
+    print(f'{r["scenario"]:<{w}} {r["n"]:>4} {r["shifted"]:>7}'
+          f' {r["intercept"]:>6.1f} {r["slope"]:>5.2f} {r["r"]:>5.2f}'
+          f' {r["offset"]:>7.1f} {r["mean_va"]:>7.1f} {r["mean_vi"]:>7.1f}')
+
+# Summaries of d3
+print()
+print('Mean midpoints (d3)')
+print(f'{"Scenario":<{w}} {"":<3} {"n":>4} {"Min":>6} {"Max":>6}'
+      f' {"Median":>6} {"Range":>6} {"90th p":>6}')
+for i in range(len(summaries)):
+    r = summaries.row(i)
+    print(f'{r["scenario"]:<{w}} {r["quantity"]:<3} {r["n"]:>4}'
+          f' {r["min"]:>6.1f} {r["max"]:>6.1f} {r["median"]:>6.1f}'
+          f' {r["range"]:>6.1f} {r["p90"]:>6.1f}')
+
+# Subgroup means, relative to the data as reported
+print()
+print(f'Subgroup means with at least {min_n} experiments, and the change'
+      ' from the data as reported')
+reference = subgroups.select(subgroups['scenario'] == 'as reported')
+others = list(scenarios)[1:]
+for j, s in enumerate(others):
+    print(f'  S{1 + j}: {s}')
+print(f'{"Grouping":<9} {"Level":<20} {"":<3} {"n":>4} {"Mean":>6}'
+      + ''.join(f' {"S" + str(1 + j):>5}' for j in range(len(others))))
+shifts = [subgroups.select(subgroups['scenario'] == s)['mean']
+          - reference['mean'] for s in others]
+for i in np.flatnonzero(reference['n'] >= min_n):
+    r = reference.row(i)
+    print(f'{r["grouping"]:<9} {str(r["level"]):<20.20} {r["quantity"]:<3}'
+          f' {r["n"]:>4} {r["mean"]:>6.1f}'
+          + ''.join(f' {x[i]:>+5.1f}' for x in shifts))